@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+# Benchmarks the plugin's API (on_api_get) at a high request rate, as farm dashboards polling many printers would,
+# both for clients without the latest snapshot (200) and for clients that already have it (304). Each request is made
+# within a Flask test request context, on several threads at once. The printer's data is counted as it's read, as
+# serving the API shouldn't read it at all. Requires OctoPrint (and so Flask) to be installed, but not running.
+#
+# Usage: python benchmarks/api_load.py [--requests 100000] [--threads 4] [--output results.json]
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import argparse
+import json
+import logging
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+import flask
+
+from simulate_print import SimulatedPrinter, create_plugin, get_commit
+
+# Stands in for OctoPrint's printer, counting the times its data is read.
+class CountingPrinter(SimulatedPrinter):
+
+    def __init__(self):
+
+        super(CountingPrinter, self).__init__()
+
+        self.read_count = 0
+
+    def get_current_data(self):
+
+        self.read_count += 1
+
+        return super(CountingPrinter, self).get_current_data()
+
+    def is_printing(self):
+
+        self.read_count += 1
+
+        return super(CountingPrinter, self).is_printing()
+
+# Makes requests to the API on several threads at once. Returns the number of seconds taken, and the status codes returned.
+# app (Flask) - The application to make the requests within.
+# plugin (PrintETAPlugin) - The plugin to request from.
+# count (int) - The total number of requests.
+# threads (int) - The number of threads to make the requests on.
+# headers (dictionary) - The headers to send with each request.
+def load(app, plugin, count, threads, headers):
+
+    statuses = dict()
+    lock = threading.Lock()
+
+    def run(requests):
+
+        counted = dict()
+
+        for _ in range(requests):
+
+            with app.test_request_context("/api/plugin/print_eta", headers = headers):
+                status = plugin.on_api_get(flask.request).status_code
+
+            counted[status] = counted.get(status, 0) + 1
+
+        with lock:
+
+            for status, number in counted.items():
+                statuses[status] = statuses.get(status, 0) + number
+
+    workers = [threading.Thread(target = run, args = [count // threads + (1 if index < count % threads else 0)]) for index in range(threads)]
+
+    start = time.perf_counter()
+
+    for worker in workers:
+        worker.start()
+
+    for worker in workers:
+        worker.join()
+
+    return time.perf_counter() - start, statuses
+
+def main():
+
+    parser = argparse.ArgumentParser(description = "Benchmarks the plugin's API at a high request rate.")
+    parser.add_argument("--requests", type = int, default = 100000, help = "The number of requests to make for each response.")
+    parser.add_argument("--threads", type = int, default = 4, help = "The number of threads to make the requests on.")
+    parser.add_argument("--output", help = "The file to write the results to, as JSON.")
+    arguments = parser.parse_args()
+
+    logging.getLogger("octoprint.plugins.print_eta").setLevel(logging.WARNING)
+
+    data_folder = tempfile.mkdtemp(prefix = "print_eta_benchmark_")
+
+    try:
+
+        printer = CountingPrinter()
+
+        plugin = create_plugin(data_folder, dict(), printer)
+
+        # Serve a snapshot of a print in progress.
+        printer.printing = True
+        printer.progress.update(completion = 25.0, filepos = 1000, printTime = 3600, printTimeLeft = 10800)
+
+        plugin.refresh_messages()
+
+        printer.read_count = 0
+
+        app = flask.Flask(__name__)
+
+        etag = plugin.snapshot.etag
+
+        full_seconds, full_statuses = load(app, plugin, arguments.requests, arguments.threads, dict())
+        conditional_seconds, conditional_statuses = load(app, plugin, arguments.requests, arguments.threads, {"If-None-Match": '"{}"'.format(etag)})
+
+    finally:
+        shutil.rmtree(data_folder, ignore_errors = True)
+
+    results = dict(
+        commit = get_commit(),
+        python = sys.version.split()[0],
+        requests = arguments.requests,
+        threads = arguments.threads,
+        snapshot_bytes = len(plugin.snapshot.body),
+        full_statuses = full_statuses,
+        full_requests_per_second = arguments.requests / full_seconds,
+        full_us_per_request = full_seconds / arguments.requests * 1e6,
+        conditional_statuses = conditional_statuses,
+        conditional_requests_per_second = arguments.requests / conditional_seconds,
+        conditional_us_per_request = conditional_seconds / arguments.requests * 1e6,
+        printer_reads = printer.read_count
+    )
+
+    print(json.dumps(results, indent = 4, sort_keys = True))
+
+    if arguments.output:
+
+        with open(arguments.output, "w") as file:
+            json.dump(results, file, indent = 4, sort_keys = True)
+
+if __name__ == "__main__":
+    main()
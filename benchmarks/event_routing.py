@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# Benchmarks the plugin's event handler (on_event) over a stream of events in which most are ignored, as OctoPrint
+# fires many events the plugin doesn't react to (e.g. position updates and Z changes). The events that are handled
+# are timed along with them, and the ignored events are also compared with the filter that on_event used before,
+# which formatted a debug message and asked the printer whether it was printing before discarding an event.
+# Requires OctoPrint to be installed, but not running.
+#
+# Usage: python benchmarks/event_routing.py [--count 100000] [--handled 0.05] [--output results.json]
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import argparse
+import json
+import logging
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+from octoprint.events import Events
+
+from simulate_print import create_plugin, get_commit
+
+# Events that the plugin ignores, weighted towards those OctoPrint fires most often during a print.
+IGNORED_EVENTS = [Events.POSITION_UPDATE] * 8 + [Events.Z_CHANGE] * 4 + [Events.PRINTER_STATE_CHANGED, Events.METADATA_STATISTICS_UPDATED,
+    Events.CAPTURE_START, Events.CAPTURE_DONE, Events.FIRMWARE_DATA, Events.TOOL_CHANGE, Events.SETTINGS_UPDATED, Events.UPDATED_FILES]
+
+# Events that the plugin handles, without starting or finishing a print.
+HANDLED_EVENTS = [Events.PRINT_PAUSED, Events.PRINT_RESUMED, Events.CLIENT_OPENED, Events.FILE_REMOVED]
+
+# The filter that on_event used before discarding an event, for comparison.
+def filter_event_previous(plugin, event, payload):
+
+    plugin.logger.debug("on_event called ({}).".format(event))
+
+    if not plugin.has_started_up:
+        return
+
+    if event == Events.CLIENT_OPENED:
+        return
+
+    if plugin._printer.is_printing():
+
+        if not event.startswith("Print"):
+            return
+
+    else:
+
+        if not event.startswith("Print") and event not in [Events.FILE_REMOVED]:
+            return
+
+# Gets the best time taken to run a function over several repeats, in seconds.
+def measure(function, repeats = 5):
+
+    best = None
+
+    for _ in range(repeats):
+
+        start = time.perf_counter()
+
+        function()
+
+        elapsed = time.perf_counter() - start
+
+        if best is None or elapsed < best:
+            best = elapsed
+
+    return best
+
+# Passes each event to a handler, as OctoPrint's event manager does.
+def route(handler, events):
+
+    for event, payload in events:
+        handler(event, payload)
+
+def main():
+
+    parser = argparse.ArgumentParser(description = "Benchmarks the plugin's event handler.")
+    parser.add_argument("--count", type = int, default = 100000, help = "The number of events.")
+    parser.add_argument("--handled", type = float, default = 0.05, help = "The fraction of events that the plugin handles.")
+    parser.add_argument("--seed", type = int, default = 0, help = "The seed for the events.")
+    parser.add_argument("--output", help = "The file to write the results to, as JSON.")
+    arguments = parser.parse_args()
+
+    logging.getLogger("octoprint.plugins.print_eta").setLevel(logging.WARNING)
+
+    rng = random.Random(arguments.seed)
+
+    ignored = [(rng.choice(IGNORED_EVENTS), dict()) for _ in range(arguments.count)]
+
+    mixed = [(rng.choice(HANDLED_EVENTS), dict(path = "removed.gcode")) if rng.random() < arguments.handled else event for event in ignored]
+
+    data_folder = tempfile.mkdtemp(prefix = "print_eta_benchmark_")
+
+    try:
+
+        # The files selected aren't available, so don't analyse them.
+        plugin = create_plugin(data_folder, dict(enable_gcode_analysis = False, enable_trace_recording = False))
+
+        plugin._printer.printing = True
+
+        previous_seconds = measure(lambda: route(lambda event, payload: filter_event_previous(plugin, event, payload), ignored))
+        ignored_seconds = measure(lambda: route(plugin.on_event, ignored))
+        mixed_seconds = measure(lambda: route(plugin.on_event, mixed))
+
+    finally:
+        shutil.rmtree(data_folder, ignore_errors = True)
+
+    results = dict(
+        commit = get_commit(),
+        python = sys.version.split()[0],
+        count = arguments.count,
+        handled_fraction = arguments.handled,
+        previous_ignored_ns_per_event = previous_seconds / arguments.count * 1e9,
+        ignored_ns_per_event = ignored_seconds / arguments.count * 1e9,
+        mixed_ns_per_event = mixed_seconds / arguments.count * 1e9,
+        ignored_speedup = previous_seconds / ignored_seconds
+    )
+
+    print(json.dumps(results, indent = 4, sort_keys = True))
+
+    if arguments.output:
+
+        with open(arguments.output, "w") as file:
+            json.dump(results, file, indent = 4, sort_keys = True)
+
+if __name__ == "__main__":
+    main()
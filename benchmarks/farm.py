@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+# Benchmarks the farm aggregator (octoprint_print_eta/aggregator.py) against many stand-in OctoPrint instances,
+# served by a separate process so that only the aggregator's own CPU time is measured. Some stand-ins fail every
+# request, and some aren't listening at all, so that the aggregator's backoff is exercised too.
+# Doesn't require OctoPrint to be running.
+#
+# Usage: python benchmarks/farm.py [--printers 300] [--interval 2] [--duration 30] [--output results.json]
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from simulate_print import get_commit
+
+from octoprint_print_eta.aggregator import ConnectionPool, FarmAggregator
+
+# Serves a stand-in for the plugin's API, with an ETA that moves every few seconds.
+# failing (bool) - Whether to fail every request.
+# change_interval (float) - The number of seconds between changes to the ETA.
+def create_standin(failing, change_interval):
+
+    start = time.time()
+    duration = random.uniform(600, 86400)
+
+    async def handle(reader, writer):
+
+        try:
+
+            while True:
+
+                request_line = await reader.readline()
+
+                if len(request_line) == 0:
+                    break
+
+                headers = dict()
+
+                while True:
+
+                    line = await reader.readline()
+
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+
+                    name, _, value = line.decode("latin-1").partition(":")
+
+                    headers[name.strip().lower()] = value.strip()
+
+                if failing:
+
+                    writer.write(b"HTTP/1.1 500 Internal Server Error\r\nContent-Length: 0\r\n\r\n")
+
+                    continue
+
+                # The estimate changes every change_interval seconds.
+                step = int((time.time() - start) / change_interval)
+
+                eta = start + duration + step * random.Random(step).uniform(-30, 30)
+
+                body = json.dumps(dict(eta = eta, print_start = start, eta_string = "-", completion = None)).encode("utf-8")
+
+                etag = '"{}"'.format(hashlib.sha1(str(step).encode("ascii")).hexdigest())
+
+                if headers.get("if-none-match") == etag:
+                    writer.write("HTTP/1.1 304 Not Modified\r\nETag: {}\r\n\r\n".format(etag).encode("latin-1"))
+
+                else:
+                    writer.write("HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nContent-Length: {}\r\nETag: {}\r\n\r\n".format(len(body), etag).encode("latin-1") + body)
+
+                await writer.drain()
+
+        except ConnectionError:
+            pass
+
+        finally:
+            writer.close()
+
+    return handle
+
+# Serves the stand-ins until the parent process exits, printing their ports as JSON once they're listening.
+async def serve_standins(count, failing, change_interval):
+
+    servers = []
+
+    for index in range(count):
+        servers.append(await asyncio.start_server(create_standin(index < failing, change_interval), "127.0.0.1", 0))
+
+    print(json.dumps([server.sockets[0].getsockname()[1] for server in servers]), flush = True)
+
+    # Exit once the parent process closes standard input.
+    await asyncio.get_running_loop().run_in_executor(None, sys.stdin.read)
+
+# Runs the aggregator against the stand-ins for a while.
+async def run_aggregator(printers, interval, duration):
+
+    pool = ConnectionPool(limit = 64, timeout = 5.0)
+
+    aggregator = FarmAggregator(printers, pool, interval, max_backoff = interval * 8)
+
+    cpu_start = time.process_time()
+
+    task = asyncio.ensure_future(aggregator.run())
+
+    await asyncio.sleep(duration)
+
+    task.cancel()
+
+    try:
+        await task
+
+    except asyncio.CancelledError:
+        pass
+
+    cpu_time = time.process_time() - cpu_start
+
+    pool.close()
+
+    return aggregator, pool, cpu_time
+
+def main():
+
+    parser = argparse.ArgumentParser(description = "Benchmarks the farm aggregator against stand-in OctoPrint instances.")
+    parser.add_argument("--printers", type = int, default = 300, help = "The number of printers, including those that fail.")
+    parser.add_argument("--failing", type = int, default = 10, help = "The number of printers that fail every request.")
+    parser.add_argument("--offline", type = int, default = 10, help = "The number of printers that can't be connected to.")
+    parser.add_argument("--interval", type = float, default = 2.0, help = "The number of seconds between polls of each printer.")
+    parser.add_argument("--duration", type = float, default = 30.0, help = "The number of seconds to run the aggregator for.")
+    parser.add_argument("--serve-standins", type = int, help = argparse.SUPPRESS)
+    parser.add_argument("--output", help = "The file to write the results to, as JSON.")
+    arguments = parser.parse_args()
+
+    if arguments.serve_standins is not None:
+
+        asyncio.run(serve_standins(arguments.serve_standins, arguments.failing, arguments.interval * 5))
+
+        return
+
+    # Printers that fail are expected, so don't log them.
+    logging.getLogger("octoprint.plugins.print_eta.aggregator").setLevel(logging.ERROR)
+
+    standins = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--serve-standins", str(arguments.printers - arguments.offline),
+        "--failing", str(arguments.failing), "--interval", str(arguments.interval)], stdin = subprocess.PIPE, stdout = subprocess.PIPE)
+
+    try:
+
+        ports = json.loads(standins.stdout.readline().decode("utf-8"))
+
+        printers = [dict(name = "Printer {}".format(index + 1), url = "http://127.0.0.1:{}".format(port), api_key = "benchmark") for index, port in enumerate(ports)]
+
+        # Port 9 (discard) is assumed not to be listening.
+        printers.extend(dict(name = "Offline {}".format(index + 1), url = "http://127.0.0.1:9", api_key = "benchmark") for index in range(arguments.offline))
+
+        aggregator, pool, cpu_time = asyncio.run(run_aggregator(printers, arguments.interval, arguments.duration))
+
+    finally:
+
+        standins.stdin.close()
+        standins.wait()
+
+    printers = json.loads(aggregator.get_snapshot().body.decode("utf-8"))["printers"]
+
+    etas = [printer["eta"] for printer in printers if printer["eta"] is not None]
+
+    results = dict(
+        commit = get_commit(),
+        python = sys.version.split()[0],
+        printers = len(printers),
+        printers_with_eta = len(etas),
+        printers_with_errors = sum(1 for printer in printers if printer["error"] is not None),
+        sorted = etas == sorted(etas),
+        duration_seconds = arguments.duration,
+        polls = aggregator.poll_count,
+        polls_per_second = aggregator.poll_count / arguments.duration,
+        unchanged_polls = aggregator.unchanged_count,
+        failed_polls = aggregator.failure_count,
+        connections_opened = pool.connection_count,
+        cpu_seconds = cpu_time,
+        cpu_fraction = cpu_time / arguments.duration,
+        cpu_seconds_per_poll = cpu_time / max(1, aggregator.poll_count),
+        index_bytes = len(aggregator.get_snapshot().body)
+    )
+
+    print(json.dumps(results, indent = 4, sort_keys = True))
+
+    if arguments.output:
+
+        with open(arguments.output, "w") as file:
+            json.dump(results, file, indent = 4, sort_keys = True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# Benchmarks formatting durations for printer messages (e.g. 1d 02:03:04), comparing the plugin's formatter with the
+# f-string implementation it replaced, one duration at a time and in batches.
+#
+# Usage: python benchmarks/format_duration.py [--count 100000] [--output results.json]
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import argparse
+import datetime
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from simulate_print import get_commit
+
+from octoprint_print_eta.formatting import format_duration, format_durations
+
+# The implementation that was replaced, for comparison. Its seconds were the hours again, which didn't affect its speed.
+def format_timedelta_previous(timedelta):
+
+    hours = timedelta.seconds // 3600
+    minutes = (timedelta.seconds // 60) % 60
+    seconds = (timedelta.seconds // 3600) % 60
+
+    message = f'{hours:02d}' + ":" + f'{minutes:02d}' + ":" + f'{seconds:02d}'
+
+    if timedelta.days > 0:
+        message = "{}d".format(timedelta.days) + " " + message
+
+    return message
+
+# The implementation used by the plugin's get_time_string.
+def format_timedelta(timedelta):
+    return format_duration(timedelta.days * 86400 + timedelta.seconds)
+
+# Gets the best time taken to run a function over several repeats, in seconds.
+def measure(function, repeats = 5):
+
+    best = None
+
+    for _ in range(repeats):
+
+        start = time.perf_counter()
+
+        function()
+
+        elapsed = time.perf_counter() - start
+
+        if best is None or elapsed < best:
+            best = elapsed
+
+    return best
+
+def main():
+
+    parser = argparse.ArgumentParser(description = "Benchmarks formatting durations.")
+    parser.add_argument("--count", type = int, default = 100000, help = "The number of durations to format.")
+    parser.add_argument("--seed", type = int, default = 0, help = "The seed for the durations.")
+    parser.add_argument("--output", help = "The file to write the results to, as JSON.")
+    arguments = parser.parse_args()
+
+    rng = random.Random(arguments.seed)
+
+    # Mostly durations of prints, with some that last for days.
+    seconds = [rng.randrange(0, 86400 * 3) for _ in range(arguments.count)]
+    timedeltas = [datetime.timedelta(seconds = value) for value in seconds]
+
+    previous_seconds = measure(lambda: [format_timedelta_previous(value) for value in timedeltas])
+    current_seconds = measure(lambda: [format_timedelta(value) for value in timedeltas])
+    batch_seconds = measure(lambda: format_durations(seconds))
+
+    results = dict(
+        commit = get_commit(),
+        python = sys.version.split()[0],
+        count = arguments.count,
+        previous_ns_per_duration = previous_seconds / arguments.count * 1e9,
+        current_ns_per_duration = current_seconds / arguments.count * 1e9,
+        batch_ns_per_duration = batch_seconds / arguments.count * 1e9,
+        speedup = previous_seconds / current_seconds,
+        batch_speedup = previous_seconds / batch_seconds
+    )
+
+    print(json.dumps(results, indent = 4, sort_keys = True))
+
+    if arguments.output:
+
+        with open(arguments.output, "w") as file:
+            json.dump(results, file, indent = 4, sort_keys = True)
+
+if __name__ == "__main__":
+    main()
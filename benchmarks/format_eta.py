@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+# Benchmarks formatting ETAs (e.g. 13:00:00 and Mon 4), comparing the plugin's formatter with calling
+# babel.dates.format_time and format_date for each ETA, as the plugin did before. The ETAs follow a simulated print,
+# where the estimate wanders by a few seconds between refreshes, and are also formatted with every ETA different, so
+# that the cost of a cache miss is measured too. Requires babel to be installed.
+#
+# Usage: python benchmarks/format_eta.py [--count 100000] [--locale en_GB] [--output results.json]
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import argparse
+import datetime
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from babel.dates import format_date, format_time
+
+from simulate_print import get_commit
+
+from octoprint_print_eta.formatting import ETAFormatter
+
+# Gets the best time taken to run a function over several repeats, in seconds.
+def measure(function, repeats = 5):
+
+    best = None
+
+    for _ in range(repeats):
+
+        start = time.perf_counter()
+
+        function()
+
+        elapsed = time.perf_counter() - start
+
+        if best is None or elapsed < best:
+            best = elapsed
+
+    return best
+
+# Gets the ETAs seen during a simulated print, one per refresh, wandering around the true finish time.
+# rng (Random) - The random number generator.
+# count (int) - The number of ETAs.
+def get_print_etas(rng, count):
+
+    finish = datetime.datetime(2026, 1, 5, 13, 0, 0)
+
+    return [finish + datetime.timedelta(seconds = rng.randint(-30, 30), microseconds = rng.randrange(1000000)) for _ in range(count)]
+
+# Gets ETAs that are all different, spread over several days.
+# rng (Random) - The random number generator.
+# count (int) - The number of ETAs.
+def get_distinct_etas(rng, count):
+
+    start = datetime.datetime(2026, 1, 5)
+
+    return [start + datetime.timedelta(seconds = second) for second in rng.sample(range(86400 * 7), count)]
+
+# Compares the formatter with babel for a list of ETAs, for both views. Returns the number of nanoseconds per ETA.
+# etas (list) - The ETAs to format.
+# locale (string) - The locale to format with.
+def compare(etas, locale):
+
+    results = dict()
+
+    for use_twenty_four_hour_view, name in ((True, "24_hour"), (False, "12_hour")):
+
+        pattern = ETAFormatter.TWENTY_FOUR_HOUR_PATTERN if use_twenty_four_hour_view else ETAFormatter.TWELVE_HOUR_PATTERN
+
+        formatter = ETAFormatter(use_twenty_four_hour_view, locale)
+        formatter.compile()
+
+        # Make sure that both produce the same strings before timing them.
+        for eta in etas[:1000]:
+
+            if formatter.format_time(eta) != format_time(eta, pattern, locale = locale) or formatter.format_date(eta) != format_date(eta, ETAFormatter.DATE_PATTERN, locale = locale):
+                sys.exit("The formatter and babel disagree on {}".format(eta))
+
+        babel_seconds = measure(lambda: [(format_time(eta, pattern, locale = locale), format_date(eta, ETAFormatter.DATE_PATTERN, locale = locale)) for eta in etas])
+        formatter_seconds = measure(lambda: [(formatter.format_time(eta), formatter.format_date(eta)) for eta in etas])
+
+        results[name] = dict(
+            babel_ns_per_eta = babel_seconds / len(etas) * 1e9,
+            formatter_ns_per_eta = formatter_seconds / len(etas) * 1e9,
+            speedup = babel_seconds / formatter_seconds
+        )
+
+    return results
+
+def main():
+
+    parser = argparse.ArgumentParser(description = "Benchmarks formatting ETAs.")
+    parser.add_argument("--count", type = int, default = 100000, help = "The number of ETAs to format.")
+    parser.add_argument("--locale", default = "en_GB", help = "The locale to format with.")
+    parser.add_argument("--seed", type = int, default = 0, help = "The seed for the ETAs.")
+    parser.add_argument("--output", help = "The file to write the results to, as JSON.")
+    arguments = parser.parse_args()
+
+    rng = random.Random(arguments.seed)
+
+    # The formatter's first use includes loading babel and the locale's data.
+    start = time.perf_counter()
+
+    ETAFormatter(locale = arguments.locale).compile()
+
+    compile_seconds = time.perf_counter() - start
+
+    results = dict(
+        commit = get_commit(),
+        python = sys.version.split()[0],
+        count = arguments.count,
+        locale = arguments.locale,
+        compile_seconds = compile_seconds,
+        print_etas = compare(get_print_etas(rng, arguments.count), arguments.locale),
+        distinct_etas = compare(get_distinct_etas(rng, arguments.count), arguments.locale)
+    )
+
+    print(json.dumps(results, indent = 4, sort_keys = True))
+
+    if arguments.output:
+
+        with open(arguments.output, "w") as file:
+            json.dump(results, file, indent = 4, sort_keys = True)
+
+if __name__ == "__main__":
+    main()
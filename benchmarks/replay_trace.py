@@ -0,0 +1,222 @@
+#!/usr/bin/env python
+# Replays a trace recorded by the plugin (see "Record traces" in the README) through the plugin, using a virtual clock
+# in place of the system clock, so that a real print can be reproduced and profiled offline. The trace is replayed
+# several times, and the commands and UI messages sent by the plugin are compared between runs, as they should
+# be identical. Requires OctoPrint to be installed, but not running.
+#
+# Usage: python benchmarks/replay_trace.py TRACE [--speed 1000] [--runs 2] [--profile] [--output results.json]
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import argparse
+import cProfile
+import hashlib
+import json
+import logging
+import math
+import pstats
+import shutil
+import sys
+import tempfile
+import time
+
+from simulate_print import SimulatedPluginManager, SimulatedPrinter, create_plugin, get_commit
+
+from octoprint_print_eta.tracing import CURRENT_DATA, EVENT, PROGRESS, TIMER, VirtualClock, read_trace
+
+# Stands in for OctoPrint's printer, reporting the printer's current data as recorded in the trace.
+class ReplayPrinter(SimulatedPrinter):
+
+    def __init__(self):
+
+        super(ReplayPrinter, self).__init__()
+
+        self.current_data = dict()
+
+        # The commands sent by the plugin, in order.
+        self.sent = []
+
+    def get_current_data(self):
+        return self.current_data
+
+    def commands(self, commands, **kwargs):
+
+        super(ReplayPrinter, self).commands(commands, **kwargs)
+
+        self.sent.append(commands)
+
+# Stands in for OctoPrint's plugin manager, keeping the messages sent to the UI.
+class ReplayPluginManager(SimulatedPluginManager):
+
+    def __init__(self):
+
+        super(ReplayPluginManager, self).__init__()
+
+        self.sent = []
+
+    def send_plugin_message(self, identifier, data):
+
+        super(ReplayPluginManager, self).send_plugin_message(identifier, data)
+
+        self.sent.append(data)
+
+# Replays a trace through a new plugin instance. Returns a digest of everything the plugin sent.
+# header (dictionary) - The trace's header.
+# records (list) - The trace's records.
+# speed (float) - The maximum speed to replay at, relative to real time. 0 to replay as fast as possible.
+def replay(header, records, speed):
+
+    settings = dict(header["settings"])
+
+    # The files that were printed aren't available, and the trace shouldn't be recorded again.
+    settings.update(enable_gcode_analysis = False, enable_trace_recording = False)
+
+    data_folder = tempfile.mkdtemp(prefix = "print_eta_replay_")
+
+    try:
+
+        printer = ReplayPrinter()
+        plugin_manager = ReplayPluginManager()
+
+        # Run everything that depends on the time from the virtual clock.
+        clock = VirtualClock(header["start"])
+
+        plugin = create_plugin(data_folder, settings, printer, plugin_manager, clock)
+
+        # The printer message timer's ticks are replayed from the trace, rather than rotated by the scheduler.
+        plugin.start_timer = lambda: None
+
+        # Refreshes happen on the clock's second boundaries, as they do with the real scheduler.
+        def advance(until):
+
+            boundary = math.floor(clock.time()) + 1
+
+            while boundary <= until:
+
+                clock.now = boundary
+
+                plugin.refresh_scheduler.tick()
+                plugin.worker.tick()
+
+                boundary += 1
+
+            clock.now = until
+
+        real_start = time.perf_counter()
+
+        for record in records:
+
+            when = header["start"] + record[0] / 1000.0
+
+            kind = record[1]
+
+            # Printer data is recorded as soon as a refresh reads it, so make it available to that refresh.
+            if kind == CURRENT_DATA:
+                printer.current_data = record[3] or dict()
+
+            advance(when)
+
+            printer.printing = bool(record[2])
+
+            if kind == EVENT:
+                plugin.on_event(record[3], record[4])
+
+            elif kind == PROGRESS:
+                plugin.on_print_progress(record[3], record[4], record[5])
+
+            elif kind == TIMER:
+                plugin.on_timer_elapsed()
+
+            # Don't replay faster than requested.
+            if speed > 0:
+
+                delay = (clock.time() - header["start"]) / speed - (time.perf_counter() - real_start)
+
+                if delay > 0:
+                    time.sleep(delay)
+
+        # Allow the refresh requested by the last record to happen.
+        advance(clock.time() + 1)
+
+        output = json.dumps(dict(commands = printer.sent, messages = plugin_manager.sent), sort_keys = True)
+
+        return hashlib.sha1(output.encode("utf-8")).hexdigest(), len(printer.sent), len(plugin_manager.sent)
+
+    finally:
+        shutil.rmtree(data_folder, ignore_errors = True)
+
+def main():
+
+    parser = argparse.ArgumentParser(description = "Replays a trace recorded by the plugin.")
+    parser.add_argument("trace", help = "The trace file to replay.")
+    parser.add_argument("--speed", type = float, default = 1000, help = "The maximum speed to replay at, relative to real time. 0 for no limit.")
+    parser.add_argument("--runs", type = int, default = 2, help = "The number of times to replay the trace.")
+    parser.add_argument("--profile", action = "store_true", help = "Print the functions that took the most time during the first run.")
+    parser.add_argument("--output", help = "The file to write the results to, as JSON.")
+    arguments = parser.parse_args()
+
+    logging.getLogger("octoprint.plugins.print_eta").setLevel(logging.WARNING)
+
+    header, records = read_trace(arguments.trace)
+
+    digests = []
+
+    cpu_time = None
+    wall_time = None
+
+    for run in range(arguments.runs):
+
+        profiler = cProfile.Profile() if arguments.profile and run == 0 else None
+
+        cpu_start = time.process_time()
+        wall_start = time.perf_counter()
+
+        if profiler is not None:
+            profiler.enable()
+
+        digest, command_count, message_count = replay(header, records, arguments.speed)
+
+        if profiler is not None:
+
+            profiler.disable()
+
+            pstats.Stats(profiler, stream = sys.stderr).sort_stats("cumulative").print_stats(20)
+
+        # Report the fastest run, as it's the least affected by other activity on the machine.
+        if cpu_time is None or time.process_time() - cpu_start < cpu_time:
+
+            cpu_time = time.process_time() - cpu_start
+            wall_time = time.perf_counter() - wall_start
+
+        digests.append(digest)
+
+    traced_seconds = records[-1][0] / 1000.0 if len(records) > 0 else 0.0
+
+    results = dict(
+        commit = get_commit(),
+        python = sys.version.split()[0],
+        trace = arguments.trace,
+        records = len(records),
+        traced_seconds = traced_seconds,
+        runs = arguments.runs,
+        cpu_seconds = cpu_time,
+        wall_seconds = wall_time,
+        speedup = traced_seconds / wall_time if wall_time > 0 else None,
+        serial_commands = command_count,
+        socket_messages = message_count,
+        digest = digests[0],
+        identical = len(set(digests)) == 1
+    )
+
+    print(json.dumps(results, indent = 4, sort_keys = True))
+
+    if arguments.output:
+
+        with open(arguments.output, "w") as file:
+            json.dump(results, file, indent = 4, sort_keys = True)
+
+    if not results["identical"]:
+        sys.exit("The replays sent different commands or messages: " + ", ".join(digests))
+
+if __name__ == "__main__":
+    main()
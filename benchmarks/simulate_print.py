@@ -0,0 +1,318 @@
+#!/usr/bin/env python
+# Benchmarks the plugin by running simulated prints through it at accelerated speed, using stand-ins for
+# OctoPrint's printer, settings and plugin manager. Requires OctoPrint to be installed, but not running.
+#
+# Usage: python benchmarks/simulate_print.py [--hours 4] [--prints 3] [--output results.json]
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import argparse
+import json
+import logging
+import math
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from octoprint.events import Events
+
+import octoprint_print_eta
+
+from octoprint_print_eta.metrics import Histogram
+from octoprint_print_eta.scheduler import RefreshScheduler
+from octoprint_print_eta.tracing import VirtualClock
+
+# Stands in for OctoPrint's printer, reporting the progress of a simulated print.
+class SimulatedPrinter(object):
+
+    def __init__(self):
+
+        self.printing = False
+        self.progress = dict(completion = None, filepos = None, printTime = None, printTimeLeft = None)
+
+        # The commands sent by the plugin.
+        self.command_count = 0
+
+    def get_current_data(self):
+        return dict(progress = dict(self.progress), job = dict(file = dict(origin = "local", path = "simulated.gcode")))
+
+    def is_printing(self):
+        return self.printing
+
+    def commands(self, commands, **kwargs):
+        self.command_count += len(commands) if isinstance(commands, list) else 1
+
+# Stands in for the plugin's settings, returning the defaults unless overridden.
+class SimulatedSettings(object):
+
+    def __init__(self, values):
+        self.values = values
+
+    def get(self, path, **kwargs):
+        return self.values[path[0]]
+
+    def get_int(self, path, **kwargs):
+        return int(self.values[path[0]])
+
+    def get_float(self, path, **kwargs):
+        return float(self.values[path[0]])
+
+# Stands in for OctoPrint's plugin manager, counting the messages sent to the UI.
+class SimulatedPluginManager(object):
+
+    def __init__(self):
+        self.message_count = 0
+
+    def send_plugin_message(self, identifier, data):
+        self.message_count += 1
+
+class SimulatedPrinterProfileManager(object):
+
+    def get_current_or_default(self):
+        return dict(id = "_default")
+
+class SimulatedFileManager(object):
+
+    def path_on_disk(self, origin, path):
+        return None
+
+    def get_metadata(self, origin, path):
+        return None
+
+# Stands in for the refresh scheduler, so that refreshes and rotations happen on simulated rather than real second
+# boundaries. Driven by calling tick once the simulated clock has moved on, rather than by its own thread.
+class SimulatedScheduler(RefreshScheduler):
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    # Performs whatever is due at the simulated time, counting it as a wakeup of the real scheduler's thread.
+    def tick(self):
+
+        with self.condition:
+
+            deadline = self.get_deadline()
+
+            if deadline is not None and deadline <= self.clock():
+                self.wakeup_count += 1
+
+        super(SimulatedScheduler, self).tick()
+
+# Stands in for the worker, so that refreshes happen synchronously within the simulated second they're requested in.
+class SimulatedWorker(object):
+
+    def __init__(self, callback, merge):
+
+        self.callback = callback
+        self.merge = merge
+
+        self.pending = None
+        self.has_pending = False
+
+    def stop(self):
+        self.has_pending = False
+
+    def submit(self, request = None):
+
+        if self.has_pending:
+            request = self.merge(self.pending, request)
+
+        self.pending = request
+        self.has_pending = True
+
+    # Processes the waiting request, if there is one.
+    def tick(self):
+
+        if self.has_pending:
+
+            self.has_pending = False
+
+            self.callback(self.pending)
+
+# Creates a plugin instance connected to the stand-ins, with its refreshes and rotations driven by a virtual clock.
+# printer and plugin_manager can be given to use other stand-ins for them, and clock to control the virtual clock.
+def create_plugin(data_folder, settings, printer = None, plugin_manager = None, clock = None):
+
+    if clock is None:
+        clock = VirtualClock(time.time())
+
+    plugin = octoprint_print_eta.PrintETAPlugin()
+
+    values = plugin.get_settings_defaults()
+    values.update(settings)
+
+    plugin._identifier = "print_eta"
+    plugin._data_folder = data_folder
+    plugin._settings = SimulatedSettings(values)
+    plugin._printer = printer or SimulatedPrinter()
+    plugin._plugin_manager = plugin_manager or SimulatedPluginManager()
+    plugin._printer_profile_manager = SimulatedPrinterProfileManager()
+    plugin._file_manager = SimulatedFileManager()
+
+    plugin.on_after_startup()
+
+    plugin.refresh_scheduler.stop()
+    plugin.worker.stop()
+
+    plugin.worker = SimulatedWorker(plugin.process_refresh, plugin.worker.merge)
+    plugin.refresh_scheduler = SimulatedScheduler(plugin.refresh_scheduler.refresh, plugin.refresh_scheduler.rotate, clock = clock.time)
+
+    # Run everything else that depends on the time from the virtual clock too.
+    plugin.get_current_time = clock.today
+    plugin.eta_calibrator.clock = clock.time
+    plugin.command_dispatcher.clock = clock.time
+
+    return plugin
+
+# Runs a single simulated print through the plugin, one simulated second at a time.
+def simulate_print(plugin, clock, hours, rng):
+
+    printer = plugin._printer
+    duration = int(hours * 3600)
+
+    printer.printing = True
+    printer.progress.update(completion = 0.0, filepos = 0, printTime = 0, printTimeLeft = None)
+
+    plugin.on_event(Events.PRINT_STARTED, dict(origin = "local", path = "simulated.gcode", name = "simulated.gcode"))
+
+    previous_progress = 0
+
+    for second in range(1, duration + 1):
+
+        clock.advance(1)
+
+        completion = second * 100.0 / duration
+
+        # OctoPrint's estimate wanders around the true time left.
+        printer.progress.update(
+            completion = completion,
+            filepos = second,
+            printTime = second,
+            printTimeLeft = max(0, int((duration - second) * rng.uniform(0.9, 1.1)))
+        )
+
+        if int(completion) > previous_progress:
+
+            previous_progress = int(completion)
+
+            plugin.on_print_progress("local", "simulated.gcode", previous_progress)
+
+        plugin.refresh_scheduler.tick()
+        plugin.worker.tick()
+
+    printer.printing = False
+
+    plugin.on_event(Events.PRINT_DONE, dict(origin = "local", path = "simulated.gcode", name = "simulated.gcode", time = duration))
+
+    clock.advance(1)
+
+    plugin.refresh_scheduler.tick()
+    plugin.worker.tick()
+
+# Gets the average number of seconds taken to time a call and record it, as the plugin's instrumentation does.
+def measure_metrics_overhead(iterations = 100000):
+
+    histogram = Histogram()
+
+    start = time.perf_counter()
+
+    for _ in range(iterations):
+
+        call_start = time.perf_counter()
+
+        histogram.observe(time.perf_counter() - call_start)
+
+    return (time.perf_counter() - start) / iterations
+
+# Gets the current commit, if the benchmark is being run from a git repository.
+def get_commit():
+
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd = os.path.dirname(os.path.abspath(__file__)), stderr = subprocess.DEVNULL).decode("ascii").strip()
+
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+
+    parser = argparse.ArgumentParser(description = "Benchmarks the plugin using simulated prints.")
+    parser.add_argument("--hours", type = float, default = 4, help = "The duration of each simulated print, in hours.")
+    parser.add_argument("--prints", type = int, default = 3, help = "The number of prints to simulate.")
+    parser.add_argument("--display", default = "generic", help = "The printer display profile to fit printer messages to.")
+    parser.add_argument("--seed", type = int, default = 0, help = "The seed for the simulated estimates.")
+    parser.add_argument("--output", help = "The file to write the results to, as JSON.")
+    arguments = parser.parse_args()
+
+    logging.getLogger("octoprint.plugins.print_eta").setLevel(logging.WARNING)
+
+    data_folder = tempfile.mkdtemp(prefix = "print_eta_benchmark_")
+
+    try:
+
+        clock = VirtualClock(math.floor(time.time()))
+
+        plugin = create_plugin(data_folder, dict(printer_display = arguments.display), clock = clock)
+
+        rng = random.Random(arguments.seed)
+
+        tracemalloc.start()
+
+        cpu_start = time.process_time()
+        wall_start = time.time()
+
+        for _ in range(arguments.prints):
+            simulate_print(plugin, clock, arguments.hours, rng)
+
+        cpu_time = time.process_time() - cpu_start
+        wall_time = time.time() - wall_start
+
+        _, peak_memory = tracemalloc.get_traced_memory()
+
+        tracemalloc.stop()
+
+    finally:
+        shutil.rmtree(data_folder, ignore_errors = True)
+
+    simulated_hours = arguments.hours * arguments.prints
+
+    metrics_observations = sum(histogram.count for histograms in plugin.metrics.histograms.values() for histogram in histograms.values())
+    metrics_seconds = metrics_observations * measure_metrics_overhead()
+
+    results = dict(
+        commit = get_commit(),
+        python = sys.version.split()[0],
+        simulated_hours = simulated_hours,
+        cpu_seconds = cpu_time,
+        cpu_seconds_per_print_hour = cpu_time / simulated_hours,
+        wall_seconds = wall_time,
+        peak_memory_bytes = peak_memory,
+        socket_messages = plugin._plugin_manager.message_count,
+        serial_commands = plugin._printer.command_count,
+        scheduler_wakeups = plugin.refresh_scheduler.wakeup_count,
+        scheduler_wakeups_per_print_hour = plugin.refresh_scheduler.wakeup_count / simulated_hours,
+        printer_display = arguments.display,
+        printer_message_bytes = plugin.display_encoder.get_statistics()["output_bytes"],
+        printer_message_bytes_saved = plugin.display_encoder.get_statistics()["saved_bytes"],
+        metrics_observations = metrics_observations,
+        metrics_cpu_fraction = metrics_seconds / cpu_time
+    )
+
+    print(json.dumps(results, indent = 4, sort_keys = True))
+
+    if arguments.output:
+
+        with open(arguments.output, "w") as file:
+            json.dump(results, file, indent = 4, sort_keys = True)
+
+if __name__ == "__main__":
+    main()
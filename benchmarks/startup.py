@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# Benchmarks the plugin's share of OctoPrint's startup time: how long the plugin's module takes to import once
+# OctoPrint's own modules are loaded, how long on_after_startup takes, and how long the first ETA takes to calculate.
+# Each run uses a fresh interpreter, so that nothing is already imported or cached.
+#
+# Usage: python benchmarks/startup.py [--runs 5] [--output results.json]
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+from simulate_print import get_commit
+
+BENCHMARKS_FOLDER = os.path.dirname(os.path.abspath(__file__))
+
+# Runs in the fresh interpreter, printing the timings as JSON.
+MEASURE = """
+import json, shutil, sys, tempfile, time
+
+sys.path.insert(0, {benchmarks_folder!r})
+
+import octoprint.events, octoprint.plugin, octoprint.util
+
+start = time.perf_counter()
+
+import octoprint_print_eta
+
+import_seconds = time.perf_counter() - start
+
+from simulate_print import create_plugin
+
+data_folder = tempfile.mkdtemp(prefix = "print_eta_benchmark_")
+
+try:
+
+    start = time.perf_counter()
+
+    plugin = create_plugin(data_folder, dict())
+
+    startup_seconds = time.perf_counter() - start
+
+    plugin._printer.printing = True
+    plugin._printer.progress.update(completion = 1.0, filepos = 100, printTime = 60, printTimeLeft = 6000)
+
+    start = time.perf_counter()
+
+    plugin.calculate_messages()
+
+    first_eta_seconds = time.perf_counter() - start
+
+finally:
+    shutil.rmtree(data_folder, ignore_errors = True)
+
+print(json.dumps(dict(import_seconds = import_seconds, startup_seconds = startup_seconds, first_eta_seconds = first_eta_seconds)))
+"""
+
+def main():
+
+    parser = argparse.ArgumentParser(description = "Benchmarks the plugin's import and startup time.")
+    parser.add_argument("--runs", type = int, default = 5, help = "The number of fresh interpreters to measure in.")
+    parser.add_argument("--output", help = "The file to write the results to, as JSON.")
+    arguments = parser.parse_args()
+
+    code = MEASURE.format(benchmarks_folder = BENCHMARKS_FOLDER)
+
+    runs = []
+
+    for _ in range(arguments.runs):
+        runs.append(json.loads(subprocess.check_output([sys.executable, "-c", code]).decode("utf-8").strip().splitlines()[-1]))
+
+    results = dict(
+        commit = get_commit(),
+        python = sys.version.split()[0],
+        runs = arguments.runs
+    )
+
+    # Report the best run of each measurement, as it's the least affected by other activity on the machine.
+    for name in ("import_seconds", "startup_seconds", "first_eta_seconds"):
+        results[name] = min(run[name] for run in runs)
+
+    print(json.dumps(results, indent = 4, sort_keys = True))
+
+    if arguments.output:
+
+        with open(arguments.output, "w") as file:
+            json.dump(results, file, indent = 4, sort_keys = True)
+
+if __name__ == "__main__":
+    main()
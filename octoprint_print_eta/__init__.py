@@ -1,30 +1,68 @@
 from __future__ import absolute_import, unicode_literals
 import logging
-from babel.dates import format_date, format_time
 
 from octoprint.events import Events
-from octoprint.util import RepeatedTimer
 
 import octoprint.plugin
+import collections
 import datetime
+import math
+import os
+import threading
+import time
+
+from .analysis import GcodeAnalyser
+from .calibration import ETACalibrator
+from .dispatcher import CommandDispatcher
+from .display import DisplayEncoder
+from .formatting import ETAFormatter, format_duration, format_durations
+from .history import ETAHistory
+from .metrics import MetricsRegistry, timed
+from .profiles import ProfileCache, get_content_hash
+from .rotation import MessagePlan, MessageValues, RefreshRequest, merge_refresh_requests
+from .scheduler import RefreshScheduler
+from .smoothing import ETASmoother
+from .snapshot import ETASnapshot, MessageState
+from .timeline import QueueProjector, get_timestamp, parse_time_of_day
+from .tracing import TraceRecorder
+from .worker import ETAWorker
 
 class PrintETAPlugin(octoprint.plugin.AssetPlugin,
+    octoprint.plugin.BlueprintPlugin,
     octoprint.plugin.EventHandlerPlugin,
     octoprint.plugin.ProgressPlugin,
     octoprint.plugin.SettingsPlugin,
+    octoprint.plugin.ShutdownPlugin,
+    octoprint.plugin.SimpleApiPlugin,
     octoprint.plugin.StartupPlugin,
     octoprint.plugin.TemplatePlugin):
 
+    # The events that affect the printer's state, and therefore the messages being shown.
+    PRINT_EVENTS = frozenset(value for name, value in vars(Events).items() if not name.startswith("_") and isinstance(value, str) and value.startswith("Print"))
+
+    # The events that the plugin reacts to. All other events are ignored before any other work is done.
+    HANDLED_EVENTS = PRINT_EVENTS | frozenset([Events.CLIENT_OPENED, Events.FILE_ADDED, Events.FILE_REMOVED, Events.FILE_SELECTED, Events.UPLOAD])
+
+    # The maximum number of analysed G-code files to keep in memory.
+    MAX_GCODE_INDEXES = 4
+
+    # The maximum number of trace files to keep. The oldest are deleted first.
+    MAX_TRACES = 10
+
+    # The longest estimate accepted for a queued file, in seconds (a year).
+    MAX_PRINT_TIME_ESTIMATE = 365 * 86400
+
     # Initialize the plugin.
     def __init__(self):
 
         self.logger = logging.getLogger("octoprint.plugins.print_eta")
 
-        # The ETA string passed to the OctoPrint UI.
-        self.eta_string = "-"
+        # Records how much work the plugin is doing.
+        self.metrics = MetricsRegistry()
 
-        # The message string passed to the printer, if enabled.
-        self.printer_message = ""
+        # The ETA string passed to the OctoPrint UI and the message string passed to the printer, along with the values
+        # they were calculated from. Replaced as a whole, so that it can be read safely from any thread.
+        self.state = MessageState()
 
         # Whether the plugin has properly started up. Prevents issues as a result of trying to calculate messages too early.
         self.has_started_up = False
@@ -32,19 +70,74 @@ class PrintETAPlugin(octoprint.plugin.AssetPlugin,
         # Used to compare ETA strings before pushing them to the UI.
         self.previous_eta_string = ""
 
+        # Used to compare the ETA timestamp before pushing updates to the UI, which displays it itself.
+        self.previous_eta = None
+
         # Used to compare printer messages before pushing them to the printer.
         self.previous_printer_message = ""
 
-        # Will be used for the timer for printer messages.
-        self.timer = None
+        # Used to calculate and send the messages on a dedicated thread, so that OctoPrint's callbacks return immediately.
+        # Each request is a RefreshRequest. Waiting requests are replaced by newer ones, but a request to move on to the
+        # next printer message or to change the order of printer messages is never lost.
+        self.worker = ETAWorker(self.process_refresh, merge = merge_refresh_requests)
 
-        # Used to determine the message that should be calculated.
+        # Used to refresh the messages only when they could have changed, combining bursts of updates, and to rotate
+        # the printer messages.
+        self.refresh_scheduler = RefreshScheduler(lambda: self.worker.submit(RefreshRequest(False, None)), self.on_timer_elapsed)
+
+        # Used to determine the message that should be calculated. Only changed on the worker's thread, once started.
         # 0: ETA message.
         # 1: Time elapsed message.
         # 2: Time remaining message.
         # 3: Progress percentage message.
         self.printer_message_mode = 0
 
+        # The order in which printer messages are shown. Compiled from the user's preferences on startup, and whenever
+        # they change. Only replaced on the worker's thread, once started.
+        self.message_plan = MessagePlan([], self.get_time_string)
+
+        # The latest ETA information served by the API. Replaced whenever the messages change.
+        self.snapshot = ETASnapshot(self.get_snapshot_data(self.state))
+
+        # Indexes of analysed G-code files, keyed by their path. Only used if G-code analysis is enabled.
+        self.gcode_indexes = collections.OrderedDict()
+        self.gcode_indexes_lock = threading.Lock()
+
+        # The paths of the G-code files currently being analysed.
+        self.gcode_analysis_paths = set()
+
+        # Used to store the analysis of G-code files between prints. Created on startup, once the data folder is available.
+        self.profile_cache = None
+
+        # Used to learn how far off the estimated time left is, and correct it. Created on startup.
+        self.eta_calibrator = None
+
+        # Used to stop the ETA from jumping around between estimates. Configured with the user's preferences on startup.
+        self.eta_smoother = ETASmoother()
+
+        # Used to format the ETA. Configured with the user's preferences on startup.
+        self.eta_formatter = None
+
+        # Used to format the finish times of queued prints. Separate from the ETA's formatter, as its caches aren't
+        # thread-safe, and projections are made on the API's threads while the ETA is formatted on the worker's thread.
+        self.queue_formatter = None
+        self.queue_formatter_lock = threading.Lock()
+
+        # Used to send commands to the printer. Created on startup, once the printer is available.
+        self.command_dispatcher = None
+
+        # Used to fit printer messages to the printer's display. Configured with the user's preferences on startup.
+        self.display_encoder = DisplayEncoder()
+
+        # Records how the ETA moves during the current or last print, for the chart.
+        self.eta_history = ETAHistory()
+
+        # Used to project when queued prints will start and finish. Configured with the user's preferences on startup.
+        self.queue_projector = QueueProjector()
+
+        # Records what the plugin receives from OctoPrint during a print, if enabled. None when not recording.
+        self.trace_recorder = None
+
     # Defines the static assets the plugin offers.
     def get_assets(self):
 
@@ -70,6 +163,9 @@ class PrintETAPlugin(octoprint.plugin.AssetPlugin,
             # Whether to remove colons from ETA strings (required for some printer firmwares).
             remove_colons = False,
 
+            # The printer's display, which printer messages are fitted to. One of the keys of display.PROFILES.
+            printer_display = "generic",
+
             # Whether to enable messages on the printer's screen.
             enable_printer_messages = True,
 
@@ -86,14 +182,50 @@ class PrintETAPlugin(octoprint.plugin.AssetPlugin,
             show_progress_printer_message = False,
 
             # The interval between printer messages.
-            printer_message_interval = 10
+            printer_message_interval = 10,
+
+            # The minimum interval, in seconds, between progress updates (M73) being sent to the printer.
+            progress_command_interval = 0,
+
+            # The minimum interval, in seconds, between messages (M117) being sent to the printer.
+            message_command_interval = 0,
+
+            # Whether to analyse G-code files to estimate the time left, instead of relying on OctoPrint's estimate.
+            enable_gcode_analysis = False,
+
+            # The maximum size of the stored G-code analyses, in megabytes.
+            profile_cache_size = 10,
+
+            # Whether to correct the estimated time left based on how long previous prints took, instead of showing it as is.
+            show_corrected_eta = True,
+
+            # The number of seconds that the ETA must move by before the UI is updated.
+            eta_push_tolerance = 10,
+
+            # The filter used to smooth the estimated time left. One of "none", "ema" or "kalman".
+            smoothing_filter = "none",
+
+            # The number of seconds that the smoothed ETA must move by before it changes.
+            smoothing_threshold = 0,
+
+            # The number of minutes between one queued print finishing and the next starting.
+            queue_changeover_gap = 5,
+
+            # The times of day (HH:MM) between which queued prints aren't started. Empty if there are no quiet hours.
+            quiet_hours_start = "",
+            quiet_hours_end = "",
+
+            # Whether to record the events and printer data received during each print to a trace file, so that
+            # the print can be replayed later.
+            enable_trace_recording = False
         )
 
     # Allows configuration of injected navbar, sidebar, tab and settings templates.
     def get_template_configs(self):
         return [
             dict(type="navbar", custom_bindings=False),
-            dict(type="settings", custom_bindings=False)
+            dict(type="settings", custom_bindings=False),
+            dict(type="tab", name="ETA History", custom_bindings=True)
         ]
 
     # Gets the latest plugin version information.
@@ -115,12 +247,128 @@ class PrintETAPlugin(octoprint.plugin.AssetPlugin,
 
         self.logger.debug("on_after_startup called.")
 
+        self.load_settings()
+
+        self.eta_formatter = ETAFormatter(self.setting_use_twenty_four_hour_view)
+        self.queue_formatter = ETAFormatter(self.setting_use_twenty_four_hour_view)
+
+        self.eta_smoother = ETASmoother(self.setting_smoothing_filter, self.setting_smoothing_threshold)
+
+        self.profile_cache = ProfileCache(os.path.join(self.get_plugin_data_folder(), "profiles"), self.setting_profile_cache_size * 1024 * 1024)
+
+        self.eta_calibrator = ETACalibrator(os.path.join(self.get_plugin_data_folder(), "calibration"))
+        self.eta_calibrator.load()
+
+        self.command_dispatcher = CommandDispatcher(self._printer.commands, self.get_command_intervals())
+
+        self.display_encoder.configure(self.setting_printer_display, self.setting_remove_colons)
+
+        self.configure_queue_projector()
+
+        # Report the counts kept by other parts of the plugin.
+        self.metrics.collector("commands_sent_total", "Commands sent to the printer.",
+            lambda: dict((("command", command), count) for command, count in self.command_dispatcher.get_statistics()["sent"].items()))
+
+        self.metrics.collector("commands_suppressed_total", "Commands not sent to the printer because they were repeated or replaced.",
+            lambda: dict((("command", command), count) for command, count in self.command_dispatcher.get_statistics()["suppressed"].items()))
+
+        self.metrics.collector("refresh_requests_total", "Message refreshes requested.", lambda: { None: self.refresh_scheduler.request_count })
+        self.metrics.collector("refreshes_total", "Message refreshes performed.", lambda: { None: self.refresh_scheduler.run_count })
+        self.metrics.collector("refresh_scheduler_wakeups_total", "Times the refresh scheduler's thread woke up.", lambda: { None: self.refresh_scheduler.wakeup_count })
+
+        self.metrics.collector("smoothing_estimates_total", "Estimates passed through the smoothing filter.", lambda: { None: self.eta_smoother.update_count })
+        self.metrics.collector("smoothing_suppressed_total", "Estimates that didn't change the smoothed ETA.", lambda: { None: self.eta_smoother.suppressed_count })
+
+        self.metrics.collector("printer_message_bytes_total", "Size of the printer messages before and after fitting them to the display.",
+            lambda: dict((("stage", stage), self.display_encoder.get_statistics()[stage + "_bytes"]) for stage in ("input", "output")))
+
+        self.metrics.collector("printer_messages_shortened_total", "Printer messages that were too long for the display.",
+            lambda: dict((("method", method), self.display_encoder.get_statistics()[method]) for method in ("abbreviated", "truncated")))
+
+        self.metrics.collector("worker_requests_total", "Refresh requests submitted to the worker.", lambda: { None: self.worker.submitted_count })
+        self.metrics.collector("worker_requests_processed_total", "Refresh requests processed by the worker.", lambda: { None: self.worker.processed_count })
+        self.metrics.collector("worker_requests_dropped_total", "Refresh requests replaced by a newer request before being processed.", lambda: { None: self.worker.dropped_count })
+
+        # The worker isn't running yet, so the order can be applied straight away.
+        self.apply_message_plan(self.compile_message_plan())
+
+        self.worker.start()
+
+        self.refresh_scheduler.start()
+
+        self.has_started_up = True
+
+        # Load the formatter's locale data in the background, so that it's ready before the first print.
+        thread = threading.Thread(target = self.eta_formatter.compile, name = "PrintETA formatter preload")
+        thread.daemon = True
+        thread.start()
+
+    # Called by OctoPrint just before the server shuts down.
+    def on_shutdown(self):
+
+        self.refresh_scheduler.stop()
+
+        self.worker.stop()
+
+        self.stop_timer()
+
+        self.stop_trace()
+
+    # Called by OctoPrint when the user saves the plugin's settings. Applies the new settings to the running plugin,
+    # including any print in progress, without having to restart OctoPrint.
+    # data (dictionary) - The settings that were changed.
+    def on_settings_save(self, data):
+
+        octoprint.plugin.SettingsPlugin.on_settings_save(self, data)
+
+        if not self.has_started_up:
+            return
+
+        self.logger.debug("on_settings_save called.")
+
+        previous_smoothing = (self.setting_smoothing_filter, self.setting_smoothing_threshold)
+
+        self.load_settings()
+
+        self.eta_formatter.configure(self.setting_use_twenty_four_hour_view)
+        self.queue_formatter.configure(self.setting_use_twenty_four_hour_view)
+
+        self.command_dispatcher.configure(self.get_command_intervals())
+
+        self.display_encoder.configure(self.setting_printer_display, self.setting_remove_colons)
+
+        self.configure_queue_projector()
+
+        self.profile_cache.max_size = self.setting_profile_cache_size * 1024 * 1024
+
+        # Only start smoothing again if its settings have changed, as doing so forgets the current print's estimates.
+        if (self.setting_smoothing_filter, self.setting_smoothing_threshold) != previous_smoothing:
+            self.eta_smoother = ETASmoother(self.setting_smoothing_filter, self.setting_smoothing_threshold)
+
+        # The worker reads and advances the current printer message, so it applies the new order itself.
+        self.worker.submit(RefreshRequest(False, self.compile_message_plan()))
+
+        if not self.setting_enable_trace_recording:
+            self.stop_trace()
+
+        # Restart the timer, so that the new interval is used, or stop it if printer messages have been disabled.
+        self.stop_timer()
+
+        if self._printer.is_printing():
+            self.start_timer()
+
+        self.refresh_scheduler.request()
+
+    # Reads the plugin's settings.
+    def load_settings(self):
+
         # Get general settings.
         self.setting_show_progress_on_printer = self._settings.get(["show_progress_on_printer"])
         self.setting_use_twenty_four_hour_view = self._settings.get(["use_twenty_four_hour_view"])
 
         # Get formatting settings.
         self.setting_remove_colons = self._settings.get(["remove_colons"])
+        self.setting_printer_display = self._settings.get(["printer_display"])
 
         # Get printer message settings.
         self.setting_enable_printer_messages = self._settings.get(["enable_printer_messages"])
@@ -128,29 +376,117 @@ class PrintETAPlugin(octoprint.plugin.AssetPlugin,
         self.setting_show_time_elapsed_printer_message = self._settings.get(["show_time_elapsed_printer_message"])
         self.setting_show_time_remaining_printer_message = self._settings.get(["show_time_remaining_printer_message"])
         self.setting_show_progress_printer_message = self._settings.get(["show_progress_printer_message"])
-        self.setting_printer_message_interval = self._settings.get(["printer_message_interval"])
+        self.setting_printer_message_interval = self.get_number_setting("printer_message_interval", self._settings.get_int)
+
+        # Get printer command settings.
+        self.setting_progress_command_interval = self.get_number_setting("progress_command_interval", self._settings.get_float)
+        self.setting_message_command_interval = self.get_number_setting("message_command_interval", self._settings.get_float)
+
+        # Get estimation settings.
+        self.setting_enable_gcode_analysis = self._settings.get(["enable_gcode_analysis"])
+        self.setting_profile_cache_size = self.get_number_setting("profile_cache_size", self._settings.get_int)
+        self.setting_show_corrected_eta = self._settings.get(["show_corrected_eta"])
+        self.setting_smoothing_filter = self._settings.get(["smoothing_filter"])
+        self.setting_smoothing_threshold = self.get_number_setting("smoothing_threshold", self._settings.get_float)
+
+        # Get queue settings.
+        self.setting_queue_changeover_gap = self.get_number_setting("queue_changeover_gap", self._settings.get_int)
+        self.setting_quiet_hours_start = self._settings.get(["quiet_hours_start"])
+        self.setting_quiet_hours_end = self._settings.get(["quiet_hours_end"])
+
+        # Get diagnostics settings.
+        self.setting_enable_trace_recording = self._settings.get(["enable_trace_recording"])
+
+        # Get UI settings.
+        self.setting_eta_push_tolerance = self.get_number_setting("eta_push_tolerance", self._settings.get_float)
 
         # Previously, the interval was set in minutes however, if you're looking for information at a glance,
         # this may be too long a period. This setting was changed on 20/09/2021.
         if self.setting_printer_message_interval < 10:
             self.setting_printer_message_interval = 10;
 
-        # If the ETA message is disabled in the cycle, calculate the correct starting mode.
-        if not self.setting_show_eta_printer_message:
-            self.printer_message_mode = self.get_next_printer_message_mode()
+    # Reads a numeric setting. Settings saved from the UI's number fields are stored as strings, so are converted,
+    # and settings that can't be converted fall back to their default.
+    # key (string) - The setting's name.
+    # get (function) - The settings getter to convert with (e.g. self._settings.get_int).
+    def get_number_setting(self, key, get):
 
-        self.has_started_up = True
+        value = get([key])
+
+        if value is None:
+            value = self.get_settings_defaults()[key]
+
+        return value
+
+    # Gets the minimum interval between commands being sent to the printer, keyed by command type.
+    def get_command_intervals(self):
+
+        return dict(
+            M73 = self.setting_progress_command_interval,
+            M117 = self.setting_message_command_interval
+        )
+
+    # Applies the queue settings to the queue projector.
+    def configure_queue_projector(self):
+
+        self.queue_projector.configure(
+            self.setting_queue_changeover_gap * 60,
+            parse_time_of_day(self.setting_quiet_hours_start),
+            parse_time_of_day(self.setting_quiet_hours_end)
+        )
+
+    # Compiles the order in which printer messages are shown from the settings. Returns the MessagePlan.
+    def compile_message_plan(self):
+
+        enabled_modes = []
+
+        if self.setting_show_eta_printer_message:
+            enabled_modes.append(MessagePlan.ETA)
+
+        if self.setting_show_time_elapsed_printer_message:
+            enabled_modes.append(MessagePlan.TIME_ELAPSED)
+
+        if self.setting_show_time_remaining_printer_message:
+            enabled_modes.append(MessagePlan.TIME_REMAINING)
+
+        if self.setting_show_progress_printer_message:
+            enabled_modes.append(MessagePlan.PROGRESS)
+
+        return MessagePlan(enabled_modes, self.get_time_string)
+
+    # Starts showing printer messages in a new order. Runs on the worker's thread, once it's started.
+    # message_plan (MessagePlan) - The order in which to show printer messages.
+    def apply_message_plan(self, message_plan):
+
+        # If the current message is no longer enabled, start from the beginning of the new order.
+        if self.printer_message_mode not in message_plan.modes:
+            self.printer_message_mode = message_plan.get_first_mode()
+
+        self.message_plan = message_plan
 
     # Called by OctoPrint upon processing of a fired event on the platform.
     # event (string) - The type of event that got fired, see the list of events for possible values: https://docs.octoprint.org/en/master/events/index.html#sec-events-available-events
     # payload (dictionary) - The payload as provided with the event
     def on_event(self, event, payload):
 
-        self.logger.debug("on_event called ({}).".format(event))
+        # Most events are irrelevant, so discard them as cheaply as possible.
+        if event not in self.HANDLED_EVENTS:
+            return
+
+        self.logger.debug("on_event called (%s).", event)
 
         if not self.has_started_up:
             return
 
+        # Start a new trace for each print, if enabled.
+        if event == Events.PRINT_STARTED and self.setting_enable_trace_recording:
+            self.start_trace()
+
+        trace_recorder = self.trace_recorder
+
+        if trace_recorder is not None:
+            trace_recorder.record_event(event, payload, self._printer.is_printing())
+
         # Show the latest ETA message when the webpage loads.
         if event == Events.CLIENT_OPENED:
 
@@ -158,31 +494,91 @@ class PrintETAPlugin(octoprint.plugin.AssetPlugin,
 
             return
 
+        # A file added under the path of an analysed file may have different contents, so forget the old analysis.
+        if event in [Events.FILE_ADDED, Events.UPLOAD] and payload.get("storage", payload.get("target")) == "local":
+
+            # Its stored analysis is kept until it's replaced by the new contents' analysis, or removed to make room.
+            with self.gcode_indexes_lock:
+                self.gcode_indexes.pop(payload.get("path"), None)
+
+            if event == Events.FILE_ADDED:
+                return
+
+        # Analyse files as they're selected or uploaded, so that they're ready by the time they're printed.
+        if event in [Events.FILE_SELECTED, Events.UPLOAD]:
+
+            if self.setting_enable_gcode_analysis:
+                self.start_gcode_analysis(payload.get("origin", payload.get("target")), payload.get("path"))
+
+            return
+
+        # Forget the analysis of removed files, and remove the stored analysis unless another file has the same contents.
+        if event == Events.FILE_REMOVED and payload.get("storage") == "local":
+
+            with self.gcode_indexes_lock:
+                self.gcode_indexes.pop(payload.get("path"), None)
+
+            try:
+                self.profile_cache.unlink(payload.get("path"))
+
+            except Exception:
+                self.logger.exception("Failed to remove the stored analysis of %s", payload.get("path"))
+
         if self._printer.is_printing():
 
             # Event filter when printing.
-            if not event.startswith("Print"):
+            if event not in self.PRINT_EVENTS:
                 return
 
-            if self.setting_enable_printer_messages and type(self.timer) != RepeatedTimer:
+            # A new print may have changed the printer's screen, so make sure the next commands are sent.
+            if event == Events.PRINT_STARTED:
+
+                self.command_dispatcher.reset()
+
+                self.eta_smoother.reset()
+
+                self.eta_history.reset()
 
-                self.timer = RepeatedTimer(self.setting_printer_message_interval, PrintETAPlugin.on_timer_elapsed, args=[self])
+                self.eta_calibrator.start_print(self._printer_profile_manager.get_current_or_default()["id"])
 
-                self.timer.start()
+                # Make sure the file being printed has been analysed, or its stored analysis has been loaded.
+                if self.setting_enable_gcode_analysis:
+                    self.start_gcode_analysis(payload.get("origin"), payload.get("path"))
+
+            self.start_timer()
 
         else:
 
-            # Event filter while printer is idle.
-            if not event.startswith("Print") and event not in [Events.FILE_REMOVED]:
-                return
+            # Learn from prints that completed. The actual duration of other prints is unknown.
+            if event == Events.PRINT_DONE:
+                self.eta_calibrator.finish_print()
 
-            if type(self.timer) == RepeatedTimer:
+            elif event in [Events.PRINT_FAILED, Events.PRINT_CANCELLED]:
+                self.eta_calibrator.discard_print()
 
-                self.timer.cancel()
+            if event in [Events.PRINT_DONE, Events.PRINT_FAILED, Events.PRINT_CANCELLED]:
+                self.logger.info("ETA smoothing suppressed %d of %d estimates.", self.eta_smoother.suppressed_count, self.eta_smoother.update_count)
 
-                self.timer = None
+                statistics = self.display_encoder.get_statistics()
 
-        self.refresh_messages()
+                self.logger.info("Printer messages: %d bytes sent for %d bytes of messages, saving %d bytes. %d abbreviated, %d truncated.",
+                    statistics["output_bytes"], statistics["input_bytes"], statistics["saved_bytes"], statistics["abbreviated"], statistics["truncated"])
+
+                self.stop_trace()
+
+            self.stop_timer()
+
+        self.refresh_scheduler.request()
+
+    # Starts switching between printer messages, if printer messages are enabled and they aren't already switching.
+    def start_timer(self):
+
+        if self.setting_enable_printer_messages:
+            self.refresh_scheduler.start_rotation(self.setting_printer_message_interval)
+
+    # Stops switching between printer messages.
+    def stop_timer(self):
+        self.refresh_scheduler.stop_rotation()
 
     # Called by OctoPrint on minimally 1% increments during a running print job.
     # storage (string) - Location of the file
@@ -192,74 +588,128 @@ class PrintETAPlugin(octoprint.plugin.AssetPlugin,
 
         self.logger.debug("on_print_progress called.")
 
+        trace_recorder = self.trace_recorder
+
+        if trace_recorder is not None:
+            trace_recorder.record_progress(storage, path, progress, self._printer.is_printing())
+
         if self.has_started_up:
-            self.refresh_messages()
+            self.refresh_scheduler.request()
+
+    # Starts recording a new trace, replacing any trace being recorded. The oldest traces are deleted, so that no
+    # more than MAX_TRACES are kept.
+    def start_trace(self):
+
+        self.stop_trace()
+
+        folder = os.path.join(self.get_plugin_data_folder(), "traces")
+
+        try:
+
+            if os.path.isdir(folder):
+
+                names = sorted(name for name in os.listdir(folder) if name.endswith(".trace"))
+
+                for name in names[:max(0, len(names) - self.MAX_TRACES + 1)]:
+                    os.remove(os.path.join(folder, name))
+
+            settings = dict((key, self._settings.get([key])) for key in self.get_settings_defaults())
+
+            self.trace_recorder = TraceRecorder(os.path.join(folder, time.strftime("%Y%m%d-%H%M%S") + ".trace"), settings)
+
+        except (IOError, OSError):
+            self.logger.exception("Failed to start recording a trace")
+
+    # Stops recording the current trace, if one is being recorded.
+    def stop_trace(self):
+
+        trace_recorder = self.trace_recorder
+
+        if trace_recorder is None:
+            return
+
+        self.trace_recorder = None
+
+        trace_recorder.close()
+
+        self.logger.info("Recorded %d events and updates to %s (%d bytes).", trace_recorder.record_count, trace_recorder.path, trace_recorder.written_bytes)
+
+    # Gets the current local time. Can be replaced with a virtual clock, to replay a trace.
+    def get_current_time(self):
+        return datetime.datetime.today()
 
     # Calculates the required messages based on the printer's current state.
+    @timed("calculate_messages")
     def calculate_messages(self):
 
         self.logger.debug("calculate_messages called.")
 
         # Get the printer's current data, and validate that it's in a state where we can calculate the ETA.
+        start = time.perf_counter()
+
         current_data = self._printer.get_current_data()
 
+        self.metrics.histogram("call_duration_seconds", "Time taken by the plugin's methods.", ("method", "get_current_data")).observe(time.perf_counter() - start)
+
+        trace_recorder = self.trace_recorder
+
+        if trace_recorder is not None:
+            trace_recorder.record_current_data(current_data, self._printer.is_printing())
+
         # Can't proceed without progress data.
         if "progress" not in current_data:
 
-            self.eta_string = "-"
-            self.printer_message = ""
-            
+            self.state = MessageState()
+
             return
 
         progress_data = current_data["progress"]
 
-        # Can't calculate ETA without knowing how long the print has left.
-        if "printTimeLeft" not in progress_data:
+        print_time_left = progress_data.get("printTimeLeft")
 
-            self.eta_string = "-"
-            self.printer_message = ""
-            
-            return
-        
-        print_time_left = progress_data["printTimeLeft"]
+        # Use the plugin's own estimate, if the file being printed has been analysed.
+        if self.setting_enable_gcode_analysis:
+
+            analysed_print_time_left = self.get_analysed_print_time_left(current_data)
+
+            if analysed_print_time_left is not None:
+                print_time_left = analysed_print_time_left
 
         # If the print hasn't begun yet, "printTimeLeft" won't have a type.
         if type(print_time_left) != int:
 
-            self.eta_string = "-"
-            self.printer_message = ""
+            self.state = MessageState()
 
             return
 
-        # We have all the information we need to calculate the ETA by this point.
+        # Keep the estimate before it's corrected and smoothed, so that the history shows how they changed it.
+        estimated_print_time_left = print_time_left
 
-        current_time = datetime.datetime.today()
+        # Learn from the estimated time left, and correct it based on previous prints, if enabled.
+        if type(progress_data.get("completion")) == float:
 
-        print_time_remaining = datetime.timedelta(0, print_time_left)
+            self.eta_calibrator.sample(progress_data["completion"], print_time_left)
 
-        # This is the actual ETA. We'll use this to calculate a string based on the user's preferences.
-        print_finish_time = current_time + print_time_remaining
+            if self.setting_show_corrected_eta:
+                print_time_left = self.eta_calibrator.correct(progress_data["completion"], print_time_left)
 
-        eta_string = None
+        # We have all the information we need to calculate the ETA by this point.
 
-        if self.setting_use_twenty_four_hour_view:
-            eta_string = format_time(print_finish_time, "HH:mm:ss")
+        current_time = self.get_current_time()
 
-        else:
-            eta_string = format_time(print_finish_time, "hh:mm:ss a")
+        # Smooth the estimated finish time, and work out the time left from the result.
+        current_timestamp = time.mktime(current_time.timetuple()) + current_time.microsecond / 1000000.0
 
-        # Append the ETA string with the date, if the print is not due to finish today.
-        if (print_finish_time.day > current_time.day):
+        print_time_left = max(0, int(round(self.eta_smoother.update(current_timestamp + print_time_left, current_timestamp) - current_timestamp)))
 
-            # Check if the print is due to finish tomorrow
-            if print_finish_time.date() == current_time.date() + datetime.timedelta(days=1):
-                eta_string += " tomorrow"
+        print_time_remaining = datetime.timedelta(0, print_time_left)
 
-            else:
-                eta_string += " " + format_date(print_finish_time, "EEE d")
+        # This is the actual ETA. We'll use this to calculate a string based on the user's preferences.
+        print_finish_time = current_time + print_time_remaining
+
+        eta_string = self.get_eta_string(print_finish_time, current_time)
 
         # End of ETA string calculation.
-        self.eta_string = eta_string
 
         # Begin printer message calculation.
 
@@ -281,127 +731,265 @@ class PrintETAPlugin(octoprint.plugin.AssetPlugin,
         # Send the progress to the printer, if enabled.
         if type(completion) == float and self.setting_show_progress_on_printer:
 
-            self._printer.commands("M73 P{}".format(int(completion)))
-
-            self.logger.debug("Sent M73")
+            self.command_dispatcher.queue("M73 P{}".format(int(completion)))
 
         # If message cycling is enabled, check that the mode isn't zero, as this represents the ETA string,
         # and we can re-use the ETA string from above instead of calculating a new one.
-        if self.setting_enable_printer_messages and self.printer_message_mode != 0:
+        if self.setting_enable_printer_messages and self.printer_message_mode != MessagePlan.ETA:
 
-            new_printer_message = ""
+            printer_message = self.message_plan.format(self.printer_message_mode, MessageValues(
+                eta_string = eta_string,
+                print_time_elapsed = datetime.timedelta(0, print_time_elapsed) if type(print_time_elapsed) == int else None,
+                print_time_remaining = print_time_remaining,
+                completion = completion if type(completion) == float else None
+            ))
 
-            # Time elapsed message.
-            if self.printer_message_mode == 1:
+        else:
+            printer_message = "ETA: {}".format(eta_string)
 
-                if type(print_time_elapsed) == int:
-                    new_printer_message = "Elapsed: " + self.get_time_string(datetime.timedelta(0, print_time_elapsed))
+        # Record how the ETA has moved, for the chart.
+        if self._printer.is_printing():
+            self.eta_history.add(current_timestamp, estimated_print_time_left, completion if type(completion) == float else None, current_timestamp + print_time_left)
+
+        # Publish the messages, and the values used so that they can be served by the API.
+        self.state = MessageState(
+            eta_string = eta_string,
+            printer_message = printer_message,
+            print_finish_time = print_finish_time,
+            print_time_elapsed = print_time_elapsed if type(print_time_elapsed) == int else None,
+            print_time_left = print_time_left,
+            completion = completion if type(completion) == float else None
+        )
 
-            # Time remaining message.
-            elif self.printer_message_mode == 2:
-                new_printer_message = "Remaining: " + self.get_time_string(print_time_remaining)
+    # Gets a finish time as a string, based on the user's preferences (e.g. 13:00:00, 13:00:00 tomorrow or 13:00:00 Mon 4).
+    # print_finish_time (datetime) - The finish time.
+    # current_time (datetime) - The current time, used to decide whether to include the date.
+    # formatter (ETAFormatter) - Optional. The formatter to use, if not the ETA's formatter.
+    def get_eta_string(self, print_finish_time, current_time, formatter = None):
 
-            # Progress percentage message.
-            elif self.printer_message_mode == 3:
-                
-                if type(completion) == float:
+        formatter = formatter or self.eta_formatter
 
-                    self.logger.debug("Print completion: " + str(completion))
+        eta_string = formatter.format_time(print_finish_time)
 
-                    new_printer_message = str(int(completion)) + "% complete"
+        # Append the ETA string with the date, if the print is not due to finish today.
+        if print_finish_time.date() > current_time.date():
 
-            self.printer_message = new_printer_message
+            # Check if the print is due to finish tomorrow
+            if print_finish_time.date() == current_time.date() + datetime.timedelta(days=1):
+                eta_string += " tomorrow"
 
-        else:
-            self.printer_message = "ETA: {}".format(eta_string)
+            else:
+                eta_string += " " + formatter.format_date(print_finish_time)
 
-    # Gets the next message mode.
-    def get_next_printer_message_mode(self):
+        return eta_string
 
-        self.logger.debug("get_next_printer_message_mode called.")
+    # Starts analysing a G-code file in the background.
+    # origin (string) - The location of the file. Only local files can be analysed.
+    # path (string) - The path of the file.
+    def start_gcode_analysis(self, origin, path):
 
-        messages = []
+        if origin != "local" or path is None:
+            return
 
-        if self.setting_show_eta_printer_message:
-            messages.append(0)
+        with self.gcode_indexes_lock:
 
-        if self.setting_show_time_elapsed_printer_message:
-            messages.append(1)
+            if path in self.gcode_indexes or path in self.gcode_analysis_paths:
+                return
 
-        if self.setting_show_time_remaining_printer_message:
-            messages.append(2)
+            self.gcode_analysis_paths.add(path)
 
-        if self.setting_show_progress_printer_message:
-            messages.append(3)
+        thread = threading.Thread(target = self.analyse_gcode, args = [path], name = "PrintETA G-code analysis")
+        thread.daemon = True
+        thread.start()
 
-        # Return -1 if all messages are disabled.
-        if len(messages) == 0:
-            return -1
+    # Analyses a G-code file and stores its index, unless a stored analysis of the same contents exists.
+    # Runs on a background thread.
+    # path (string) - The path of the file.
+    def analyse_gcode(self, path):
 
-        # We want to find the next message mode. This will either be the first item in the collection,
-        # or the next item with a greater value. If a greater value is found, use that and break the
-        # loop. Otherwise, the loop will finish and the initial value will be used, restarting the cycle.
-        new_printer_message_mode = messages[0]
+        self.logger.debug("analyse_gcode called (%s).", path)
 
-        for message in messages:
+        try:
 
-            if message > self.printer_message_mode:
+            path_on_disk = self._file_manager.path_on_disk("local", path)
 
-                new_printer_message_mode = message
+            # OctoPrint usually knows the hash of a local file already, so only calculate it if necessary.
+            metadata = self._file_manager.get_metadata("local", path) or {}
 
-                break
+            content_hash = metadata.get("hash") or get_content_hash(path_on_disk)
 
-        self.logger.debug("New message mode: " + str(new_printer_message_mode))
+            index = self.profile_cache.get(content_hash)
 
-        return new_printer_message_mode
+            is_stored = index is not None
 
-    # Gets a datetime object as a human-readable string (e.g. 1 day, 2 hours, 3 minutes)
-    # datetime (timedelta) - The time delta to calculate the string for.
-    def get_time_string(self, timedelta):
-        
-        self.logger.debug("get_time_string called.")
+            if index is None:
+                index = GcodeAnalyser().analyse(path_on_disk)
+
+            # The analysis can still be used for this print if it can't be stored.
+            try:
+
+                if not is_stored:
+                    self.profile_cache.put(content_hash, index)
 
-        hours = timedelta.seconds // 3600
-        minutes = (timedelta.seconds // 60) % 60
-        seconds = (timedelta.seconds // 3600) % 60
+                self.profile_cache.link(path, content_hash)
 
-        # Format the hours, minutes and seconds to have prefixing zeroes when only single digits.
-        message = f'{hours:02d}' + ":" + f'{minutes:02d}' + ":" + f'{seconds:02d}'
+            except Exception:
+                self.logger.exception("Failed to store the analysis of %s", path)
 
-        # Insert the number of days left if greater than zero.
-        if timedelta.days > 0:
-            message = "{}d".format(timedelta.days) + " " + message
+        except Exception:
 
-        return message
+            self.logger.exception("Failed to analyse %s", path)
 
-    # Event handler for timer to handle message mode switching.
+            index = None
+
+        with self.gcode_indexes_lock:
+
+            self.gcode_analysis_paths.discard(path)
+
+            if index is None:
+                return
+
+            self.gcode_indexes[path] = index
+
+            while len(self.gcode_indexes) > self.MAX_GCODE_INDEXES:
+                self.gcode_indexes.popitem(last = False)
+
+        self.logger.info("Estimated print time for %s: %ds", path, index.get_total_time())
+
+    # Gets the time left on the current print using the analysis of the file being printed.
+    # Returns None if the file hasn't been analysed.
+    # current_data (dictionary) - The printer's current data.
+    def get_analysed_print_time_left(self, current_data):
+
+        file_data = current_data.get("job", {}).get("file") or {}
+
+        if file_data.get("origin") != "local":
+            return None
+
+        with self.gcode_indexes_lock:
+            index = self.gcode_indexes.get(file_data.get("path"))
+
+        file_position = current_data["progress"].get("filepos")
+
+        if index is None or type(file_position) != int:
+            return None
+
+        print_time_left = index.get_time_left(file_position)
+
+        # The analysis doesn't account for acceleration or heating, so scale the estimate by how long the print
+        # has actually taken so far, once enough of it has been printed for the comparison to be meaningful.
+        analysed_print_time_elapsed = index.get_time_at(file_position)
+
+        print_time_elapsed = current_data["progress"].get("printTime")
+
+        if type(print_time_elapsed) == int and analysed_print_time_elapsed >= 60:
+            print_time_left *= print_time_elapsed / analysed_print_time_elapsed
+
+        return int(print_time_left)
+
+    # Gets the next message mode.
+    def get_next_printer_message_mode(self):
+
+        self.logger.debug("get_next_printer_message_mode called.")
+
+        # Returns -1 if all messages are disabled.
+        new_printer_message_mode = self.message_plan.get_next_mode(self.printer_message_mode)
+
+        self.logger.debug("New message mode: %s", new_printer_message_mode)
+
+        return new_printer_message_mode
+
+    # Gets a time delta as a human-readable string (e.g. 1d 02:03:04 for 1 day, 2 hours, 3 minutes and 4 seconds).
+    # timedelta (timedelta) - The time delta to calculate the string for.
+    def get_time_string(self, timedelta):
+        return format_duration(timedelta.days * 86400 + timedelta.seconds)
+
+    # Called by the refresh scheduler when it's time to switch to the next printer message.
     def on_timer_elapsed(self):
 
         self.logger.debug("on_timer_elapsed called.")
 
-        # Make sure that printer messages are enabled before moving to the next mode.
-        if self.setting_enable_printer_messages:
+        self.metrics.counter("timer_ticks_total", "Printer message timer ticks.").increment()
 
+        trace_recorder = self.trace_recorder
+
+        if trace_recorder is not None:
+            trace_recorder.record_timer(self._printer.is_printing())
+
+        # Always refresh, as the scheduler skips any other refresh that's due at the same time. The worker makes sure
+        # that printer messages are enabled before moving to the next mode.
+        self.worker.submit(RefreshRequest(True, None))
+
+    # Refreshes the messages, after applying a new order of printer messages and moving on to the next printer message,
+    # if requested. Runs on the worker's thread.
+    # request (RefreshRequest) - The request to process.
+    def process_refresh(self, request):
+
+        if request.message_plan is not None:
+            self.apply_message_plan(request.message_plan)
+
+        if request.next_printer_message and self.setting_enable_printer_messages:
             self.printer_message_mode = self.get_next_printer_message_mode()
 
-            self.refresh_messages()
+        self.refresh_messages()
+
+        # Wake up again when the messages could next change by themselves.
+        self.refresh_scheduler.schedule(self.get_next_change_time(self.state, self.refresh_scheduler.clock()))
+
+    # Gets the earliest time at which the progress shown could change without OctoPrint reporting anything new, or None
+    # if it can't. The time elapsed and time remaining messages are only updated at rotation slots and progress changes,
+    # as refreshing them every second would cost a full refresh and a printer message each time.
+    # state (MessageState) - The messages, and the values they were calculated from.
+    # now (float) - The time at which the messages were calculated, as a Unix timestamp.
+    def get_next_change_time(self, state, now):
+
+        if not self._printer.is_printing():
+            return None
+
+        shows_progress = self.setting_show_progress_on_printer or (self.setting_enable_printer_messages and self.printer_message_mode == MessagePlan.PROGRESS)
+
+        if not shows_progress or state.completion is None or state.completion >= 100 or not state.print_time_elapsed:
+            return None
+
+        # The progress changes at the next whole percent, which is reached at the rate the print has progressed so far.
+        rate = state.completion / state.print_time_elapsed
+
+        if rate <= 0:
+            return None
+
+        return now + (math.floor(state.completion) + 1 - state.completion) / rate
 
     # Refreshes the messages being shown to the user.
+    @timed("refresh_messages")
     def refresh_messages(self):
 
         self.logger.debug("refresh_messages called.")
 
         self.calculate_messages()
 
-        self.logger.debug("ETA string: " + self.eta_string)
-        self.logger.debug("Printer message: " + self.printer_message)
+        state = self.state
 
-        # Compare the new and previous ETA string before pushing any updates to the UI.
-        if self.eta_string != self.previous_eta_string:
+        self.logger.debug("ETA string: %s", state.eta_string)
+        self.logger.debug("Printer message: %s", state.printer_message)
 
-            self.previous_eta_string = self.eta_string
+        # Compare the new and previous ETA before pushing any updates to the UI. The UI counts down by itself,
+        # so only push updates if the ETA has moved by more than the tolerance, or has started or stopped being known.
+        if state.eta_string != self.previous_eta_string:
 
-            self.dispatch_eta_message()
+            eta = state.get_eta_timestamp()
+
+            if eta is None or self.previous_eta is None or abs(eta - self.previous_eta) > self.setting_eta_push_tolerance:
+
+                self.previous_eta_string = state.eta_string
+                self.previous_eta = eta
+
+                self.dispatch_eta_message()
+
+        # Replace the API's snapshot if anything it reports has changed.
+        snapshot_data = self.get_snapshot_data(state)
+
+        if snapshot_data != self.snapshot.data:
+            self.snapshot = ETASnapshot(snapshot_data)
 
         # Send M117 command to printer, if setting is enabled.
         # Only send M117 if the printer is actually printing. We may reach this part before the printer has
@@ -410,35 +998,231 @@ class PrintETAPlugin(octoprint.plugin.AssetPlugin,
         # with this, so only send M117s if the print is actually in progress.
         if self._printer.is_printing() and self.setting_enable_printer_messages:
 
-            if not str.isspace(self.printer_message) and self.printer_message != self.previous_printer_message:
+            if not str.isspace(state.printer_message) and state.printer_message != self.previous_printer_message:
 
-                self.previous_printer_message = self.printer_message
+                self.previous_printer_message = state.printer_message
 
                 self.dispatch_printer_message()
-                
+
+        # Send any progress update and printer message together.
+        commands = self.command_dispatcher.flush()
+
+        if len(commands) > 0:
+            self.logger.debug("Sent %s", commands)
+
+    # Gets the ETA information served by the API.
+    # state (MessageState) - The messages and the values they were calculated from.
+    # Only values that change when the ETA moves are included, so that the snapshot's ETag stays the same between most
+    # refreshes. Clients can work out the time elapsed and left from the print's start and the ETA.
+    def get_snapshot_data(self, state):
+
+        return dict(
+            eta = state.get_eta_timestamp(),
+            print_start = state.get_print_start_timestamp(),
+            eta_string = state.eta_string,
+            completion = None if state.completion is None else int(state.completion)
+        )
+
+    # Called by OctoPrint upon a GET request to the plugin's API.
+    # Serves the latest snapshot, or 304 Not Modified if the client already has it.
+    # request (Request) - The Flask request object.
+    def on_api_get(self, request):
+
+        import flask
+
+        snapshot = self.snapshot
+
+        if request.if_none_match.contains_weak(snapshot.etag):
+            response = flask.make_response("", 304)
+
+        else:
+            response = flask.make_response(snapshot.body)
+            response.mimetype = "application/json"
+
+        response.set_etag(snapshot.etag)
+
+        return response
+
+    # Defines the commands accepted by the plugin's API, and their required parameters.
+    def get_api_commands(self):
+
+        return dict(
+            project_queue = ["files"]
+        )
+
+    # Called by OctoPrint upon a POST request to the plugin's API.
+    # command (string) - The command that was sent.
+    # data (dictionary) - The command's parameters.
+    def on_api_command(self, command, data):
+
+        import flask
+
+        if command == "project_queue":
+
+            files = data.get("files")
+
+            if type(files) != list or not all(isinstance(file, dict) for file in files):
+                return flask.make_response("files must be a list of objects", 400)
+
+            for file in files:
+
+                estimate = file.get("estimate")
+
+                # Also rejects NaN and infinite estimates, as they can't be compared with the limit.
+                if isinstance(estimate, (int, float)) and not isinstance(estimate, bool) and not -self.MAX_PRINT_TIME_ESTIMATE <= estimate <= self.MAX_PRINT_TIME_ESTIMATE:
+                    return flask.make_response("estimate must be a finite number of seconds, up to {}".format(self.MAX_PRINT_TIME_ESTIMATE), 400)
+
+            try:
+                queue = self.project_queue(files)
+
+            # A long enough queue can finish beyond the latest date that can be represented.
+            except OverflowError:
+                return flask.make_response("The queue finishes too far in the future to project", 400)
+
+            return flask.jsonify(queue = queue)
+
+    # Projects when each file in a queue will start and finish printing, once the current print (if any) has finished.
+    # files (list) - The queued files, in the order they'll be printed. Each is a dictionary with the file's origin and
+    #                path, and optionally an estimate of how many seconds it will take to print.
+    @timed("project_queue")
+    def project_queue(self, files):
+
+        current_time = self.get_current_time()
+
+        state = self.state
+
+        # The first queued print starts once the current one has finished, if the printer is busy.
+        if not self._printer.is_printing():
+            available_time = current_time
+
+        elif state.print_finish_time is None:
+            available_time = None
+
+        else:
+            available_time = state.print_finish_time + datetime.timedelta(minutes = self.setting_queue_changeover_gap)
+
+        estimates = [self.get_print_time_estimate(file) for file in files]
+
+        queue = []
+
+        estimate_strings = format_durations(estimates)
+
+        timeline = self.queue_projector.project(estimates, available_time)
+
+        # Projections can be made on several of the API's threads at once.
+        with self.queue_formatter_lock:
+            finish_strings = [None if finish is None else self.get_eta_string(finish, current_time, self.queue_formatter) for _, finish, _ in timeline]
+
+        for file, estimate, estimate_string, (start, finish, deferred), finish_string in zip(files, estimates, estimate_strings, timeline, finish_strings):
+
+            queue.append(dict(
+                origin = file.get("origin"),
+                path = file.get("path"),
+                estimate = estimate,
+                estimate_string = estimate_string,
+                start = get_timestamp(start),
+                finish = get_timestamp(finish),
+                finish_string = finish_string,
+                deferred = deferred
+            ))
+
+        return queue
+
+    # Gets how many seconds a file is expected to take to print, or None if unknown.
+    # Uses the estimate given with the file, the plugin's own analysis if enabled, or OctoPrint's analysis, in that order.
+    # file (dictionary) - The file's origin and path, and optionally an estimate.
+    def get_print_time_estimate(self, file):
+
+        estimate = file.get("estimate")
+
+        if isinstance(estimate, (int, float)) and not isinstance(estimate, bool):
+            return max(0, int(estimate))
+
+        origin = file.get("origin", "local")
+        path = file.get("path")
+
+        if path is None:
+            return None
+
+        if self.setting_enable_gcode_analysis and origin == "local":
+
+            with self.gcode_indexes_lock:
+                index = self.gcode_indexes.get(path)
+
+            if index is not None:
+                return int(index.get_total_time())
+
+        try:
+            metadata = self._file_manager.get_metadata(origin, path) or {}
+
+        except Exception:
+
+            self.logger.debug("Failed to get the metadata of %s", path)
+
+            return None
+
+        estimate = (metadata.get("analysis") or {}).get("estimatedPrintTime")
+
+        if isinstance(estimate, (int, float)):
+            return int(estimate)
+
+        return None
+
+    # Serves the plugin's metrics in the Prometheus text format.
+    @octoprint.plugin.BlueprintPlugin.route("/metrics", methods=["GET"])
+    def get_metrics(self):
+
+        import flask
+
+        response = flask.make_response(self.metrics.format())
+        response.mimetype = "text/plain; version=0.0.4"
+
+        return response
+
+    # Serves how the ETA has moved during the current or last print, as columns.
+    # Clients that already have some of the samples can pass the number they have (since) and their generation,
+    # to only receive newer samples.
+    @octoprint.plugin.BlueprintPlugin.route("/history", methods=["GET"])
+    def get_history(self):
+
+        import flask
+
+        since = flask.request.args.get("since", 0, type = int)
+        generation = flask.request.args.get("generation", None, type = int)
+
+        return flask.jsonify(self.eta_history.get_series(since, generation))
+
+    # Opts in to OctoPrint's CSRF protection for the plugin's routes.
+    def is_blueprint_csrf_protected(self):
+        return True
 
     # Dispatches the currnent ETA message to the UI.
+    @timed("dispatch_eta_message")
     def dispatch_eta_message(self):
 
         self.logger.debug("dispatch_eta_message called.")
 
-        # Notify listeners of new ETA string value.
-        self._plugin_manager.send_plugin_message(self._identifier, dict(eta_string = self.eta_string))
+        self.metrics.counter("socket_messages_total", "Messages sent to OctoPrint's UI.").increment()
+
+        state = self.state
+
+        # Notify listeners of the new ETA. The string is included for clients that don't format the ETA themselves.
+        self._plugin_manager.send_plugin_message(self._identifier, dict(
+            eta_string = state.eta_string,
+            eta = state.get_eta_timestamp(),
+            print_start = state.get_print_start_timestamp()
+        ))
 
     # Dispatches the current printer message to the printer.
+    @timed("dispatch_printer_message")
     def dispatch_printer_message(self):
 
         self.logger.debug("dispatch_printer_message called.")
 
-        message = self.printer_message
-
-        # Remove colons, if enabled. 
-        if self.setting_remove_colons:
-            message = message.replace(":", " ")
-
-        self._printer.commands("M117 {}".format(message))
+        # Fit the message to the printer's display, removing colons if enabled.
+        message = self.display_encoder.encode(self.state.printer_message)
 
-        self.logger.debug("Sent M117")
+        self.command_dispatcher.queue("M117 {}".format(message))
 
 __plugin_name__ = "Print ETA"
 __plugin_pythoncompat__ = ">=2.7,<4"
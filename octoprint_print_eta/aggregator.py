@@ -0,0 +1,561 @@
+from __future__ import absolute_import, unicode_literals
+
+# A standalone service that collects the ETA of every printer in a farm of OctoPrint instances running this plugin,
+# and serves them together, sorted by when they're due to finish, as a web page and as JSON.
+#
+# Usage: python -m octoprint_print_eta.aggregator --config farm.json [--port 8080]
+#
+# The configuration file lists the printers, each with a name, the URL of its OctoPrint instance and an API key:
+# { "printers": [ { "name": "Printer 1", "url": "http://printer-1.local", "api_key": "..." } ] }
+
+import argparse
+import asyncio
+import bisect
+import collections
+import json
+import logging
+import random
+import ssl
+import time
+
+from urllib.parse import urlsplit
+
+from .snapshot import ETASnapshot
+
+# Sends HTTP/1.1 GET requests, keeping a connection open to each host so that it can be reused by the next request.
+# Limits the number of requests in progress at once across all hosts.
+class ConnectionPool(object):
+
+    # Initialize the pool.
+    # limit (int) - The maximum number of requests in progress at once.
+    # timeout (float) - The maximum number of seconds to wait for a connection or response.
+    def __init__(self, limit = 64, timeout = 10.0):
+
+        self.semaphore = asyncio.Semaphore(limit)
+        self.timeout = timeout
+
+        # The idle connections, keyed by scheme, host and port.
+        self.connections = dict()
+
+        # The number of connections opened, and the number of requests sent.
+        self.connection_count = 0
+        self.request_count = 0
+
+    # Sends a GET request. Returns the response's status, headers (with lowercase names) and body.
+    # url (string) - The URL to request.
+    # headers (dictionary) - The request's headers.
+    async def get(self, url, headers = None):
+
+        parts = urlsplit(url)
+
+        secure = parts.scheme == "https"
+        key = (parts.scheme, parts.hostname, parts.port or (443 if secure else 80))
+
+        async with self.semaphore:
+
+            while True:
+
+                connection = self.connections.pop(key, None)
+
+                reused = connection is not None
+
+                if connection is None:
+
+                    connection = await asyncio.wait_for(asyncio.open_connection(key[1], key[2], ssl = ssl.create_default_context() if secure else None), self.timeout)
+
+                    self.connection_count += 1
+
+                self.request_count += 1
+
+                try:
+                    status, response_headers, body, keep_alive = await asyncio.wait_for(self.request(connection, parts, headers or {}), self.timeout)
+
+                except (ConnectionError, asyncio.IncompleteReadError):
+
+                    connection[1].close()
+
+                    # The host may have closed an idle connection, so try again once with a new one.
+                    if reused:
+                        continue
+
+                    raise
+
+                except BaseException:
+
+                    connection[1].close()
+
+                    raise
+
+                if keep_alive:
+                    self.connections[key] = connection
+
+                else:
+                    connection[1].close()
+
+                return status, response_headers, body
+
+    # Sends a request on a connection and reads the response.
+    # Returns the response's status, headers and body, and whether the connection can be reused.
+    async def request(self, connection, parts, headers):
+
+        reader, writer = connection
+
+        path = (parts.path or "/") + ("?" + parts.query if parts.query else "")
+
+        lines = ["GET {} HTTP/1.1".format(path), "Host: {}".format(parts.netloc), "Connection: keep-alive"]
+        lines.extend("{}: {}".format(name, value) for name, value in headers.items())
+
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+
+        await writer.drain()
+
+        status_line = await reader.readline()
+
+        if len(status_line) == 0:
+            raise ConnectionError("Connection closed")
+
+        version, status = status_line.decode("latin-1").split(" ", 2)[:2]
+
+        response_headers = dict()
+
+        while True:
+
+            line = await reader.readline()
+
+            if len(line) == 0:
+                raise ConnectionError("Connection closed")
+
+            if line in (b"\r\n", b"\n"):
+                break
+
+            name, _, value = line.decode("latin-1").partition(":")
+
+            response_headers[name.strip().lower()] = value.strip()
+
+        status = int(status)
+
+        keep_alive = version == "HTTP/1.1" and response_headers.get("connection", "").lower() != "close"
+
+        if status in (204, 304) or 100 <= status < 200:
+            body = b""
+
+        elif response_headers.get("transfer-encoding", "").lower() == "chunked":
+
+            chunks = []
+
+            while True:
+
+                size = int((await reader.readline()).split(b";", 1)[0], 16)
+
+                if size == 0:
+
+                    # Skip any trailers.
+                    while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                        pass
+
+                    break
+
+                chunks.append(await reader.readexactly(size))
+
+                await reader.readexactly(2)
+
+            body = b"".join(chunks)
+
+        elif "content-length" in response_headers:
+            body = await reader.readexactly(int(response_headers["content-length"]))
+
+        # Without a length, the body runs until the connection closes.
+        else:
+
+            body = await reader.read()
+
+            keep_alive = False
+
+        return status, response_headers, body, keep_alive
+
+    # Closes all idle connections.
+    def close(self):
+
+        for _, writer in self.connections.values():
+            writer.close()
+
+        self.connections.clear()
+
+# Polls the plugin's API on each printer, and keeps an index of the printers sorted by when they're due to finish.
+# Each printer is polled by its own task, backing off exponentially while it can't be reached. The plugin's ETag is
+# sent with each poll, so that unchanged ETAs cost an empty response.
+class FarmAggregator(object):
+
+    # The path of the plugin's API on each OctoPrint instance.
+    API_PATH = "/api/plugin/print_eta"
+
+    # The values copied from the plugin's API for each printer.
+    FIELDS = ("eta", "print_start", "eta_string", "completion")
+
+    # Initialize the aggregator.
+    # printers (list) - The printers, each a dictionary with a name, the URL of its OctoPrint instance and an API key.
+    # pool (ConnectionPool) - The pool to send requests with.
+    # interval (float) - The number of seconds between polls of each printer.
+    # max_backoff (float) - The maximum number of seconds between polls of a printer that can't be reached.
+    def __init__(self, printers, pool, interval = 10.0, max_backoff = 300.0):
+
+        check_printers(printers)
+
+        self.printers = printers
+        self.pool = pool
+        self.interval = interval
+        self.max_backoff = max_backoff
+
+        self.logger = logging.getLogger("octoprint.plugins.print_eta.aggregator")
+
+        # The latest information about each printer, keyed by name.
+        self.entries = dict()
+
+        # The printers' names sorted by when they're due to finish, along with the keys they're sorted by.
+        self.index = []
+        self.sort_keys = dict()
+
+        # The index as served, rebuilt when it's next requested after a printer changes.
+        self.snapshot = None
+
+        # The number of polls, polls that found the ETA unchanged, and polls that failed.
+        self.poll_count = 0
+        self.unchanged_count = 0
+        self.failure_count = 0
+
+        for printer in printers:
+            self.update(printer, dict(), "Not polled yet")
+
+    # Polls every printer until cancelled.
+    async def run(self):
+        await asyncio.gather(*[self.poll(printer) for printer in self.printers])
+
+    # Polls a printer until cancelled.
+    # printer (dictionary) - The printer's name, URL and API key.
+    async def poll(self, printer):
+
+        url = printer["url"].rstrip("/") + self.API_PATH
+
+        etag = None
+        failures = 0
+
+        # Spread the polls over the interval, rather than polling every printer at once.
+        await asyncio.sleep(random.uniform(0, self.interval))
+
+        while True:
+
+            headers = { "X-Api-Key": printer.get("api_key", ""), "Accept": "application/json" }
+
+            if etag is not None:
+                headers["If-None-Match"] = etag
+
+            self.poll_count += 1
+
+            try:
+
+                status, response_headers, body = await self.pool.get(url, headers)
+
+                if status == 304:
+
+                    self.unchanged_count += 1
+
+                    self.update(printer, None, None)
+
+                elif status == 200:
+
+                    self.update(printer, json.loads(body.decode("utf-8")), None)
+
+                    etag = response_headers.get("etag")
+
+                else:
+                    raise IOError("HTTP {}".format(status))
+
+                failures = 0
+
+                delay = self.interval
+
+            except asyncio.CancelledError:
+                raise
+
+            except Exception as error:
+
+                self.failure_count += 1
+
+                failures += 1
+
+                etag = None
+
+                self.update(printer, dict(), str(error) or type(error).__name__)
+
+                # Back off exponentially, with some randomness so that printers that failed together spread out.
+                delay = min(self.max_backoff, self.interval * 2 ** failures) * random.uniform(0.75, 1.0)
+
+                if failures == 1:
+                    self.logger.warning("Failed to poll %s: %s", printer["name"], error)
+
+            await asyncio.sleep(delay)
+
+    # Updates a printer's entry, and its place in the index.
+    # printer (dictionary) - The printer's name, URL and API key.
+    # data (dictionary) - The plugin's ETA information, or None if it hasn't changed.
+    # error (string) - Why the printer couldn't be polled, or None if it was polled successfully.
+    def update(self, printer, data, error):
+
+        name = printer["name"]
+
+        entry = self.entries.get(name)
+
+        if data is None and entry is not None and entry["error"] is None:
+
+            entry["last_seen"] = time.time()
+
+            return
+
+        entry = dict(name = name, url = printer["url"], error = error, last_seen = time.time() if error is None else (entry or {}).get("last_seen"))
+
+        for field in self.FIELDS:
+            entry[field] = (data or {}).get(field)
+
+        self.entries[name] = entry
+
+        # Printers that are due to finish come first, then idle printers, then printers that can't be reached.
+        if error is not None:
+            sort_key = (2, 0, name)
+
+        elif entry["eta"] is None:
+            sort_key = (1, 0, name)
+
+        else:
+            sort_key = (0, entry["eta"], name)
+
+        previous_sort_key = self.sort_keys.get(name)
+
+        if previous_sort_key is not None:
+            del self.index[bisect.bisect_left(self.index, previous_sort_key)]
+
+        bisect.insort(self.index, sort_key)
+
+        self.sort_keys[name] = sort_key
+
+        self.snapshot = None
+
+    # Gets the index as served, sorted by when the printers are due to finish.
+    def get_snapshot(self):
+
+        snapshot = self.snapshot
+
+        if snapshot is None:
+
+            # last_seen is left out, so that the snapshot only changes when a printer does.
+            printers = []
+
+            for sort_key in self.index:
+
+                entry = dict(self.entries[sort_key[2]])
+                entry.pop("last_seen", None)
+
+                printers.append(entry)
+
+            snapshot = self.snapshot = ETASnapshot(dict(printers = printers))
+
+        return snapshot
+
+    # Handles a request to the aggregator's web server. Serves the page, and the index as JSON.
+    async def handle(self, reader, writer):
+
+        try:
+
+            request_line = await asyncio.wait_for(reader.readline(), self.pool.timeout)
+
+            headers = dict()
+
+            while True:
+
+                line = await asyncio.wait_for(reader.readline(), self.pool.timeout)
+
+                if line in (b"\r\n", b"\n", b""):
+                    break
+
+                name, _, value = line.decode("latin-1").partition(":")
+
+                headers[name.strip().lower()] = value.strip()
+
+            parts = request_line.decode("latin-1").split(" ")
+
+            path = parts[1].split("?", 1)[0] if len(parts) > 1 else "/"
+
+            if parts[0] != "GET":
+                self.respond(writer, "405 Method Not Allowed", "text/plain", b"Method not allowed")
+
+            elif path == "/":
+                self.respond(writer, "200 OK", "text/html; charset=utf-8", PAGE.encode("utf-8"))
+
+            elif path == "/api/printers":
+
+                snapshot = self.get_snapshot()
+
+                etag = '"{}"'.format(snapshot.etag)
+
+                if etag in headers.get("if-none-match", ""):
+                    self.respond(writer, "304 Not Modified", None, b"", etag)
+
+                else:
+                    self.respond(writer, "200 OK", "application/json", snapshot.body, etag)
+
+            else:
+                self.respond(writer, "404 Not Found", "text/plain", b"Not found")
+
+            await writer.drain()
+
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+
+        finally:
+            writer.close()
+
+    # Writes a response, after which the connection is closed.
+    def respond(self, writer, status, content_type, body, etag = None):
+
+        lines = ["HTTP/1.1 " + status, "Content-Length: {}".format(len(body)), "Connection: close", "Cache-Control: no-cache"]
+
+        if content_type is not None:
+            lines.append("Content-Type: " + content_type)
+
+        if etag is not None:
+            lines.append("ETag: " + etag)
+
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+
+# The page served by the aggregator, listing the printers in the order they're due to finish.
+PAGE = """<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="utf-8">
+    <title>Print ETA</title>
+    <style>
+        body { font-family: sans-serif; margin: 2em; }
+        table { border-collapse: collapse; width: 100%; }
+        th, td { text-align: left; padding: 0.4em 0.8em; border-bottom: 1px solid #ddd; }
+        tr.error td { color: #999; }
+    </style>
+</head>
+<body>
+    <h1>Print ETA</h1>
+    <table>
+        <thead><tr><th>Printer</th><th>ETA</th><th>Remaining</th><th>Progress</th><th>Status</th></tr></thead>
+        <tbody id="printers"></tbody>
+    </table>
+    <script>
+        var printers = [];
+        var etag = null;
+
+        function formatDuration(seconds) {
+            seconds = Math.max(0, Math.floor(seconds));
+            var pad = function (value) { return value < 10 ? "0" + value : "" + value; };
+            var duration = pad(Math.floor(seconds / 3600) % 24) + ":" + pad(Math.floor(seconds / 60) % 60) + ":" + pad(seconds % 60);
+            return seconds >= 86400 ? Math.floor(seconds / 86400) + "d " + duration : duration;
+        }
+
+        function cell(row, text) {
+            row.insertCell().textContent = text;
+        }
+
+        function render() {
+            var body = document.getElementById("printers");
+            body.innerHTML = "";
+            printers.forEach(function (printer) {
+                var row = body.insertRow();
+                if (printer.error) row.className = "error";
+                var link = document.createElement("a");
+                link.href = printer.url;
+                link.textContent = printer.name;
+                row.insertCell().appendChild(link);
+                cell(row, printer.eta === null ? "-" : new Date(printer.eta * 1000).toLocaleString());
+                cell(row, printer.eta === null ? "-" : formatDuration(printer.eta - Date.now() / 1000));
+                cell(row, printer.completion === null ? "-" : Math.floor(printer.completion) + "%");
+                cell(row, printer.error || "");
+            });
+        }
+
+        function refresh() {
+            var request = new XMLHttpRequest();
+            request.open("GET", "api/printers");
+            if (etag !== null) request.setRequestHeader("If-None-Match", etag);
+            request.onload = function () {
+                if (request.status == 200) {
+                    printers = JSON.parse(request.responseText).printers;
+                    etag = request.getResponseHeader("ETag");
+                }
+                render();
+            };
+            request.send();
+        }
+
+        refresh();
+        setInterval(refresh, 5000);
+    </script>
+</body>
+</html>
+"""
+
+# Checks that each printer has a different name, as the printers are identified by their names.
+# Raises ValueError if any names are used more than once.
+# printers (list) - The printers, each a dictionary with a name, the URL of its OctoPrint instance and an API key.
+def check_printers(printers):
+
+    duplicates = sorted(name for name, count in collections.Counter(printer["name"] for printer in printers).items() if count > 1)
+
+    if len(duplicates) > 0:
+        raise ValueError("Printer names must be unique: {}".format(", ".join(duplicates)))
+
+# Polls the printers and serves the index until interrupted.
+async def serve(printers, bind, port, interval, max_backoff, limit, timeout):
+
+    pool = ConnectionPool(limit, timeout)
+
+    aggregator = FarmAggregator(printers, pool, interval, max_backoff)
+
+    server = await asyncio.start_server(aggregator.handle, bind, port)
+
+    aggregator.logger.info("Serving the ETAs of %d printers on %s:%d", len(printers), bind, port)
+
+    try:
+        await aggregator.run()
+
+    finally:
+
+        server.close()
+
+        pool.close()
+
+def main():
+
+    parser = argparse.ArgumentParser(description = "Serves the ETAs of many OctoPrint instances running the Print ETA plugin.")
+    parser.add_argument("--config", required = True, help = "A JSON file listing the printers, each with a name, url and api_key.")
+    parser.add_argument("--bind", default = "127.0.0.1", help = "The address to serve on.")
+    parser.add_argument("--port", type = int, default = 8080, help = "The port to serve on.")
+    parser.add_argument("--interval", type = float, default = 10.0, help = "The number of seconds between polls of each printer.")
+    parser.add_argument("--max-backoff", type = float, default = 300.0, help = "The maximum number of seconds between polls of a printer that can't be reached.")
+    parser.add_argument("--concurrency", type = int, default = 64, help = "The maximum number of polls in progress at once.")
+    parser.add_argument("--timeout", type = float, default = 10.0, help = "The number of seconds to wait for a printer to respond.")
+    arguments = parser.parse_args()
+
+    logging.basicConfig(level = logging.INFO, format = "%(asctime)s %(levelname)s %(message)s")
+
+    with open(arguments.config) as file:
+        printers = json.load(file)["printers"]
+
+    try:
+        check_printers(printers)
+
+    except ValueError as error:
+        parser.error(str(error))
+
+    try:
+        asyncio.run(serve(printers, arguments.bind, arguments.port, arguments.interval, arguments.max_backoff, arguments.concurrency, arguments.timeout))
+
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+from __future__ import absolute_import, unicode_literals
+
+import array
+import bisect
+import math
+import mmap
+import os
+
+# An index of a G-code file, mapping positions within the file to the estimated time taken to print up to them.
+class GcodeIndex(object):
+
+    # Initialize the index.
+    # offsets (array) - The byte offsets at which samples were taken, in ascending order.
+    # seconds (array) - The estimated number of seconds taken to print up to each offset.
+    # layers (array) - The byte offsets at which each layer begins, in ascending order.
+    # size (int) - The size of the file, in bytes.
+    def __init__(self, offsets, seconds, layers, size):
+
+        self.offsets = offsets
+        self.seconds = seconds
+        self.layers = layers
+        self.size = size
+
+    # Gets the estimated number of seconds taken to print the whole file.
+    def get_total_time(self):
+
+        if len(self.seconds) == 0:
+            return 0.0
+
+        return self.seconds[-1]
+
+    # Gets the estimated number of seconds taken to print up to a position within the file.
+    # position (int) - The byte offset within the file.
+    def get_time_at(self, position):
+
+        index = bisect.bisect_right(self.offsets, position) - 1
+
+        if index < 0:
+            return 0.0
+
+        if index >= len(self.offsets) - 1:
+            return self.get_total_time()
+
+        # Interpolate between the samples either side of the position.
+        start_offset = self.offsets[index]
+        end_offset = self.offsets[index + 1]
+
+        start_seconds = self.seconds[index]
+        end_seconds = self.seconds[index + 1]
+
+        return start_seconds + (end_seconds - start_seconds) * (position - start_offset) / (end_offset - start_offset)
+
+    # Gets the estimated number of seconds left to print from a position within the file.
+    # position (int) - The byte offset within the file.
+    def get_time_left(self, position):
+        return max(0.0, self.get_total_time() - self.get_time_at(position))
+
+    # Gets the number of the layer being printed at a position within the file, starting from 1.
+    # Returns 0 if the position is before the first layer.
+    # position (int) - The byte offset within the file.
+    def get_layer(self, position):
+        return bisect.bisect_right(self.layers, position)
+
+# Estimates print times by streaming through a G-code file once, without loading it into memory.
+class GcodeAnalyser(object):
+
+    # The feedrate assumed before the file sets one, in mm/min.
+    DEFAULT_FEEDRATE = 1500.0
+
+    # The minimum number of bytes between samples in the index. Keeps the index small for large files.
+    DEFAULT_SAMPLE_INTERVAL = 4096
+
+    # Initialize the analyser.
+    # sample_interval (int) - The minimum number of bytes between samples in the index.
+    def __init__(self, sample_interval = DEFAULT_SAMPLE_INTERVAL):
+        self.sample_interval = sample_interval
+
+    # Builds an index for a G-code file.
+    # path (string) - The path to the file on disk.
+    # is_cancelled (function) - Optional. Returns True if the analysis should be abandoned, in which case None is returned.
+    def analyse(self, path, is_cancelled = None):
+
+        size = os.path.getsize(path)
+
+        offsets = array.array("Q")
+        seconds = array.array("d")
+        layers = array.array("Q")
+
+        if size == 0:
+            return GcodeIndex(offsets, seconds, layers, size)
+
+        # Current state of the printer.
+        position = dict(X = 0.0, Y = 0.0, Z = 0.0, E = 0.0)
+        feedrate = self.DEFAULT_FEEDRATE
+        absolute_positioning = True
+        absolute_extrusion = True
+
+        elapsed = 0.0
+        next_sample = 0
+        layer_z = None
+
+        with open(path, "rb") as file:
+
+            gcode = mmap.mmap(file.fileno(), 0, access = mmap.ACCESS_READ)
+
+            try:
+
+                offset = 0
+
+                for line in iter(gcode.readline, b""):
+
+                    line_offset = offset
+
+                    offset += len(line)
+
+                    if line_offset >= next_sample:
+
+                        offsets.append(line_offset)
+                        seconds.append(elapsed)
+
+                        next_sample = line_offset + self.sample_interval
+
+                        if is_cancelled is not None and is_cancelled():
+                            return None
+
+                    # Remove comments and whitespace.
+                    line = line.split(b";", 1)[0].strip()
+
+                    if len(line) < 2:
+                        continue
+
+                    words = line.upper().split()
+                    command = words[0]
+
+                    if command in (b"G0", b"G1", b"G00", b"G01"):
+
+                        parameters = self.get_parameters(words)
+
+                        if "F" in parameters:
+                            feedrate = parameters["F"]
+
+                        distances = dict()
+
+                        for axis in ("X", "Y", "Z", "E"):
+
+                            if axis not in parameters:
+                                continue
+
+                            is_absolute = absolute_extrusion if axis == "E" else absolute_positioning
+
+                            target = parameters[axis] if is_absolute else position[axis] + parameters[axis]
+
+                            distances[axis] = target - position[axis]
+
+                            position[axis] = target
+
+                        distance = math.sqrt(sum(distances.get(axis, 0.0) ** 2 for axis in ("X", "Y", "Z")))
+
+                        # Extrusion only moves (e.g. retractions).
+                        if distance == 0.0:
+                            distance = abs(distances.get("E", 0.0))
+
+                        if distance > 0.0 and feedrate > 0.0:
+                            elapsed += distance / (feedrate / 60.0)
+
+                        # A new layer begins when the nozzle extrudes at a greater height than before.
+                        if distances.get("E", 0.0) > 0.0 and (layer_z is None or position["Z"] > layer_z):
+
+                            layer_z = position["Z"]
+
+                            layers.append(line_offset)
+
+                    elif command == b"G4":
+
+                        parameters = self.get_parameters(words)
+
+                        if "S" in parameters:
+                            elapsed += parameters["S"]
+
+                        elif "P" in parameters:
+                            elapsed += parameters["P"] / 1000.0
+
+                    elif command == b"G90":
+                        absolute_positioning = True
+                        absolute_extrusion = True
+
+                    elif command == b"G91":
+                        absolute_positioning = False
+                        absolute_extrusion = False
+
+                    elif command == b"M82":
+                        absolute_extrusion = True
+
+                    elif command == b"M83":
+                        absolute_extrusion = False
+
+                    elif command == b"G92":
+
+                        for axis, value in self.get_parameters(words).items():
+
+                            if axis in position:
+                                position[axis] = value
+
+            finally:
+                gcode.close()
+
+        offsets.append(size)
+        seconds.append(elapsed)
+
+        return GcodeIndex(offsets, seconds, layers, size)
+
+    # Gets the numeric parameters of a G-code command (e.g. X10.5), keyed by their letter.
+    # words (list) - The command and its parameters, as bytes.
+    def get_parameters(self, words):
+
+        parameters = dict()
+
+        for word in words[1:]:
+
+            try:
+                parameters[chr(word[0])] = float(word[1:])
+
+            except ValueError:
+                continue
+
+        return parameters
@@ -0,0 +1,238 @@
+from __future__ import absolute_import, unicode_literals
+
+import json
+import os
+import struct
+import threading
+import time
+
+# Learns how far off the estimated time left is for each printer profile, from the history of completed prints,
+# and corrects live estimates accordingly.
+# Each completed print adds one record per progress bucket to an append-only history file, and the correction
+# model is updated from the new records only. The model is saved alongside the history, so that it can be loaded
+# on startup without reading the history again.
+class ETACalibrator(object):
+
+    # The number of progress buckets. Each bucket covers an equal range of the print's completion.
+    BUCKET_COUNT = 10
+
+    # How much weight previous prints keep each time a new print is recorded. Allows the model to follow changes
+    # to the printer over time.
+    DECAY = 0.9
+
+    # The minimum total weight of the prints recorded for a bucket before its correction is used.
+    MIN_WEIGHT = 2.0
+
+    # Corrections are limited to this range, to protect against prints with unusual durations.
+    MIN_FACTOR = 0.25
+    MAX_FACTOR = 4.0
+
+    # Timestamp, printer profile ID, progress bucket, predicted seconds left and actual seconds left.
+    RECORD = struct.Struct("<d32sBff")
+
+    HISTORY_FILE_NAME = "history.bin"
+    MODEL_FILE_NAME = "calibration.json"
+
+    # Initialize the calibrator.
+    # folder (string) - The folder to store the history and model in. Created if it doesn't exist.
+    # clock (function) - Returns the current time in seconds. Defaults to the system clock.
+    def __init__(self, folder, clock = time.time):
+
+        self.folder = folder
+        self.clock = clock
+        self.lock = threading.Lock()
+
+        self.history_path = os.path.join(folder, self.HISTORY_FILE_NAME)
+        self.model_path = os.path.join(folder, self.MODEL_FILE_NAME)
+
+        # For each printer profile ID, a list of [weight, predicted seconds, actual seconds] per progress bucket.
+        self.model = dict()
+
+        # The number of bytes of history that the model has learned from.
+        self.history_size = 0
+
+        # The printer profile ID of the current print, and the samples taken during it.
+        # Each sample is keyed by progress bucket, as a tuple of the time it was taken and the predicted seconds left.
+        self.profile_id = None
+        self.samples = dict()
+
+        if not os.path.isdir(folder):
+            os.makedirs(folder)
+
+    # Loads the saved model, then learns from any history that was recorded after it was saved.
+    def load(self):
+
+        with self.lock:
+
+            try:
+
+                with open(self.model_path, "r") as file:
+                    saved = json.load(file)
+
+                self.model = saved["profiles"]
+                self.history_size = saved["history_size"]
+
+            except (IOError, OSError, ValueError, KeyError):
+
+                self.model = dict()
+                self.history_size = 0
+
+            try:
+                history_size = os.path.getsize(self.history_path)
+
+            except OSError:
+                history_size = 0
+
+            # The history is smaller than expected if it was removed, in which case start again.
+            if history_size < self.history_size:
+
+                self.model = dict()
+                self.history_size = 0
+
+            if history_size > self.history_size:
+
+                self.learn_history()
+
+                self.save()
+
+    # Begins sampling a new print.
+    # profile_id (string) - The ID of the printer profile being printed with.
+    def start_print(self, profile_id):
+
+        with self.lock:
+
+            self.profile_id = self.get_profile_key(profile_id)
+            self.samples = dict()
+
+    # Records the predicted time left at the current point of the print, once per progress bucket.
+    # completion (float) - The print's completion, between 0 and 100.
+    # print_time_left (int) - The predicted number of seconds left.
+    def sample(self, completion, print_time_left):
+
+        bucket = self.get_bucket(completion)
+
+        with self.lock:
+
+            if self.profile_id is None or bucket in self.samples:
+                return
+
+            self.samples[bucket] = (self.clock(), print_time_left)
+
+    # Records the samples of a completed print to the history, and learns from them.
+    def finish_print(self):
+
+        now = self.clock()
+
+        with self.lock:
+
+            if self.profile_id is None:
+                return
+
+            records = []
+
+            profile_id = self.profile_id.encode("utf-8")
+
+            for bucket, (sample_time, print_time_left) in sorted(self.samples.items()):
+
+                if print_time_left > 0:
+                    records.append(self.RECORD.pack(now, profile_id, bucket, print_time_left, now - sample_time))
+
+            self.profile_id = None
+            self.samples = dict()
+
+            if len(records) == 0:
+                return
+
+            with open(self.history_path, "ab") as file:
+
+                # Drop any partially written record at the end of the history, so that the new records line up.
+                size = file.seek(0, os.SEEK_END)
+
+                if size % self.RECORD.size != 0:
+                    file.truncate(size - size % self.RECORD.size)
+
+                file.write(b"".join(records))
+
+            self.learn_history()
+
+            self.save()
+
+    # Discards the samples of a print that didn't complete, as its actual duration is unknown.
+    def discard_print(self):
+
+        with self.lock:
+
+            self.profile_id = None
+            self.samples = dict()
+
+    # Gets the corrected time left on the current print.
+    # completion (float) - The print's completion, between 0 and 100.
+    # print_time_left (int) - The predicted number of seconds left.
+    def correct(self, completion, print_time_left):
+
+        with self.lock:
+            buckets = self.model.get(self.profile_id)
+
+        if buckets is None:
+            return print_time_left
+
+        weight, predicted, actual = buckets[self.get_bucket(completion)]
+
+        if weight < self.MIN_WEIGHT or predicted <= 0:
+            return print_time_left
+
+        factor = min(self.MAX_FACTOR, max(self.MIN_FACTOR, actual / predicted))
+
+        return int(print_time_left * factor)
+
+    # Gets the key that a printer profile's records are stored under. Limited to the size of the history's field.
+    # profile_id (string) - The ID of the printer profile.
+    def get_profile_key(self, profile_id):
+        return profile_id.encode("utf-8")[:32].decode("utf-8", "ignore")
+
+    # Gets the progress bucket for a completion percentage.
+    # completion (float) - The print's completion, between 0 and 100.
+    def get_bucket(self, completion):
+        return min(self.BUCKET_COUNT - 1, max(0, int(completion * self.BUCKET_COUNT / 100)))
+
+    # Updates the model from the history recorded since it was last updated.
+    def learn_history(self):
+
+        try:
+
+            with open(self.history_path, "rb") as file:
+
+                file.seek(self.history_size)
+
+                data = file.read()
+
+        except (IOError, OSError):
+            return
+
+        # Ignore any partially written record at the end of the history.
+        length = len(data) - len(data) % self.RECORD.size
+
+        for _, profile_id, bucket, predicted, actual in self.RECORD.iter_unpack(data[:length]):
+
+            profile_id = profile_id.rstrip(b"\0").decode("utf-8", "replace")
+
+            if bucket >= self.BUCKET_COUNT:
+                continue
+
+            buckets = self.model.setdefault(profile_id, [[0.0, 0.0, 0.0] for _ in range(self.BUCKET_COUNT)])
+
+            weight, total_predicted, total_actual = buckets[bucket]
+
+            buckets[bucket] = [weight * self.DECAY + 1.0, total_predicted * self.DECAY + predicted, total_actual * self.DECAY + actual]
+
+        self.history_size += length
+
+    # Saves the model, replacing the previously saved model.
+    def save(self):
+
+        temporary_path = self.model_path + ".tmp"
+
+        with open(temporary_path, "w") as file:
+            json.dump(dict(profiles = self.model, history_size = self.history_size), file)
+
+        os.replace(temporary_path, self.model_path)
@@ -0,0 +1,113 @@
+from __future__ import absolute_import, unicode_literals
+
+import collections
+import threading
+import time
+
+# Sends G-code commands to the printer, dropping duplicates and limiting how often each command type is sent.
+# Pending commands are combined, so that a progress update and a message are sent to the printer together.
+class CommandDispatcher(object):
+
+    # Initialize the dispatcher.
+    # send (function) - Called with the list of commands to send to the printer (e.g. printer.commands).
+    # intervals (dictionary) - The minimum number of seconds between sends, keyed by command type (e.g. "M73").
+    # clock (function) - Returns the current time in seconds. Defaults to a monotonic clock.
+    def __init__(self, send, intervals = None, clock = time.monotonic):
+
+        self.send = send
+        self.clock = clock
+        self.lock = threading.Lock()
+
+        self.intervals = dict()
+
+        # The last command sent for each command type, and when it was sent.
+        self.last_sent = dict()
+        self.last_sent_time = dict()
+
+        # The latest command waiting to be sent for each command type, in the order they were first queued.
+        self.pending = collections.OrderedDict()
+
+        # The number of commands sent and suppressed, keyed by command type.
+        self.sent_count = collections.Counter()
+        self.suppressed_count = collections.Counter()
+
+        self.configure(intervals)
+
+    # Updates the minimum interval between sends for each command type.
+    # intervals (dictionary) - The minimum number of seconds between sends, keyed by command type (e.g. "M73").
+    def configure(self, intervals = None):
+
+        with self.lock:
+            self.intervals = dict(intervals or {})
+
+    # Forgets the commands previously sent, so that the next command of each type is always sent.
+    # Should be used when the printer's display may have been changed by something else (e.g. a new print).
+    def reset(self):
+
+        with self.lock:
+
+            self.last_sent.clear()
+            self.last_sent_time.clear()
+            self.pending.clear()
+
+    # Queues a command to be sent on the next flush. A pending command of the same type is replaced.
+    # command (string) - The full command line (e.g. "M73 P50").
+    def queue(self, command):
+
+        command_type = command.split(" ", 1)[0]
+
+        with self.lock:
+
+            # Any command that hasn't been sent yet is now out of date.
+            if command_type in self.pending:
+
+                del self.pending[command_type]
+
+                self.suppressed_count[command_type] += 1
+
+            # The printer is already showing this command's value.
+            if self.last_sent.get(command_type) == command:
+
+                self.suppressed_count[command_type] += 1
+
+                return
+
+            self.pending[command_type] = command
+
+    # Sends all pending commands whose minimum interval has passed, in a single call.
+    # Returns the list of commands sent.
+    def flush(self):
+
+        with self.lock:
+
+            now = self.clock()
+
+            commands = []
+
+            for command_type, command in list(self.pending.items()):
+
+                last_sent_time = self.last_sent_time.get(command_type)
+
+                # Keep the command pending until it is allowed to be sent.
+                if last_sent_time is not None and now - last_sent_time < self.intervals.get(command_type, 0):
+                    continue
+
+                del self.pending[command_type]
+
+                self.last_sent[command_type] = command
+                self.last_sent_time[command_type] = now
+
+                self.sent_count[command_type] += 1
+
+                commands.append(command)
+
+        if len(commands) > 0:
+            self.send(commands)
+
+        return commands
+
+    # Gets the number of commands sent and suppressed, keyed by command type.
+    def get_statistics(self):
+
+        with self.lock:
+            return dict(sent = dict(self.sent_count), suppressed = dict(self.suppressed_count))
@@ -0,0 +1,183 @@
+from __future__ import absolute_import, unicode_literals
+
+import re
+import unicodedata
+
+# The rules used to shorten messages that don't fit the printer's display, in the order they're tried.
+# Each rule is a regular expression and its replacement, and is only applied if the message is still too long.
+ABBREVIATIONS = (
+    (r"\bRemaining\b", "Left"),
+    (r"\bElapsed\b", "Elap"),
+    (r"\btomorrow\b", "tmrw"),
+    (r"% complete\b", "%"),
+
+    # Drop the seconds from times (e.g. 01:02:03 becomes 01:02).
+    (r"\b(\d{1,2}:\d{2}):\d{2}\b", r"\1")
+)
+
+# Describes what a printer's display can show.
+class DisplayProfile(object):
+
+    __slots__ = ("name", "width", "max_code_point", "abbreviations")
+
+    # Initialize the profile.
+    # name (string) - The name shown to the user.
+    # width (int) - The number of characters that fit on a line of the display, or None if there is no limit.
+    # max_code_point (int) - The highest character code the display can show. Other characters are replaced.
+    # abbreviations (tuple) - The rules used to shorten messages that are too long for the display.
+    def __init__(self, name, width = None, max_code_point = 0x7e, abbreviations = ABBREVIATIONS):
+
+        object.__setattr__(self, "name", name)
+        object.__setattr__(self, "width", width)
+        object.__setattr__(self, "max_code_point", max_code_point)
+        object.__setattr__(self, "abbreviations", tuple((re.compile(pattern), replacement) for pattern, replacement in abbreviations))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("DisplayProfile is immutable")
+
+# The built in display profiles, keyed by the value stored in the plugin's settings.
+PROFILES = dict(
+    generic = DisplayProfile("Generic (no length limit)", abbreviations = ()),
+    marlin_20x4 = DisplayProfile("Marlin, 20x4 character LCD", 20),
+    marlin_12864 = DisplayProfile("Marlin, 128x64 graphical LCD", 21),
+    prusa = DisplayProfile("Prusa (MK2, MK3)", 20),
+    klipper = DisplayProfile("Klipper, 128x64 graphical LCD", 16)
+)
+
+# Maps characters to the text used to show them on a display. Characters up to Latin-1 are worked out up front,
+# as they cover almost every message. Others are worked out when first seen, and kept for later messages.
+class TranslationTable(dict):
+
+    # Initialize the table.
+    # max_code_point (int) - The highest character code the display can show.
+    def __init__(self, max_code_point):
+
+        super(TranslationTable, self).__init__()
+
+        self.max_code_point = max_code_point
+
+        for code_point in range(0x100):
+            self[code_point] = self.translate(code_point)
+
+    def __missing__(self, code_point):
+
+        value = self.translate(code_point)
+
+        self[code_point] = value
+
+        return value
+
+    # Gets the text used to show a character, or None to leave it out.
+    # code_point (int) - The character code.
+    def translate(self, code_point):
+
+        character = chr(code_point)
+
+        if 0x20 <= code_point <= self.max_code_point:
+            return code_point
+
+        category = unicodedata.category(character)
+
+        # Line breaks, tabs and other spaces (e.g. the narrow space some locales put before AM and PM).
+        if category.startswith("Z") or character in "\t\n\r":
+            return " "
+
+        # Accented characters are shown without their accents.
+        replacement = "".join(part for part in unicodedata.normalize("NFKD", character) if 0x20 <= ord(part) <= self.max_code_point)
+
+        if len(replacement) > 0:
+            return replacement
+
+        # Other control characters and combining marks can't be shown at all.
+        if category[0] in "CM":
+            return None
+
+        return "?"
+
+# Encodes printer messages (M117) for a display profile, so that they fit the display and are sent in as few bytes as possible.
+class DisplayEncoder(object):
+
+    # Runs of spaces, which are shown as a single space.
+    WHITESPACE = re.compile(r" {2,}")
+
+    # Initialize the encoder.
+    # profile_name (string) - The display profile to encode for. One of the keys of PROFILES.
+    # remove_colons (bool) - Whether to replace colons, which some firmwares can't show.
+    def __init__(self, profile_name = "generic", remove_colons = False):
+
+        # The number of messages encoded, their size before and after encoding in bytes, and the number that had to
+        # be abbreviated or truncated to fit the display.
+        self.message_count = 0
+        self.input_bytes = 0
+        self.output_bytes = 0
+        self.abbreviated_count = 0
+        self.truncated_count = 0
+
+        self.configure(profile_name, remove_colons)
+
+    # Sets the display profile to encode for.
+    # profile_name (string) - The display profile to encode for. One of the keys of PROFILES.
+    # remove_colons (bool) - Whether to replace colons, which some firmwares can't show.
+    def configure(self, profile_name = "generic", remove_colons = False):
+
+        profile = PROFILES.get(profile_name, PROFILES["generic"])
+
+        # Replaced together, so that a message being encoded always uses a matching profile and table.
+        self.compiled = (profile, TranslationTable(profile.max_code_point), remove_colons)
+
+    # Gets a message as it should be sent to the printer.
+    # message (string) - The message to encode.
+    def encode(self, message):
+
+        profile, table, remove_colons = self.compiled
+
+        text = message.translate(table)
+
+        result = self.finish(text, remove_colons)
+
+        if profile.width is not None and len(result) > profile.width:
+
+            self.abbreviated_count += 1
+
+            for pattern, replacement in profile.abbreviations:
+
+                text = pattern.sub(replacement, text)
+
+                result = self.finish(text, remove_colons)
+
+                if len(result) <= profile.width:
+                    break
+
+            else:
+
+                self.truncated_count += 1
+
+                result = result[:profile.width].rstrip()
+
+        self.message_count += 1
+        self.input_bytes += len(message.encode("utf-8"))
+        self.output_bytes += len(result)
+
+        return result
+
+    # Replaces colons if required, and removes unnecessary spaces.
+    # text (string) - The translated message.
+    # remove_colons (bool) - Whether to replace colons.
+    def finish(self, text, remove_colons):
+
+        if remove_colons:
+            text = text.replace(":", " ")
+
+        return self.WHITESPACE.sub(" ", text).strip()
+
+    # Gets the number of messages encoded and the bytes saved.
+    def get_statistics(self):
+
+        return dict(
+            messages = self.message_count,
+            input_bytes = self.input_bytes,
+            output_bytes = self.output_bytes,
+            saved_bytes = self.input_bytes - self.output_bytes,
+            abbreviated = self.abbreviated_count,
+            truncated = self.truncated_count
+        )
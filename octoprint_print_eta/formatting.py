@@ -0,0 +1,146 @@
+from __future__ import absolute_import, unicode_literals
+
+import collections
+import threading
+
+# The numbers 0 to 99 as two digit strings, used to format durations without formatting each number.
+TWO_DIGITS = tuple("{:02d}".format(value) for value in range(100))
+
+# Gets a number of seconds as a string (e.g. 1d 02:03:04). Negative durations are formatted as zero.
+# seconds (int) - The number of seconds.
+def format_duration(seconds):
+
+    seconds = int(seconds) if seconds > 0 else 0
+
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    days, hours = divmod(hours, 24)
+
+    if days > 0:
+        return "".join((str(days), "d ", TWO_DIGITS[hours], ":", TWO_DIGITS[minutes], ":", TWO_DIGITS[seconds]))
+
+    return "".join((TWO_DIGITS[hours], ":", TWO_DIGITS[minutes], ":", TWO_DIGITS[seconds]))
+
+# Gets many numbers of seconds as strings (e.g. 1d 02:03:04) at once.
+# values (iterable) - The numbers of seconds. None values are kept as None.
+def format_durations(values):
+    return [None if seconds is None else format_duration(seconds) for seconds in values]
+
+# Formats ETA times and dates using babel patterns that are compiled once, with results memoized.
+# Babel and its locale data are only loaded when the patterns are first needed, as they're slow to load.
+class ETAFormatter(object):
+
+    # The patterns used to format the time of day, for the 24 and 12 hour views respectively.
+    TWENTY_FOUR_HOUR_PATTERN = "HH:mm:ss"
+    TWELVE_HOUR_PATTERN = "hh:mm:ss a"
+
+    # The pattern used to format the date, if the print is not due to finish today or tomorrow.
+    DATE_PATTERN = "EEE d"
+
+    # The default maximum number of formatted values to keep for each cache.
+    DEFAULT_CACHE_SIZE = 128
+
+    # Initialize the formatter.
+    # use_twenty_four_hour_view (bool) - Whether to format times in 24 hour view (13:00), or 12 hour view (1:00 PM).
+    # locale (string or Locale) - The locale to format with. Defaults to the system's LC_TIME locale.
+    # cache_size (int) - The maximum number of formatted times and dates to keep.
+    def __init__(self, use_twenty_four_hour_view = True, locale = None, cache_size = DEFAULT_CACHE_SIZE):
+
+        self.cache_size = cache_size
+        self.lock = threading.Lock()
+
+        # The locale, time pattern and date pattern once compiled. None until they're first needed.
+        self.compiled = None
+
+        # Formatted time strings, keyed by the wall-clock second they represent.
+        self.time_cache = collections.OrderedDict()
+
+        # Formatted date strings, keyed by the day they represent.
+        self.date_cache = collections.OrderedDict()
+
+        self.configure(use_twenty_four_hour_view, locale)
+
+    # Sets the preferences to format with, and clears any previously formatted values.
+    # The patterns are compiled for the new preferences when they're next needed.
+    # use_twenty_four_hour_view (bool) - Whether to format times in 24 hour view (13:00), or 12 hour view (1:00 PM).
+    # locale (string or Locale) - The locale to format with. Defaults to the system's LC_TIME locale.
+    def configure(self, use_twenty_four_hour_view = True, locale = None):
+
+        with self.lock:
+
+            self.use_twenty_four_hour_view = use_twenty_four_hour_view
+            self.requested_locale = locale
+
+            self.compiled = None
+
+            self.time_cache.clear()
+            self.date_cache.clear()
+
+    # Compiles the patterns and loads the locale data, if they haven't been already.
+    # Can be used in the background to avoid the delay when the first ETA is formatted.
+    # Returns the locale, time pattern and date pattern.
+    def compile(self):
+
+        with self.lock:
+
+            if self.compiled is not None:
+                return self.compiled
+
+            from babel.core import Locale
+            from babel.dates import LC_TIME, parse_pattern
+
+            locale = Locale.parse(self.requested_locale or LC_TIME)
+
+            # Load the locale's data now, rather than when the first ETA is formatted.
+            locale.time_formats
+
+            time_pattern = parse_pattern(self.TWENTY_FOUR_HOUR_PATTERN if self.use_twenty_four_hour_view else self.TWELVE_HOUR_PATTERN)
+            date_pattern = parse_pattern(self.DATE_PATTERN)
+
+            self.compiled = (locale, time_pattern, date_pattern)
+
+            return self.compiled
+
+    # Gets the time of day of a datetime as a string (e.g. 13:00:00).
+    # value (datetime) - The datetime to format.
+    def format_time(self, value):
+
+        key = value.replace(microsecond = 0, tzinfo = None)
+
+        result = self.time_cache.get(key)
+
+        if result is None:
+
+            locale, time_pattern, _ = self.compiled or self.compile()
+
+            result = time_pattern.apply(key.time(), locale)
+
+            self.store(self.time_cache, key, result)
+
+        return result
+
+    # Gets the date of a datetime as a string (e.g. Mon 4).
+    # value (date or datetime) - The date to format.
+    def format_date(self, value):
+
+        key = value.date() if hasattr(value, "date") else value
+
+        result = self.date_cache.get(key)
+
+        if result is None:
+
+            locale, _, date_pattern = self.compiled or self.compile()
+
+            result = date_pattern.apply(key, locale)
+
+            self.store(self.date_cache, key, result)
+
+        return result
+
+    # Adds a formatted value to a cache, evicting the oldest value if the cache is full.
+    def store(self, cache, key, value):
+
+        cache[key] = value
+
+        if len(cache) > self.cache_size:
+            cache.popitem(last = False)
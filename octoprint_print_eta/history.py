@@ -0,0 +1,124 @@
+from __future__ import absolute_import, unicode_literals
+
+import array
+import math
+import threading
+
+# Records how the ETA moves during a print, in a fixed amount of memory however long the print runs for.
+# Samples are kept at most one per interval. When the buffer fills up, every other sample is dropped and the interval
+# doubles, so the whole print is always covered, at a resolution that falls as the print goes on.
+class ETAHistory(object):
+
+    # The default number of samples kept. Each sample takes 16 bytes.
+    DEFAULT_CAPACITY = 256
+
+    # The default number of seconds between samples, before the buffer first fills up.
+    DEFAULT_INTERVAL = 5.0
+
+    # Initialize the history.
+    # capacity (int) - The maximum number of samples kept. Must be even.
+    # interval (float) - The number of seconds between samples, before the buffer first fills up.
+    def __init__(self, capacity = DEFAULT_CAPACITY, interval = DEFAULT_INTERVAL):
+
+        self.capacity = capacity
+        self.initial_interval = interval
+        self.lock = threading.Lock()
+
+        # The samples, allocated up front. Times are stored in seconds since the print started, so that single
+        # precision is enough. The completion is NaN when unknown.
+        self.times = array.array("f", [0.0]) * capacity
+        self.time_left = array.array("f", [0.0]) * capacity
+        self.completion = array.array("f", [0.0]) * capacity
+        self.finish = array.array("f", [0.0]) * capacity
+
+        self.reset()
+
+    # Forgets all samples. Should be used when a new print starts.
+    # start (float) - When the print started, as a Unix timestamp. None to use the time of the first sample.
+    def reset(self, start = None):
+
+        with self.lock:
+
+            self.start = start
+            self.interval = self.initial_interval
+            self.count = 0
+
+            # Incremented whenever samples are dropped, so that clients know to fetch the whole series again.
+            self.generation = 0
+
+            # The most recent sample, kept even if it's too soon after the last stored sample to be stored itself.
+            self.latest = None
+
+    # Records a sample.
+    # timestamp (float) - When the sample was taken, as a Unix timestamp.
+    # time_left (float) - The estimated number of seconds left, as reported by OctoPrint.
+    # completion (float) - The print's completion, between 0 and 100, or None if unknown.
+    # finish (float) - The projected finish time shown to the user, as a Unix timestamp.
+    def add(self, timestamp, time_left, completion, finish):
+
+        with self.lock:
+
+            if self.start is None:
+                self.start = timestamp
+
+            offset = timestamp - self.start
+
+            sample = (offset, time_left, float("nan") if completion is None else completion, finish - self.start)
+
+            self.latest = sample
+
+            if self.count > 0 and offset - self.times[self.count - 1] < self.interval:
+                return
+
+            if self.count == self.capacity:
+                self.downsample()
+
+            index = self.count
+
+            self.times[index], self.time_left[index], self.completion[index], self.finish[index] = sample
+
+            self.count += 1
+
+    # Halves the resolution of the stored samples, keeping every other sample. The lock must be held.
+    def downsample(self):
+
+        half = self.capacity // 2
+
+        for values in (self.times, self.time_left, self.completion, self.finish):
+            values[:half] = values[0:self.capacity:2]
+
+        self.count = half
+        self.interval *= 2
+        self.generation += 1
+
+    # Gets the samples as columns, in a form suitable for serving as JSON.
+    # Returns only the samples stored after the first `since`, unless samples have been dropped since the client's
+    # generation, in which case all samples are returned. The response's offset is the index of its first sample.
+    # since (int) - The number of samples the client already has.
+    # generation (int) - The generation of the samples the client already has.
+    def get_series(self, since = 0, generation = None):
+
+        with self.lock:
+
+            if generation != self.generation or since < 0 or since > self.count:
+                since = 0
+
+            latest = self.latest
+
+            return dict(
+                start = self.start,
+                generation = self.generation,
+                interval = self.interval,
+                offset = since,
+                count = self.count,
+                time = [int(round(value)) for value in self.times[since:self.count]],
+                time_left = [int(round(value)) for value in self.time_left[since:self.count]],
+                completion = [None if math.isnan(value) else round(value, 1) for value in self.completion[since:self.count]],
+                finish = [int(round(value)) for value in self.finish[since:self.count]],
+                latest = None if latest is None else [
+                    int(round(latest[0])),
+                    int(round(latest[1])),
+                    None if math.isnan(latest[2]) else round(latest[2], 1),
+                    int(round(latest[3]))
+                ]
+            )
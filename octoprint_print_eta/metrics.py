@@ -0,0 +1,205 @@
+from __future__ import absolute_import, unicode_literals
+
+import bisect
+import functools
+import threading
+import time
+
+# Counts how many times something happened.
+class Counter(object):
+
+    def __init__(self):
+
+        self.lock = threading.Lock()
+        self.value = 0
+
+    # Adds to the count.
+    # amount (int) - The amount to add.
+    def increment(self, amount = 1):
+
+        with self.lock:
+            self.value += amount
+
+# Counts observed values in fixed buckets, along with their total.
+class Histogram(object):
+
+    # The upper bounds of the buckets, in seconds. Suitable for timing calls that should take well under a second.
+    DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+    # Initialize the histogram.
+    # buckets (tuple) - The upper bounds of the buckets, in ascending order.
+    def __init__(self, buckets = DEFAULT_BUCKETS):
+
+        self.lock = threading.Lock()
+        self.buckets = buckets
+
+        # The number of values in each bucket, plus a final bucket for values greater than the last bound.
+        self.counts = [0] * (len(buckets) + 1)
+
+        self.sum = 0.0
+        self.count = 0
+
+    # Records a value.
+    # value (float) - The value to record.
+    def observe(self, value):
+
+        index = bisect.bisect_left(self.buckets, value)
+
+        with self.lock:
+
+            self.counts[index] += 1
+
+            self.sum += value
+            self.count += 1
+
+# Keeps the plugin's metrics in memory, and formats them for Prometheus.
+# Each metric has its own lock, so that recording one metric never waits on another.
+class MetricsRegistry(object):
+
+    PREFIX = "print_eta_"
+
+    def __init__(self):
+
+        self.lock = threading.Lock()
+
+        # Metrics keyed by name, then by their label. Each name has help text.
+        self.counters = dict()
+        self.histograms = dict()
+        self.descriptions = dict()
+
+        # Functions that return extra counter values when the metrics are formatted, keyed by name.
+        # Used for counts that are already kept elsewhere, so that they aren't counted twice.
+        self.collectors = dict()
+
+    # Gets a counter, creating it if necessary.
+    # name (string) - The name of the counter, without the prefix.
+    # description (string) - The help text for the counter.
+    # label (tuple) - Optional. The name and value of the label that distinguishes this counter from others with the same name.
+    def counter(self, name, description, label = None):
+        return self.get_metric(self.counters, Counter, name, description, label)
+
+    # Gets a histogram, creating it if necessary.
+    # name (string) - The name of the histogram, without the prefix.
+    # description (string) - The help text for the histogram.
+    # label (tuple) - Optional. The name and value of the label that distinguishes this histogram from others with the same name.
+    def histogram(self, name, description, label = None):
+        return self.get_metric(self.histograms, Histogram, name, description, label)
+
+    # Adds a function that returns counter values when the metrics are formatted.
+    # name (string) - The name of the counter, without the prefix.
+    # description (string) - The help text for the counter.
+    # collect (function) - Returns a dictionary of counter values, keyed by their label as a (name, value) tuple.
+    def collector(self, name, description, collect):
+
+        with self.lock:
+
+            self.collectors[name] = collect
+            self.descriptions[name] = description
+
+    def get_metric(self, metrics, metric_type, name, description, label):
+
+        # Fast path, without locking, for metrics that already exist.
+        metric = metrics.get(name, {}).get(label)
+
+        if metric is not None:
+            return metric
+
+        with self.lock:
+
+            self.descriptions[name] = description
+
+            return metrics.setdefault(name, dict()).setdefault(label, metric_type())
+
+    # Formats the metrics in the Prometheus text exposition format.
+    def format(self):
+
+        lines = []
+
+        with self.lock:
+
+            counters = dict((name, dict(values)) for name, values in self.counters.items())
+            histograms = dict((name, dict(values)) for name, values in self.histograms.items())
+            collectors = dict(self.collectors)
+            descriptions = dict(self.descriptions)
+
+        for name, collect in collectors.items():
+            counters.setdefault(name, dict()).update(collect())
+
+        for name in sorted(counters):
+
+            full_name = self.PREFIX + name
+
+            lines.append("# HELP {} {}".format(full_name, descriptions[name]))
+            lines.append("# TYPE {} counter".format(full_name))
+
+            for label, counter in sorted(counters[name].items(), key = lambda item: item[0] or ("", "")):
+
+                value = counter.value if isinstance(counter, Counter) else counter
+
+                lines.append("{}{} {}".format(full_name, self.format_labels(label), value))
+
+        for name in sorted(histograms):
+
+            full_name = self.PREFIX + name
+
+            lines.append("# HELP {} {}".format(full_name, descriptions[name]))
+            lines.append("# TYPE {} histogram".format(full_name))
+
+            for label, histogram in sorted(histograms[name].items(), key = lambda item: item[0] or ("", "")):
+
+                with histogram.lock:
+
+                    counts = list(histogram.counts)
+                    total = histogram.sum
+                    count = histogram.count
+
+                cumulative = 0
+
+                for bound, bucket_count in zip(list(histogram.buckets) + ["+Inf"], counts):
+
+                    cumulative += bucket_count
+
+                    lines.append("{}_bucket{} {}".format(full_name, self.format_labels(label, le = bound), cumulative))
+
+                lines.append("{}_sum{} {}".format(full_name, self.format_labels(label), total))
+                lines.append("{}_count{} {}".format(full_name, self.format_labels(label), count))
+
+        return "\n".join(lines) + "\n"
+
+    def format_labels(self, label, le = None):
+
+        labels = []
+
+        if label is not None:
+            labels.append('{}="{}"'.format(*label))
+
+        if le is not None:
+            labels.append('le="{}"'.format(le))
+
+        if len(labels) == 0:
+            return ""
+
+        return "{" + ",".join(labels) + "}"
+
+# Decorates a plugin method, recording how long each call takes in the plugin's call duration histogram.
+# name (string) - The name of the method, used as the histogram's label.
+def timed(name):
+
+    label = ("method", name)
+
+    def decorator(method):
+
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+
+            start = time.perf_counter()
+
+            try:
+                return method(self, *args, **kwargs)
+
+            finally:
+                self.metrics.histogram("call_duration_seconds", "Time taken by the plugin's methods.", label).observe(time.perf_counter() - start)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,282 @@
+from __future__ import absolute_import, unicode_literals
+
+import array
+import hashlib
+import json
+import os
+import struct
+import sys
+import threading
+
+from .analysis import GcodeIndex
+
+# Stores the analysis of G-code files on disk, keyed by the hash of their contents, so that files are only analysed once.
+# The least recently used profiles are removed once the cache grows beyond its maximum size. The hash of each file that
+# uses a profile is also stored, keyed by the file's path, so that profiles can be removed along with the last file
+# that uses them.
+class ProfileCache(object):
+
+    # Identifies the binary format of the profile files, followed by its version.
+    MAGIC = b"PETA"
+    VERSION = 1
+
+    # Magic, version, file size, number of samples and number of layers.
+    HEADER = struct.Struct("<4sHQQQ")
+
+    # The extension of the profile files.
+    EXTENSION = ".profile"
+
+    # The name of the file that the hashes of the files using the profiles are stored in.
+    PATHS_FILE = "paths.json"
+
+    # Initialize the cache.
+    # folder (string) - The folder to store the profiles in. Created if it doesn't exist.
+    # max_size (int) - The maximum total size of the profiles, in bytes.
+    def __init__(self, folder, max_size):
+
+        self.folder = folder
+        self.max_size = max_size
+        self.lock = threading.Lock()
+
+        if not os.path.isdir(folder):
+            os.makedirs(folder)
+
+        # The hash of the contents of each file that uses a profile, keyed by the file's path.
+        self.paths = self.load_paths()
+
+    # Gets the index stored for a file's contents, or None if it hasn't been stored.
+    # content_hash (string) - The hash of the file's contents.
+    def get(self, content_hash):
+
+        path = self.get_path(content_hash)
+
+        with self.lock:
+
+            try:
+
+                with open(path, "rb") as file:
+                    data = file.read()
+
+                # Mark the profile as recently used.
+                os.utime(path, None)
+
+            except (IOError, OSError):
+                return None
+
+        try:
+            return self.decode(data)
+
+        except ValueError:
+
+            self.remove(content_hash)
+
+            return None
+
+    # Stores the index for a file's contents, then removes the least recently used profiles if the cache is too large.
+    # content_hash (string) - The hash of the file's contents.
+    # index (GcodeIndex) - The index to store.
+    def put(self, content_hash, index):
+
+        path = self.get_path(content_hash)
+        temporary_path = path + ".tmp"
+
+        with self.lock:
+
+            with open(temporary_path, "wb") as file:
+                file.write(self.encode(index))
+
+            os.replace(temporary_path, path)
+
+            self.evict()
+
+    # Removes the index stored for a file's contents, if any.
+    # content_hash (string) - The hash of the file's contents.
+    def remove(self, content_hash):
+
+        with self.lock:
+
+            try:
+                os.remove(self.get_path(content_hash))
+
+            except OSError:
+                pass
+
+    # Records that a file uses the profile for its contents, replacing any profile it used before.
+    # path (string) - The path of the file.
+    # content_hash (string) - The hash of the file's contents.
+    def link(self, path, content_hash):
+
+        with self.lock:
+
+            if self.paths.get(path) == content_hash:
+                return
+
+            self.paths[path] = content_hash
+
+            self.save_paths()
+
+    # Records that a file no longer exists, or no longer has the contents it had. Removes the profile it used,
+    # unless another file has the same contents.
+    # path (string) - The path of the file.
+    def unlink(self, path):
+
+        with self.lock:
+
+            content_hash = self.paths.pop(path, None)
+
+            if content_hash is None:
+                return
+
+            self.save_paths()
+
+            if content_hash in self.paths.values():
+                return
+
+            try:
+                os.remove(self.get_path(content_hash))
+
+            except OSError:
+                pass
+
+    # Loads the hashes of the files using the profiles. Returns an empty dictionary if they can't be read.
+    def load_paths(self):
+
+        try:
+
+            with open(os.path.join(self.folder, self.PATHS_FILE), "r") as file:
+                paths = json.load(file)
+
+        except (IOError, OSError, ValueError):
+            return dict()
+
+        if not isinstance(paths, dict):
+            return dict()
+
+        return paths
+
+    # Saves the hashes of the files using the profiles. The lock must be held.
+    def save_paths(self):
+
+        path = os.path.join(self.folder, self.PATHS_FILE)
+        temporary_path = path + ".tmp"
+
+        with open(temporary_path, "w") as file:
+            json.dump(self.paths, file, separators = (",", ":"))
+
+        os.replace(temporary_path, path)
+
+    # Removes the least recently used profiles until the cache is within its maximum size, and forgets the files that
+    # used them. The lock must be held.
+    def evict(self):
+
+        profiles = []
+
+        for name in os.listdir(self.folder):
+
+            if not name.endswith(self.EXTENSION):
+                continue
+
+            path = os.path.join(self.folder, name)
+
+            try:
+                stat = os.stat(path)
+
+            except OSError:
+                continue
+
+            profiles.append((stat.st_mtime, stat.st_size, path))
+
+        total_size = sum(size for _, size, _ in profiles)
+
+        for _, size, path in sorted(profiles):
+
+            if total_size <= self.max_size:
+                break
+
+            try:
+                os.remove(path)
+
+            except OSError:
+                continue
+
+            total_size -= size
+
+        # Forget the files whose profiles were removed, so that the paths don't grow without limit.
+        paths = dict((path, content_hash) for path, content_hash in self.paths.items() if os.path.exists(self.get_path(content_hash)))
+
+        if len(paths) != len(self.paths):
+
+            self.paths = paths
+
+            self.save_paths()
+
+    # Gets the path of the profile for a file's contents.
+    # content_hash (string) - The hash of the file's contents.
+    def get_path(self, content_hash):
+        return os.path.join(self.folder, content_hash + self.EXTENSION)
+
+    # Encodes an index in the cache's binary format.
+    # index (GcodeIndex) - The index to encode.
+    def encode(self, index):
+
+        offsets = array.array("Q", index.offsets)
+        seconds = array.array("d", index.seconds)
+        layers = array.array("Q", index.layers)
+
+        # The format is little-endian, regardless of the platform.
+        if sys.byteorder == "big":
+
+            offsets.byteswap()
+            seconds.byteswap()
+            layers.byteswap()
+
+        header = self.HEADER.pack(self.MAGIC, self.VERSION, index.size, len(offsets), len(layers))
+
+        return header + offsets.tobytes() + seconds.tobytes() + layers.tobytes()
+
+    # Decodes an index from the cache's binary format.
+    # Raises ValueError if the data isn't a valid profile.
+    # data (bytes) - The data to decode.
+    def decode(self, data):
+
+        if len(data) < self.HEADER.size:
+            raise ValueError("Profile is too short")
+
+        magic, version, size, sample_count, layer_count = self.HEADER.unpack_from(data)
+
+        if magic != self.MAGIC or version != self.VERSION:
+            raise ValueError("Unsupported profile format")
+
+        if len(data) != self.HEADER.size + (sample_count * 2 + layer_count) * 8:
+            raise ValueError("Profile is the wrong length")
+
+        position = self.HEADER.size
+
+        arrays = []
+
+        for typecode, count in (("Q", sample_count), ("d", sample_count), ("Q", layer_count)):
+
+            values = array.array(typecode)
+            values.frombytes(data[position:position + count * 8])
+
+            if sys.byteorder == "big":
+                values.byteswap()
+
+            arrays.append(values)
+
+            position += count * 8
+
+        return GcodeIndex(arrays[0], arrays[1], arrays[2], size)
+
+# Gets the SHA-1 hash of a file's contents, reading it in chunks.
+# path (string) - The path to the file on disk.
+def get_content_hash(path):
+
+    sha1 = hashlib.sha1()
+
+    with open(path, "rb") as file:
+
+        for chunk in iter(lambda: file.read(65536), b""):
+            sha1.update(chunk)
+
+    return sha1.hexdigest()
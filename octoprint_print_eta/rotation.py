@@ -0,0 +1,98 @@
+from __future__ import absolute_import, unicode_literals
+
+import collections
+
+# The values that printer messages are formatted from.
+# eta_string (string) - The formatted ETA.
+# print_time_elapsed (timedelta) - How long the print has been running for, or None if unknown.
+# print_time_remaining (timedelta) - How long the print has left.
+# completion (float) - The print's completion, between 0 and 100, or None if unknown.
+MessageValues = collections.namedtuple("MessageValues", ["eta_string", "print_time_elapsed", "print_time_remaining", "completion"])
+
+# A request for the worker to refresh the messages.
+# next_printer_message (bool) - Whether to move on to the next printer message first.
+# message_plan (MessagePlan) - A new order in which to show printer messages, or None to keep the current order.
+RefreshRequest = collections.namedtuple("RefreshRequest", ["next_printer_message", "message_plan"])
+
+# Combines a waiting refresh request with a newer one. A request to move on to the next printer message is never lost,
+# and the newest order of printer messages is kept.
+# pending (RefreshRequest) - The waiting request.
+# request (RefreshRequest) - The newer request.
+def merge_refresh_requests(pending, request):
+
+    return RefreshRequest(
+        pending.next_printer_message or request.next_printer_message,
+        pending.message_plan if request.message_plan is None else request.message_plan
+    )
+
+# The order in which printer messages are shown, compiled from the plugin's settings.
+# Rotating to the next message and formatting the current one are both single lookups.
+class MessagePlan(object):
+
+    __slots__ = ("modes", "next_modes", "formatters")
+
+    # The printer message modes.
+    ETA = 0
+    TIME_ELAPSED = 1
+    TIME_REMAINING = 2
+    PROGRESS = 3
+
+    # Used when all printer messages are disabled.
+    NONE = -1
+
+    # Initialize the plan.
+    # enabled_modes (list) - The enabled printer message modes.
+    # get_time_string (function) - Formats a timedelta as a string.
+    def __init__(self, enabled_modes, get_time_string):
+
+        modes = tuple(sorted(set(enabled_modes)))
+
+        next_modes = dict()
+
+        # Each mode moves on to the next enabled mode with a greater value, or back to the first enabled mode.
+        # Disabled modes are included, so that the rotation continues correctly after the settings change.
+        for mode in (self.NONE, self.ETA, self.TIME_ELAPSED, self.TIME_REMAINING, self.PROGRESS):
+
+            following = [enabled_mode for enabled_mode in modes if enabled_mode > mode]
+
+            next_modes[mode] = following[0] if len(following) > 0 else (modes[0] if len(modes) > 0 else self.NONE)
+
+        formatters = dict()
+
+        formatters[self.ETA] = lambda values: "ETA: {}".format(values.eta_string)
+
+        formatters[self.TIME_ELAPSED] = lambda values: "" if values.print_time_elapsed is None else \
+            "Elapsed: " + get_time_string(values.print_time_elapsed)
+
+        formatters[self.TIME_REMAINING] = lambda values: "Remaining: " + get_time_string(values.print_time_remaining)
+
+        formatters[self.PROGRESS] = lambda values: "" if values.completion is None else \
+            str(int(values.completion)) + "% complete"
+
+        object.__setattr__(self, "modes", modes)
+        object.__setattr__(self, "next_modes", next_modes)
+        object.__setattr__(self, "formatters", formatters)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("MessagePlan is immutable")
+
+    # Gets the first mode in the rotation, or NONE if all messages are disabled.
+    def get_first_mode(self):
+        return self.modes[0] if len(self.modes) > 0 else self.NONE
+
+    # Gets the mode that follows another in the rotation, or NONE if all messages are disabled.
+    # mode (int) - The current mode.
+    def get_next_mode(self, mode):
+        return self.next_modes.get(mode, self.get_first_mode())
+
+    # Gets the printer message for a mode.
+    # mode (int) - The mode to format the message for.
+    # values (MessageValues) - The values to format the message from.
+    def format(self, mode, values):
+
+        formatter = self.formatters.get(mode)
+
+        if formatter is None:
+            return ""
+
+        return formatter(values)
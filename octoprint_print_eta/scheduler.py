@@ -0,0 +1,201 @@
+from __future__ import absolute_import, unicode_literals
+
+import math
+import threading
+import time
+
+# Wakes the plugin only at the instants at which its output could change, using a single long-lived thread.
+# The plugin's messages are shown to the nearest second, so every wakeup is rounded up to the next second boundary,
+# and anything that becomes due before then shares the same wakeup. Three things can make a wakeup due:
+# a request (OctoPrint reported something new), the next change predicted from the last messages calculated (e.g. the
+# next whole percent), and the next slot of the printer message rotation.
+class RefreshScheduler(object):
+
+    # Initialize the scheduler. Call start to start its thread.
+    # refresh (function) - Called with no arguments when a refresh is due.
+    # rotate (function) - Called with no arguments, in place of refresh, when the next printer message is due.
+    # resolution (float) - The number of seconds between the instants at which the output could change.
+    # clock (function) - Returns the current wall-clock time in seconds.
+    def __init__(self, refresh, rotate, resolution = 1.0, clock = time.time):
+
+        self.refresh = refresh
+        self.rotate = rotate
+        self.resolution = resolution
+        self.clock = clock
+        self.condition = threading.Condition()
+
+        # The times at which a requested refresh, the next predicted change and the next rotation slot are due, if any.
+        self.request_time = None
+        self.change_time = None
+        self.rotation_time = None
+
+        # The number of seconds between rotation slots, or None if the printer messages aren't rotating.
+        self.rotation_interval = None
+
+        self.thread = None
+        self.running = False
+
+        # The number of refreshes requested, the number of times the thread woke up, and the number of refreshes
+        # and rotations performed.
+        self.request_count = 0
+        self.wakeup_count = 0
+        self.run_count = 0
+        self.rotation_count = 0
+
+    # Starts the scheduler's thread, if it isn't already running.
+    def start(self):
+
+        with self.condition:
+
+            if self.running:
+                return
+
+            self.running = True
+
+        self.thread = threading.Thread(target = self.run, name = "PrintETA refresh scheduler")
+        self.thread.daemon = True
+        self.thread.start()
+
+    # Stops the scheduler's thread, and waits for it to finish.
+    def stop(self):
+
+        with self.condition:
+
+            self.running = False
+
+            self.condition.notify()
+
+        if self.thread is not None:
+
+            self.thread.join()
+
+            self.thread = None
+
+    # Requests a refresh at the next resolution boundary. Requests made before then share the same refresh.
+    def request(self):
+
+        with self.condition:
+
+            self.request_count += 1
+
+            if self.request_time is None:
+
+                self.request_time = self.get_boundary(self.clock())
+
+                self.condition.notify()
+
+    # Sets the next time at which the output is predicted to change, replacing any previous prediction.
+    # instant (float) - The time, as returned by the clock, or None if the output won't change by itself.
+    def schedule(self, instant):
+
+        with self.condition:
+
+            self.change_time = None if instant is None else self.get_boundary(instant)
+
+            self.condition.notify()
+
+    # Starts rotating the printer messages, if they aren't already rotating. The first rotation is due after one interval.
+    # interval (float) - The number of seconds between rotations.
+    def start_rotation(self, interval):
+
+        with self.condition:
+
+            if self.rotation_interval is not None:
+                return
+
+            self.rotation_interval = interval
+            self.rotation_time = self.get_boundary(self.clock() + interval)
+
+            self.condition.notify()
+
+    # Stops rotating the printer messages.
+    def stop_rotation(self):
+
+        with self.condition:
+
+            self.rotation_interval = None
+            self.rotation_time = None
+
+    # Gets the first resolution boundary after an instant.
+    # instant (float) - The time, as returned by the clock.
+    def get_boundary(self, instant):
+        return (math.floor(instant / self.resolution) + 1) * self.resolution
+
+    # Gets the time of the next wakeup, or None if nothing is due. The condition must be held.
+    def get_deadline(self):
+
+        times = [value for value in (self.request_time, self.change_time, self.rotation_time) if value is not None]
+
+        return min(times) if len(times) > 0 else None
+
+    # Performs whatever is due at the clock's current time. Returns the function to call, if any, which should be
+    # called without the condition held. The condition must be held.
+    def take_due(self):
+
+        now = self.clock()
+
+        deadline = self.get_deadline()
+
+        if deadline is None or deadline > now:
+            return None
+
+        # Any refresh that's due is covered by the rotation, as the next message is calculated straight away.
+        self.request_time = None
+        self.change_time = None
+
+        if self.rotation_time is not None and self.rotation_time <= now:
+
+            # Skip any slots that were missed, rather than rotating several times at once.
+            while self.rotation_time <= now:
+                self.rotation_time += self.rotation_interval
+
+            self.rotation_count += 1
+
+            return self.rotate
+
+        self.run_count += 1
+
+        return self.refresh
+
+    # Performs whatever is due at the clock's current time, without waiting. Used in place of the thread to drive the
+    # scheduler from another clock.
+    def tick(self):
+
+        with self.condition:
+            callback = self.take_due()
+
+        if callback is not None:
+            callback()
+
+    # Waits for each wakeup, and performs whatever is due. Runs on the scheduler's thread.
+    def run(self):
+
+        while True:
+
+            with self.condition:
+
+                while True:
+
+                    if not self.running:
+                        return
+
+                    deadline = self.get_deadline()
+
+                    if deadline is None:
+                        self.condition.wait()
+
+                    else:
+
+                        delay = deadline - self.clock()
+
+                        if delay <= 0:
+                            break
+
+                        self.condition.wait(delay)
+
+                    self.wakeup_count += 1
+
+                callback = self.take_due()
+
+            if callback is not None:
+                callback()
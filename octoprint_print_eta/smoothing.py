@@ -0,0 +1,166 @@
+from __future__ import absolute_import, unicode_literals
+
+import math
+import threading
+
+# Passes estimates through unchanged.
+class NoFilter(object):
+
+    # Forgets any previous estimates.
+    def reset(self):
+        pass
+
+    # Gets the filtered value of a new estimate.
+    # value (float) - The new estimate.
+    # elapsed (float) - The number of seconds since the previous estimate.
+    def update(self, value, elapsed):
+        return value
+
+# Smooths estimates using an exponential moving average. Each estimate is weighted by the time since the previous one,
+# so that the smoothing doesn't depend on how often estimates are made.
+class ExponentialFilter(object):
+
+    # Initialize the filter.
+    # time_constant (float) - The number of seconds after which an estimate's weight has decayed to about a third.
+    def __init__(self, time_constant = 45.0):
+
+        self.time_constant = time_constant
+        self.value = None
+
+    # Forgets any previous estimates.
+    def reset(self):
+        self.value = None
+
+    # Gets the filtered value of a new estimate.
+    # value (float) - The new estimate.
+    # elapsed (float) - The number of seconds since the previous estimate.
+    def update(self, value, elapsed):
+
+        if self.value is None:
+            self.value = value
+
+        else:
+            self.value += (1.0 - math.exp(-max(0.0, elapsed) / self.time_constant)) * (value - self.value)
+
+        return self.value
+
+# Smooths estimates using a one-dimensional Kalman filter, treating the true value as roughly constant.
+class KalmanFilter(object):
+
+    # Initialize the filter.
+    # process_variance (float) - How much the true value is expected to change per second, squared.
+    # measurement_variance (float) - How noisy the estimates are expected to be, squared.
+    def __init__(self, process_variance = 2.5, measurement_variance = 3600.0):
+
+        self.process_variance = process_variance
+        self.measurement_variance = measurement_variance
+
+        self.value = None
+        self.variance = None
+
+    # Forgets any previous estimates.
+    def reset(self):
+
+        self.value = None
+        self.variance = None
+
+    # Gets the filtered value of a new estimate.
+    # value (float) - The new estimate.
+    # elapsed (float) - The number of seconds since the previous estimate.
+    def update(self, value, elapsed):
+
+        if self.value is None:
+
+            self.value = value
+            self.variance = self.measurement_variance
+
+            return self.value
+
+        self.variance += self.process_variance * max(0.0, elapsed)
+
+        gain = self.variance / (self.variance + self.measurement_variance)
+
+        self.value += gain * (value - self.value)
+        self.variance *= 1.0 - gain
+
+        return self.value
+
+# Smooths the estimated finish time of a print, so that the ETA only changes when the estimate has really moved.
+# Estimates are filtered, then held until the filtered value moves outside a band around the last value used.
+# Estimates of the same time left as the previous estimate are repeated reads of an estimate that hasn't been updated,
+# so they aren't filtered again.
+class ETASmoother(object):
+
+    # The available filters, keyed by the name used in the plugin's settings.
+    FILTERS = dict(
+        none = NoFilter,
+        ema = ExponentialFilter,
+        kalman = KalmanFilter
+    )
+
+    # Initialize the smoother.
+    # filter_name (string) - The filter to use. One of the keys of FILTERS.
+    # threshold (float) - The number of seconds that the filtered finish time must move by before it is used.
+    def __init__(self, filter_name = "none", threshold = 0):
+
+        self.lock = threading.Lock()
+
+        self.filter = self.FILTERS.get(filter_name, NoFilter)()
+        self.threshold = threshold
+
+        # The finish time currently in use.
+        self.value = None
+
+        # The time of the previous estimate that was filtered, and the time left it estimated.
+        self.previous_time = None
+        self.previous_time_left = None
+
+        # The number of estimates smoothed, and the number that didn't change the finish time in use.
+        self.update_count = 0
+        self.suppressed_count = 0
+
+    # Forgets any previous estimates. Should be used when a new print starts.
+    def reset(self):
+
+        with self.lock:
+
+            self.filter.reset()
+
+            self.value = None
+
+            self.previous_time = None
+            self.previous_time_left = None
+
+    # Gets the finish time to use for a new estimate.
+    # finish_time (float) - The estimated finish time of the print, as a Unix timestamp.
+    # now (float) - The time of the estimate, as a Unix timestamp.
+    def update(self, finish_time, now):
+
+        with self.lock:
+
+            self.update_count += 1
+
+            time_left = finish_time - now
+
+            if self.value is not None and time_left == self.previous_time_left:
+
+                self.suppressed_count += 1
+
+                return self.value
+
+            elapsed = 0.0 if self.previous_time is None else now - self.previous_time
+
+            self.previous_time = now
+            self.previous_time_left = time_left
+
+            filtered_finish_time = self.filter.update(finish_time, elapsed)
+
+            if self.value is not None and abs(filtered_finish_time - self.value) <= self.threshold:
+
+                self.suppressed_count += 1
+
+                return self.value
+
+            self.value = filtered_finish_time
+
+            return self.value
@@ -0,0 +1,66 @@
+from __future__ import absolute_import, unicode_literals
+
+import hashlib
+import json
+import time
+
+# An immutable, pre-serialized copy of the plugin's current ETA information, served to API clients.
+class ETASnapshot(object):
+
+    __slots__ = ("data", "body", "etag")
+
+    # Initialize the snapshot.
+    # data (dictionary) - The ETA information. Must be JSON serializable.
+    def __init__(self, data):
+
+        body = json.dumps(data, sort_keys = True, separators = (",", ":")).encode("utf-8")
+
+        object.__setattr__(self, "data", dict(data))
+        object.__setattr__(self, "body", body)
+
+        # Clients can use this to check whether the snapshot has changed since they last requested it.
+        object.__setattr__(self, "etag", hashlib.sha1(body).hexdigest())
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ETASnapshot is immutable")
+
+# An immutable copy of the messages calculated from the printer's state, along with the values they were calculated from.
+# Replaced as a whole each time the messages are calculated, so that other threads always see a consistent set of values.
+class MessageState(object):
+
+    __slots__ = ("eta_string", "printer_message", "print_finish_time", "print_time_elapsed", "print_time_left", "completion")
+
+    # Initialize the state. The defaults represent messages that couldn't be calculated.
+    # eta_string (string) - The ETA string passed to the OctoPrint UI.
+    # printer_message (string) - The message string passed to the printer, if enabled.
+    # print_finish_time (datetime) - The estimated finish time of the print, or None if unknown.
+    # print_time_elapsed (int) - The number of seconds the print has been running for, or None if unknown.
+    # print_time_left (int) - The number of seconds the print has left, or None if unknown.
+    # completion (float) - The print's completion, between 0 and 100, or None if unknown.
+    def __init__(self, eta_string = "-", printer_message = "", print_finish_time = None, print_time_elapsed = None, print_time_left = None, completion = None):
+
+        object.__setattr__(self, "eta_string", eta_string)
+        object.__setattr__(self, "printer_message", printer_message)
+        object.__setattr__(self, "print_finish_time", print_finish_time)
+        object.__setattr__(self, "print_time_elapsed", print_time_elapsed)
+        object.__setattr__(self, "print_time_left", print_time_left)
+        object.__setattr__(self, "completion", completion)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("MessageState is immutable")
+
+    # Gets the ETA as a Unix timestamp, or None if it's unknown.
+    def get_eta_timestamp(self):
+
+        if self.print_finish_time is None:
+            return None
+
+        return time.mktime(self.print_finish_time.timetuple())
+
+    # Gets the time that the print started as a Unix timestamp, or None if it's unknown.
+    def get_print_start_timestamp(self):
+
+        if self.print_finish_time is None or self.print_time_elapsed is None:
+            return None
+
+        return self.get_eta_timestamp() - self.print_time_left - self.print_time_elapsed
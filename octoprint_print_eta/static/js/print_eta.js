@@ -6,31 +6,238 @@ $(function() {
 
             var self = this;
 
-            self.settings = parameters[0];
+            self.settings = parameters[1];
 
             // Assign default value until the plugin sends us an update.
             self.eta = ko.observable("-");
 
+            // How long the print has been running for, and has left. Shown when hovering over the ETA.
+            self.elapsed = ko.observable("");
+            self.remaining = ko.observable("");
+
+            self.tooltip = ko.pureComputed(function () {
+
+                if (!self.elapsed() && !self.remaining())
+                    return "";
+
+                return gettext("Elapsed") + ": " + self.elapsed() + ", " + gettext("Remaining") + ": " + self.remaining();
+            });
+
+            // The ETA and the time that the print started, in milliseconds since the epoch. Null when unknown.
+            self.etaTime = null;
+            self.printStartTime = null;
+
+            // Used to update the elapsed and remaining times every second.
+            self.ticker = null;
+
+            // The samples of how the ETA has moved, as served by the plugin. Only newer samples are fetched on each
+            // update, unless the plugin has dropped samples since (a new generation), in which case all are fetched.
+            self.history = null;
+            self.historyEmpty = ko.observable(true);
+
+            // Whether the history tab is being shown, and when the history was last fetched.
+            self.historyTabActive = false;
+            self.historyFetchTime = 0;
+
             self.onBeforeBinding = function () {
 
                 var element = $("#state").find(".accordion-inner .progress");
 
                 if (element.length)
-                    element.before(gettext("ETA") + ": <strong id='eta_string' data-bind=\"html: eta\"></strong><br>");
+                    element.before(gettext("ETA") + ": <strong id='eta_string' data-bind=\"html: eta, attr: { title: tooltip }\"></strong><br>");
             };
 
             self.onDataUpdaterPluginMessage = function (plugin, data) {
-                
-                if (plugin == "print_eta")
+
+                if (plugin != "print_eta")
+                    return;
+
+                // Older versions of the plugin only send the formatted string.
+                if (data.eta === undefined || data.eta === null) {
+
+                    self.etaTime = null;
+                    self.printStartTime = null;
+
+                    self.stopTicker();
+
                     self.eta(data.eta_string);
+
+                    return;
+                }
+
+                self.etaTime = data.eta * 1000;
+                self.printStartTime = data.print_start === null ? null : data.print_start * 1000;
+
+                self.tick();
+
+                if (self.ticker === null)
+                    self.ticker = setInterval(self.tick, 1000);
+
+                // The ETA has moved, so the chart may be out of date. Avoid fetching more often than samples are stored.
+                if (self.historyTabActive && Date.now() - self.historyFetchTime > 5000)
+                    self.fetchHistory();
+            };
+
+            self.onAfterTabChange = function (current, previous) {
+
+                self.historyTabActive = current == "#tab_plugin_print_eta";
+
+                if (self.historyTabActive)
+                    self.fetchHistory();
+            };
+
+            // Fetches the samples that haven't been fetched yet, and redraws the chart.
+            self.fetchHistory = function () {
+
+                self.historyFetchTime = Date.now();
+
+                var parameters = {};
+
+                if (self.history !== null) {
+
+                    parameters.since = self.history.count;
+                    parameters.generation = self.history.generation;
+                }
+
+                $.ajax({
+                    url: BASEURL + "plugin/print_eta/history",
+                    type: "GET",
+                    dataType: "json",
+                    data: parameters
+                }).done(function (data) {
+
+                    // A new print, or samples dropped since the last fetch. Start again with the samples served.
+                    if (self.history === null || data.offset === 0 || data.start !== self.history.start)
+                        self.history = { start: data.start, generation: data.generation, count: 0, time: [], timeLeft: [], finish: [] };
+
+                    self.history.generation = data.generation;
+                    self.history.count = data.count;
+                    self.history.latest = data.latest;
+
+                    Array.prototype.push.apply(self.history.time, data.time);
+                    Array.prototype.push.apply(self.history.timeLeft, data.time_left);
+                    Array.prototype.push.apply(self.history.finish, data.finish);
+
+                    self.renderHistory();
+                });
+            };
+
+            // Draws the estimated time left reported by OctoPrint, and the time left to the ETA shown, in minutes.
+            self.renderHistory = function () {
+
+                var history = self.history;
+
+                var reported = [];
+                var shown = [];
+
+                var addSample = function (time, timeLeft, finish) {
+
+                    var x = (history.start + time) * 1000;
+
+                    reported.push([x, timeLeft / 60]);
+                    shown.push([x, (finish - time) / 60]);
+                };
+
+                for (var i = 0; i < history.time.length; i++)
+                    addSample(history.time[i], history.timeLeft[i], history.finish[i]);
+
+                // The latest sample isn't always stored, as samples are stored at most once per interval.
+                if (history.latest && (history.time.length === 0 || history.latest[0] > history.time[history.time.length - 1]))
+                    addSample(history.latest[0], history.latest[1], history.latest[3]);
+
+                self.historyEmpty(reported.length === 0);
+
+                var element = $("#print_eta_history_chart");
+
+                if (!element.is(":visible") || $.plot === undefined)
+                    return;
+
+                $.plot(element, [
+                    { label: gettext("OctoPrint's estimate"), data: reported },
+                    { label: gettext("ETA shown"), data: shown }
+                ], {
+                    xaxis: { mode: "time", timezone: "browser" },
+                    yaxis: { min: 0, tickFormatter: function (value) { return self.formatDuration(value * 60000); } },
+                    legend: { position: "ne" }
+                });
+            };
+
+            // Formats the ETA, elapsed and remaining times using the browser's locale.
+            self.tick = function () {
+
+                if (self.etaTime === null)
+                    return;
+
+                var now = Date.now();
+
+                self.eta(self.formatETA(new Date(self.etaTime), new Date(now)));
+                self.remaining(self.formatDuration(self.etaTime - now));
+                self.elapsed(self.printStartTime === null ? "-" : self.formatDuration(now - self.printStartTime));
+            };
+
+            self.stopTicker = function () {
+
+                if (self.ticker !== null) {
+
+                    clearInterval(self.ticker);
+
+                    self.ticker = null;
+                }
+
+                self.elapsed("");
+                self.remaining("");
+            };
+
+            // Gets the ETA as a string (e.g. 13:00:00, 13:00:00 tomorrow or 13:00:00 Mon 4).
+            self.formatETA = function (eta, now) {
+
+                var useTwentyFourHourView = self.settings.settings.plugins.print_eta.use_twenty_four_hour_view();
+
+                var etaString = eta.toLocaleTimeString([], { hour: "2-digit", minute: "2-digit", second: "2-digit", hour12: !useTwentyFourHourView });
+
+                var today = new Date(now.getFullYear(), now.getMonth(), now.getDate());
+                var etaDay = new Date(eta.getFullYear(), eta.getMonth(), eta.getDate());
+
+                // Round to account for daylight saving changes.
+                var days = Math.round((etaDay - today) / 86400000);
+
+                if (days == 1)
+                    etaString += " " + gettext("tomorrow");
+
+                else if (days > 1)
+                    etaString += " " + eta.toLocaleDateString([], { weekday: "short", day: "numeric" });
+
+                return etaString;
+            };
+
+            // Gets a number of milliseconds as a string (e.g. 1d 02:03:04).
+            self.formatDuration = function (milliseconds) {
+
+                var totalSeconds = Math.max(0, Math.floor(milliseconds / 1000));
+
+                var days = Math.floor(totalSeconds / 86400);
+                var hours = Math.floor(totalSeconds / 3600) % 24;
+                var minutes = Math.floor(totalSeconds / 60) % 60;
+                var seconds = totalSeconds % 60;
+
+                var pad = function (value) {
+                    return value < 10 ? "0" + value : "" + value;
+                };
+
+                var duration = pad(hours) + ":" + pad(minutes) + ":" + pad(seconds);
+
+                if (days > 0)
+                    duration = days + "d " + duration;
+
+                return duration;
             };
         }
     }
 
     OCTOPRINT_VIEWMODELS.push({
-        
+
         construct: ETAViewModel,
         dependencies: ["printerStateViewModel", "settingsViewModel"],
-        elements: ["#eta_string"]
+        elements: ["#eta_string", "#tab_plugin_print_eta"]
     });
-});
\ No newline at end of file
+});
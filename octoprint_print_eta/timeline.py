@@ -0,0 +1,119 @@
+from __future__ import absolute_import, unicode_literals
+
+import datetime
+import time
+
+# Projects when each file in a queue of prints will start and finish, one after another on the same printer.
+# Prints aren't started during quiet hours, so a print that would start during them waits until they end.
+class QueueProjector(object):
+
+    # Initialize the projector.
+    # changeover_gap (int) - The number of seconds between one print finishing and the next starting.
+    # quiet_start (time) - The time of day that quiet hours start, or None if there are none.
+    # quiet_end (time) - The time of day that quiet hours end, or None if there are none.
+    def __init__(self, changeover_gap = 0, quiet_start = None, quiet_end = None):
+
+        self.configure(changeover_gap, quiet_start, quiet_end)
+
+    # Sets the gap between prints and the quiet hours.
+    # changeover_gap (int) - The number of seconds between one print finishing and the next starting.
+    # quiet_start (time) - The time of day that quiet hours start, or None if there are none.
+    # quiet_end (time) - The time of day that quiet hours end, or None if there are none.
+    def configure(self, changeover_gap = 0, quiet_start = None, quiet_end = None):
+
+        has_quiet_hours = quiet_start is not None and quiet_end is not None and quiet_start != quiet_end
+
+        # Replaced together, so that a projection in progress always uses matching settings.
+        self.compiled = (
+            datetime.timedelta(seconds = max(0, changeover_gap)),
+            quiet_start if has_quiet_hours else None,
+            quiet_end if has_quiet_hours else None
+        )
+
+    # Projects the start and finish time of each print in a queue.
+    # Returns a list of (start, finish, deferred) tuples, one for each estimate. The times are datetimes, and are
+    # None if they depend on an unknown estimate. deferred is whether the print waits for quiet hours to end.
+    # estimates (list) - The number of seconds each print is expected to take, in the order they'll be printed.
+    #                    None if unknown.
+    # available_time (datetime) - When the printer will be free to start the first print.
+    def project(self, estimates, available_time):
+
+        changeover_gap, quiet_start, quiet_end = self.compiled
+
+        timeline = []
+
+        start = available_time
+
+        for estimate in estimates:
+
+            if start is None or estimate is None:
+
+                timeline.append((None, None, False))
+
+                start = None
+
+                continue
+
+            deferred = False
+
+            if quiet_start is not None:
+
+                quiet_until = self.get_quiet_hours_end(start, quiet_start, quiet_end)
+
+                if quiet_until is not None:
+
+                    start = quiet_until
+                    deferred = True
+
+            finish = start + datetime.timedelta(seconds = estimate)
+
+            timeline.append((start, finish, deferred))
+
+            start = finish + changeover_gap
+
+        return timeline
+
+    # Gets when the quiet hours that a time falls within end, or None if the time isn't within quiet hours.
+    # value (datetime) - The time to check.
+    # quiet_start (time) - The time of day that quiet hours start.
+    # quiet_end (time) - The time of day that quiet hours end.
+    @staticmethod
+    def get_quiet_hours_end(value, quiet_start, quiet_end):
+
+        time_of_day = value.time()
+
+        # Quiet hours within a single day (e.g. 12:00 to 14:00).
+        if quiet_start < quiet_end:
+
+            if quiet_start <= time_of_day < quiet_end:
+                return datetime.datetime.combine(value.date(), quiet_end)
+
+            return None
+
+        # Quiet hours overnight (e.g. 22:00 to 07:00), either before or after midnight.
+        if time_of_day >= quiet_start:
+            return datetime.datetime.combine(value.date() + datetime.timedelta(days = 1), quiet_end)
+
+        if time_of_day < quiet_end:
+            return datetime.datetime.combine(value.date(), quiet_end)
+
+        return None
+
+# Parses a time of day in the form HH:MM, as stored in the plugin's settings. Returns None if it's empty or invalid.
+# value (string) - The time of day.
+def parse_time_of_day(value):
+
+    try:
+        return datetime.datetime.strptime((value or "").strip(), "%H:%M").time()
+
+    except ValueError:
+        return None
+
+# Gets a datetime as a Unix timestamp, or None.
+# value (datetime) - The datetime, in local time.
+def get_timestamp(value):
+
+    if value is None:
+        return None
+
+    return time.mktime(value.timetuple())
@@ -0,0 +1,227 @@
+from __future__ import absolute_import, unicode_literals
+
+import datetime
+import io
+import json
+import os
+import threading
+import time
+
+# The version of the trace file format.
+TRACE_VERSION = 1
+
+# The kinds of record in a trace file.
+EVENT = "e"
+PROGRESS = "p"
+CURRENT_DATA = "d"
+TIMER = "t"
+
+# The parts of the printer's current data that the plugin reads, and so are recorded.
+CURRENT_DATA_KEYS = ("job", "progress")
+
+# Records what the plugin receives from OctoPrint to an append-only trace file, so that it can be replayed later.
+# The file starts with a header line, followed by one line per record. Each record is a JSON array of the number of
+# milliseconds since recording started, the kind of record, whether the printer was printing, and the record's values.
+# Lines are buffered in memory, and written once the buffer is full or the flush interval has passed.
+class TraceRecorder(object):
+
+    # The default maximum number of bytes buffered before they're written.
+    DEFAULT_BUFFER_SIZE = 64 * 1024
+
+    # The default maximum number of seconds that records are buffered for before they're written.
+    DEFAULT_FLUSH_INTERVAL = 5.0
+
+    # Initialize the recorder, and write the trace's header.
+    # path (string) - The trace file to append to. Its folder is created if it doesn't exist.
+    # settings (dictionary) - The plugin's settings, so that the trace can be replayed with them.
+    # buffer_size (int) - The maximum number of bytes buffered before they're written.
+    # flush_interval (float) - The maximum number of seconds that records are buffered for before they're written.
+    def __init__(self, path, settings, buffer_size = DEFAULT_BUFFER_SIZE, flush_interval = DEFAULT_FLUSH_INTERVAL):
+
+        self.path = path
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self.lock = threading.Lock()
+
+        folder = os.path.dirname(path)
+
+        if folder and not os.path.isdir(folder):
+            os.makedirs(folder)
+
+        self.file = io.open(path, "ab")
+
+        self.buffer = []
+        self.buffered_bytes = 0
+
+        self.start = time.monotonic()
+        self.last_flush = self.start
+
+        # The last current data recorded, as JSON. Unchanged data is recorded without its values.
+        self.previous_current_data = None
+
+        # The number of records, and the number of bytes written.
+        self.record_count = 0
+        self.written_bytes = 0
+
+        self.append(self.encode(dict(version = TRACE_VERSION, start = time.time(), settings = settings)))
+
+    # Records an event.
+    # event (string) - The type of event.
+    # payload (dictionary) - The event's payload.
+    # printing (bool) - Whether the printer is printing.
+    def record_event(self, event, payload, printing):
+        self.record(EVENT, printing, [event, payload])
+
+    # Records a progress update.
+    # storage (string) - The location of the file being printed.
+    # path (string) - The path of the file being printed.
+    # progress (int) - The print's progress, between 0 and 100.
+    # printing (bool) - Whether the printer is printing.
+    def record_progress(self, storage, path, progress, printing):
+        self.record(PROGRESS, printing, [storage, path, progress])
+
+    # Records the printer's current data. Only the parts that the plugin reads are kept.
+    # current_data (dictionary) - The printer's current data.
+    # printing (bool) - Whether the printer is printing.
+    def record_current_data(self, current_data, printing):
+
+        # Compared as JSON, as OctoPrint may change the data in place after returning it.
+        current_data = self.encode(dict((key, current_data[key]) for key in CURRENT_DATA_KEYS if key in current_data))
+
+        if current_data == self.previous_current_data:
+            self.record(CURRENT_DATA, printing, [])
+
+        else:
+
+            self.previous_current_data = current_data
+
+            self.record(CURRENT_DATA, printing, [], current_data)
+
+    # Records a tick of the printer message timer.
+    # printing (bool) - Whether the printer is printing.
+    def record_timer(self, printing):
+        self.record(TIMER, printing, [])
+
+    # Records a line, with the time since recording started.
+    # kind (string) - The kind of record.
+    # printing (bool) - Whether the printer is printing.
+    # values (list) - The record's values.
+    # encoded (string) - Optional. A value that has already been encoded as JSON, added after the other values.
+    def record(self, kind, printing, values, encoded = None):
+
+        with self.lock:
+
+            if self.file is None:
+                return
+
+            now = time.monotonic()
+
+            self.record_count += 1
+
+            line = self.encode([int((now - self.start) * 1000), kind, 1 if printing else 0] + values)
+
+            if encoded is not None:
+                line = line[:-1] + "," + encoded + "]"
+
+            self.append(line)
+
+            if self.buffered_bytes >= self.buffer_size or now - self.last_flush >= self.flush_interval:
+                self.flush()
+
+    # Gets a value as compact JSON.
+    def encode(self, value):
+        return json.dumps(value, separators = (",", ":"), default = str)
+
+    # Adds a line to the buffer. The lock must be held.
+    # line (string) - The line, encoded as JSON.
+    def append(self, line):
+
+        line = (line + "\n").encode("utf-8")
+
+        self.buffer.append(line)
+        self.buffered_bytes += len(line)
+
+    # Writes the buffered lines to the trace file. The lock must be held.
+    def flush(self):
+
+        if len(self.buffer) > 0:
+
+            self.file.write(b"".join(self.buffer))
+            self.file.flush()
+
+            self.written_bytes += self.buffered_bytes
+
+        self.buffer = []
+        self.buffered_bytes = 0
+
+        self.last_flush = time.monotonic()
+
+    # Writes any buffered lines, and closes the trace file. Later records are ignored.
+    def close(self):
+
+        with self.lock:
+
+            if self.file is None:
+                return
+
+            self.flush()
+
+            self.file.close()
+            self.file = None
+
+# Reads a trace file. Returns the header, and a list of the records in the order they were recorded.
+# Records of unchanged current data have the previous data filled back in.
+# path (string) - The trace file to read.
+def read_trace(path):
+
+    with io.open(path, "r", encoding = "utf-8") as file:
+
+        header = json.loads(file.readline())
+
+        if header.get("version") != TRACE_VERSION:
+            raise ValueError("Unsupported trace version: {}".format(header.get("version")))
+
+        records = []
+
+        current_data = None
+
+        for line in file:
+
+            # The last line may be incomplete, if OctoPrint stopped while it was being written.
+            try:
+                record = json.loads(line)
+
+            except ValueError:
+                break
+
+            if record[1] == CURRENT_DATA:
+
+                if len(record) > 3:
+                    current_data = record[3]
+
+                record = record[:3] + [current_data]
+
+            records.append(record)
+
+    return header, records
+
+# A clock that only moves when told to, used to replay traces faster than real time and with the same results.
+class VirtualClock(object):
+
+    # Initialize the clock.
+    # start (float) - The clock's initial time, as a Unix timestamp.
+    def __init__(self, start):
+        self.now = start
+
+    # Moves the clock forward.
+    # seconds (float) - The number of seconds to move forward by.
+    def advance(self, seconds):
+        self.now += seconds
+
+    # Gets the current time as a Unix timestamp. Can be used in place of time.time or time.monotonic.
+    def time(self):
+        return self.now
+
+    # Gets the current local time. Can be used in place of datetime.datetime.today.
+    def today(self):
+        return datetime.datetime.fromtimestamp(self.now)
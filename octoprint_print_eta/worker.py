@@ -0,0 +1,107 @@
+from __future__ import absolute_import, unicode_literals
+
+import logging
+import threading
+
+# Runs requests on a single dedicated thread, so that callers never wait for them to complete.
+# Only the latest request is kept: a request submitted while another is waiting replaces it, as the newer request
+# makes the older one stale. A merge function can be given to carry parts of the replaced request over.
+class ETAWorker(object):
+
+    # Initialize the worker.
+    # callback (function) - Called on the worker's thread with each request.
+    # merge (function) - Optional. Called with the waiting request and the new request, returns the request to keep.
+    # name (string) - The name of the worker's thread.
+    def __init__(self, callback, merge = None, name = "PrintETA worker"):
+
+        self.callback = callback
+        self.merge = merge
+        self.name = name
+
+        self.logger = logging.getLogger("octoprint.plugins.print_eta")
+
+        self.condition = threading.Condition()
+        self.thread = None
+        self.running = False
+
+        # The waiting request, and whether there is one. Requests themselves may be None.
+        self.pending = None
+        self.has_pending = False
+
+        # The number of requests submitted, replaced by a later request, and processed.
+        self.submitted_count = 0
+        self.dropped_count = 0
+        self.processed_count = 0
+
+    # Starts the worker's thread, if it isn't already running.
+    def start(self):
+
+        with self.condition:
+
+            if self.running:
+                return
+
+            self.running = True
+
+            self.thread = threading.Thread(target = self.run, name = self.name)
+            self.thread.daemon = True
+            self.thread.start()
+
+    # Stops the worker's thread once any request being processed completes. Waiting requests are discarded.
+    def stop(self):
+
+        with self.condition:
+
+            self.running = False
+
+            self.pending = None
+            self.has_pending = False
+
+            self.condition.notify()
+
+    # Submits a request to be processed, replacing any request that is still waiting.
+    # request - The request to pass to the callback.
+    def submit(self, request = None):
+
+        with self.condition:
+
+            self.submitted_count += 1
+
+            if self.has_pending:
+
+                self.dropped_count += 1
+
+                if self.merge is not None:
+                    request = self.merge(self.pending, request)
+
+            self.pending = request
+            self.has_pending = True
+
+            self.condition.notify()
+
+    # Processes requests until the worker is stopped. Runs on the worker's thread.
+    def run(self):
+
+        while True:
+
+            with self.condition:
+
+                while self.running and not self.has_pending:
+                    self.condition.wait()
+
+                if not self.running:
+                    return
+
+                request = self.pending
+
+                self.pending = None
+                self.has_pending = False
+
+            try:
+                self.callback(request)
+
+            except Exception:
+                self.logger.exception("Failed to process request")
+
+            with self.condition:
+                self.processed_count += 1
@@ -0,0 +1,124 @@
+from __future__ import absolute_import, unicode_literals
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from octoprint_print_eta.calibration import ETACalibrator
+from octoprint_print_eta.tracing import VirtualClock
+
+# Records a completed print that took a factor longer than predicted, sampled at every progress bucket.
+def record_print(calibrator, clock, profile_id, factor, duration = 1000.0):
+
+    calibrator.start_print(profile_id)
+
+    for bucket in range(ETACalibrator.BUCKET_COUNT):
+
+        completion = bucket * 100.0 / ETACalibrator.BUCKET_COUNT
+
+        calibrator.sample(completion, int(duration * (1 - completion / 100.0) / factor))
+
+        clock.advance(duration / ETACalibrator.BUCKET_COUNT)
+
+    calibrator.finish_print()
+
+def test_corrects_estimates_once_enough_prints_are_recorded(tmp_path):
+
+    clock = VirtualClock(1000.0)
+    calibrator = ETACalibrator(str(tmp_path), clock.time)
+
+    record_print(calibrator, clock, "_default", 2.0)
+
+    calibrator.start_print("_default")
+
+    # A single print isn't enough to correct from.
+    assert calibrator.correct(50.0, 100) == 100
+
+    for _ in range(2):
+        record_print(calibrator, clock, "_default", 2.0)
+
+    calibrator.start_print("_default")
+
+    assert 190 <= calibrator.correct(50.0, 100) <= 200
+
+    calibrator.start_print("other")
+
+    assert calibrator.correct(50.0, 100) == 100
+
+def test_corrections_are_limited(tmp_path):
+
+    clock = VirtualClock(1000.0)
+    calibrator = ETACalibrator(str(tmp_path), clock.time)
+
+    for _ in range(3):
+        record_print(calibrator, clock, "_default", 100.0)
+
+    calibrator.start_print("_default")
+
+    assert calibrator.correct(50.0, 100) == 100 * ETACalibrator.MAX_FACTOR
+
+def test_load_learns_from_history_recorded_after_the_model_was_saved(tmp_path):
+
+    clock = VirtualClock(1000.0)
+    calibrator = ETACalibrator(str(tmp_path), clock.time)
+
+    for _ in range(2):
+        record_print(calibrator, clock, "_default", 2.0)
+
+    os.remove(calibrator.model_path)
+
+    loaded = ETACalibrator(str(tmp_path), clock.time)
+    loaded.load()
+    loaded.start_print("_default")
+
+    assert loaded.model == calibrator.model
+    assert loaded.history_size == os.path.getsize(calibrator.history_path)
+
+def test_load_ignores_a_partial_trailing_record(tmp_path):
+
+    clock = VirtualClock(1000.0)
+    calibrator = ETACalibrator(str(tmp_path), clock.time)
+
+    for _ in range(2):
+        record_print(calibrator, clock, "_default", 2.0)
+
+    complete_size = os.path.getsize(calibrator.history_path)
+
+    # OctoPrint stopped while a record was being written.
+    with open(calibrator.history_path, "ab") as file:
+        file.write(b"\x01" * (ETACalibrator.RECORD.size // 2))
+
+    os.remove(calibrator.model_path)
+
+    loaded = ETACalibrator(str(tmp_path), clock.time)
+    loaded.load()
+
+    assert loaded.model == calibrator.model
+    assert loaded.history_size == complete_size
+
+    # Records written afterwards are still read from the right place.
+    for _ in range(3):
+        record_print(loaded, clock, "other", 3.0)
+
+    reloaded = ETACalibrator(str(tmp_path), clock.time)
+    reloaded.load()
+
+    assert reloaded.model == loaded.model
+    assert sorted(reloaded.model) == ["_default", "other"]
+
+def test_load_starts_again_if_the_history_was_removed(tmp_path):
+
+    clock = VirtualClock(1000.0)
+    calibrator = ETACalibrator(str(tmp_path), clock.time)
+
+    for _ in range(2):
+        record_print(calibrator, clock, "_default", 2.0)
+
+    os.remove(calibrator.history_path)
+
+    loaded = ETACalibrator(str(tmp_path), clock.time)
+    loaded.load()
+
+    assert loaded.model == dict()
+    assert loaded.history_size == 0
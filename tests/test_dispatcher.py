@@ -0,0 +1,105 @@
+from __future__ import absolute_import, unicode_literals
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from octoprint_print_eta.dispatcher import CommandDispatcher
+from octoprint_print_eta.tracing import VirtualClock
+
+# Creates a dispatcher that records what it sends, driven by a virtual clock.
+def create_dispatcher(intervals = None):
+
+    sent = []
+    clock = VirtualClock(1000.0)
+
+    return CommandDispatcher(sent.append, intervals, clock.time), sent, clock
+
+def test_sends_pending_commands_together():
+
+    dispatcher, sent, _ = create_dispatcher()
+
+    dispatcher.queue("M73 P10")
+    dispatcher.queue("M117 ETA: 13:00:00")
+
+    assert dispatcher.flush() == ["M73 P10", "M117 ETA: 13:00:00"]
+    assert sent == [["M73 P10", "M117 ETA: 13:00:00"]]
+
+def test_suppresses_commands_already_shown():
+
+    dispatcher, sent, _ = create_dispatcher()
+
+    dispatcher.queue("M73 P10")
+    dispatcher.flush()
+
+    dispatcher.queue("M73 P10")
+
+    assert dispatcher.flush() == []
+    assert sent == [["M73 P10"]]
+    assert dispatcher.get_statistics() == dict(sent = { "M73": 1 }, suppressed = { "M73": 1 })
+
+def test_replaces_pending_commands_of_the_same_type():
+
+    dispatcher, _, _ = create_dispatcher()
+
+    dispatcher.queue("M73 P10")
+    dispatcher.queue("M73 P11")
+
+    assert dispatcher.flush() == ["M73 P11"]
+    assert dispatcher.get_statistics() == dict(sent = { "M73": 1 }, suppressed = { "M73": 1 })
+
+def test_holds_back_commands_until_their_interval_has_passed():
+
+    dispatcher, sent, clock = create_dispatcher({ "M117": 30 })
+
+    dispatcher.queue("M117 Elapsed: 00:01:00")
+    dispatcher.flush()
+
+    clock.advance(10)
+
+    dispatcher.queue("M73 P11")
+    dispatcher.queue("M117 Elapsed: 00:01:10")
+
+    # Only the progress update can be sent yet. The message is held back, not dropped.
+    assert dispatcher.flush() == ["M73 P11"]
+
+    clock.advance(19)
+
+    assert dispatcher.flush() == []
+
+    clock.advance(1)
+
+    assert dispatcher.flush() == ["M117 Elapsed: 00:01:10"]
+    assert sent == [["M117 Elapsed: 00:01:00"], ["M73 P11"], ["M117 Elapsed: 00:01:10"]]
+    assert dispatcher.get_statistics() == dict(sent = { "M73": 1, "M117": 2 }, suppressed = dict())
+
+def test_held_back_commands_are_replaced_by_newer_ones():
+
+    dispatcher, _, clock = create_dispatcher({ "M117": 30 })
+
+    dispatcher.queue("M117 A")
+    dispatcher.flush()
+
+    dispatcher.queue("M117 B")
+    dispatcher.flush()
+
+    dispatcher.queue("M117 C")
+
+    clock.advance(30)
+
+    assert dispatcher.flush() == ["M117 C"]
+    assert dispatcher.get_statistics()["suppressed"] == { "M117": 1 }
+
+def test_reset_sends_the_same_command_again():
+
+    dispatcher, _, _ = create_dispatcher({ "M73": 60 })
+
+    dispatcher.queue("M73 P10")
+    dispatcher.flush()
+
+    dispatcher.reset()
+
+    dispatcher.queue("M73 P10")
+
+    assert dispatcher.flush() == ["M73 P10"]
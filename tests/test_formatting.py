@@ -0,0 +1,47 @@
+from __future__ import absolute_import, unicode_literals
+
+import datetime
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from octoprint_print_eta.formatting import format_duration, format_durations
+
+# Gets the string expected for a time delta, from its days and seconds.
+def get_expected(timedelta):
+
+    expected = "{:02d}:{:02d}:{:02d}".format(timedelta.seconds // 3600, (timedelta.seconds // 60) % 60, timedelta.seconds % 60)
+
+    if timedelta.days > 0:
+        expected = "{}d {}".format(timedelta.days, expected)
+
+    return expected
+
+def test_format_duration_matches_timedelta():
+
+    rng = random.Random(0)
+
+    # Mostly durations of prints, with some that last for weeks, and the boundaries between days, hours and minutes.
+    seconds = [rng.randrange(0, 86400 * 3) for _ in range(10000)] + [rng.randrange(0, 86400 * 400) for _ in range(1000)]
+    seconds += [0, 1, 59, 60, 3599, 3600, 86399, 86400, 86401]
+
+    for value in seconds:
+
+        timedelta = datetime.timedelta(seconds = value)
+
+        assert format_duration(timedelta.days * 86400 + timedelta.seconds) == get_expected(timedelta)
+
+def test_format_duration_clamps_negative_durations():
+
+    for value in (-1, -59, -3600, -86400 * 2, -0.5):
+        assert format_duration(value) == "00:00:00"
+
+def test_format_duration_truncates_fractional_seconds():
+
+    assert format_duration(59.9) == "00:00:59"
+    assert format_duration(86400.5) == "1d 00:00:00"
+
+def test_format_durations_keeps_none():
+    assert format_durations([None, 61, -5, 90061]) == [None, "00:01:01", "00:00:00", "1d 01:01:01"]
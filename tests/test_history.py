@@ -0,0 +1,139 @@
+from __future__ import absolute_import, unicode_literals
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from octoprint_print_eta.history import ETAHistory
+
+# Records a sample every second of a print that starts at 1000 and is expected to take 1000 seconds.
+def record(history, seconds, first = 0):
+
+    for second in range(first, first + seconds):
+        history.add(1000.0 + second, 1000 - second, second / 10.0, 2000.0)
+
+def test_keeps_at_most_one_sample_per_interval():
+
+    history = ETAHistory(8, 5.0)
+
+    record(history, 12)
+
+    series = history.get_series()
+
+    assert series["start"] == 1000.0
+    assert series["time"] == [0, 5, 10]
+    assert series["time_left"] == [1000, 995, 990]
+    assert series["completion"] == [0.0, 0.5, 1.0]
+    assert series["finish"] == [1000, 1000, 1000]
+
+    # The latest sample is kept even though it wasn't stored.
+    assert series["latest"] == [11, 989, 1.1, 1000]
+
+def test_unknown_completion():
+
+    history = ETAHistory(8, 5.0)
+
+    history.add(1000.0, 100, None, 1100.0)
+
+    assert history.get_series()["completion"] == [None]
+
+def test_downsamples_when_full():
+
+    history = ETAHistory(8, 5.0)
+
+    record(history, 40)
+
+    series = history.get_series()
+
+    assert series["generation"] == 0
+    assert series["time"] == [0, 5, 10, 15, 20, 25, 30, 35]
+
+    # The next sample drops every other sample, and doubles the interval.
+    record(history, 1, 40)
+
+    series = history.get_series()
+
+    assert series["generation"] == 1
+    assert series["interval"] == 10.0
+    assert series["time"] == [0, 10, 20, 30, 40]
+
+    record(history, 39, 41)
+
+    assert history.get_series()["time"] == [0, 10, 20, 30, 40, 50, 60, 70]
+
+    record(history, 1, 80)
+
+    series = history.get_series()
+
+    assert series["generation"] == 2
+    assert series["interval"] == 20.0
+    assert series["time"] == [0, 20, 40, 60, 80]
+
+    # The whole print is still covered once it runs far longer than the buffer's first interval.
+    record(history, 1000, 81)
+
+    series = history.get_series()
+
+    assert series["count"] <= 8
+    assert series["time"][0] == 0
+    assert series["time"][-1] >= 1080 - series["interval"]
+
+def test_get_series_returns_only_new_samples():
+
+    history = ETAHistory(8, 5.0)
+
+    record(history, 20)
+
+    series = history.get_series()
+
+    assert series["offset"] == 0
+    assert series["count"] == 4
+
+    record(history, 10, 20)
+
+    series = history.get_series(4, 0)
+
+    assert series["offset"] == 4
+    assert series["count"] == 6
+    assert series["time"] == [20, 25]
+
+    # A client that's up to date gets no samples.
+    assert history.get_series(6, 0)["time"] == []
+
+def test_get_series_returns_every_sample_to_clients_out_of_date():
+
+    history = ETAHistory(8, 5.0)
+
+    record(history, 20)
+
+    # Samples were dropped since the client's generation.
+    record(history, 30, 20)
+
+    series = history.get_series(4, 0)
+
+    assert series["generation"] == 1
+    assert series["offset"] == 0
+    assert series["time"] == [0, 10, 20, 30, 40]
+
+    # Clients claiming more samples than there are, or an unknown generation, also get every sample.
+    assert history.get_series(9, 1)["offset"] == 0
+    assert history.get_series(-1, 1)["offset"] == 0
+    assert history.get_series(2, None)["offset"] == 0
+    assert history.get_series(2, 1)["offset"] == 2
+
+def test_reset_forgets_samples():
+
+    history = ETAHistory(8, 5.0)
+
+    record(history, 50)
+
+    history.reset(5000.0)
+
+    series = history.get_series()
+
+    assert series["start"] == 5000.0
+    assert series["generation"] == 0
+    assert series["interval"] == 5.0
+    assert series["time"] == []
+    assert series["latest"] is None
@@ -0,0 +1,115 @@
+from __future__ import absolute_import, unicode_literals
+
+import array
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from octoprint_print_eta.analysis import GcodeIndex
+from octoprint_print_eta.profiles import ProfileCache
+
+# Creates an index with a few samples and layers.
+def create_index():
+    return GcodeIndex(array.array("Q", [0, 100, 2000]), array.array("d", [0.0, 1.5, 60.25]), array.array("Q", [0, 1500]), 2500)
+
+# Checks that two indexes hold the same values.
+def assert_same_index(index, expected):
+
+    assert list(index.offsets) == list(expected.offsets)
+    assert list(index.seconds) == list(expected.seconds)
+    assert list(index.layers) == list(expected.layers)
+    assert index.size == expected.size
+
+def test_encode_and_decode(tmp_path):
+
+    cache = ProfileCache(str(tmp_path), 1024 * 1024)
+
+    data = cache.encode(create_index())
+
+    assert len(data) == ProfileCache.HEADER.size + (3 * 2 + 2) * 8
+
+    assert_same_index(cache.decode(data), create_index())
+
+def test_put_and_get(tmp_path):
+
+    cache = ProfileCache(str(tmp_path), 1024 * 1024)
+
+    assert cache.get("abc") is None
+
+    cache.put("abc", create_index())
+
+    assert_same_index(cache.get("abc"), create_index())
+
+@pytest.mark.parametrize("corrupt", [
+    lambda data: data[:10],
+    lambda data: b"NOPE" + data[4:],
+    lambda data: data[:4] + b"\x09\x00" + data[6:],
+    lambda data: data[:-8],
+    lambda data: data + b"\x00" * 8
+])
+def test_decode_rejects_corrupt_profiles(tmp_path, corrupt):
+
+    cache = ProfileCache(str(tmp_path), 1024 * 1024)
+
+    with pytest.raises(ValueError):
+        cache.decode(corrupt(cache.encode(create_index())))
+
+def test_corrupt_profiles_are_removed(tmp_path):
+
+    cache = ProfileCache(str(tmp_path), 1024 * 1024)
+
+    cache.put("abc", create_index())
+
+    with open(cache.get_path("abc"), "r+b") as file:
+        file.truncate(20)
+
+    assert cache.get("abc") is None
+    assert not os.path.exists(cache.get_path("abc"))
+
+def test_least_recently_used_profiles_are_evicted(tmp_path):
+
+    size = len(ProfileCache(str(tmp_path), 0).encode(create_index()))
+
+    cache = ProfileCache(str(tmp_path), size * 2)
+
+    cache.put("a", create_index())
+    cache.put("b", create_index())
+
+    # Make "a" the oldest, regardless of the file system's timestamp resolution.
+    os.utime(cache.get_path("a"), (1, 1))
+
+    cache.put("c", create_index())
+
+    assert not os.path.exists(cache.get_path("a"))
+    assert os.path.exists(cache.get_path("b"))
+    assert os.path.exists(cache.get_path("c"))
+
+def test_profiles_are_kept_until_no_file_uses_them(tmp_path):
+
+    cache = ProfileCache(str(tmp_path), 1024 * 1024)
+
+    cache.put("abc", create_index())
+    cache.link("part.gcode", "abc")
+    cache.link("copy.gcode", "abc")
+
+    # The files that use each profile are remembered after a restart.
+    cache = ProfileCache(str(tmp_path), 1024 * 1024)
+
+    cache.unlink("part.gcode")
+
+    assert os.path.exists(cache.get_path("abc"))
+
+    cache.unlink("copy.gcode")
+
+    assert not os.path.exists(cache.get_path("abc"))
+    assert cache.paths == dict()
+
+def test_unreadable_paths_are_ignored(tmp_path):
+
+    with open(os.path.join(str(tmp_path), ProfileCache.PATHS_FILE), "w") as file:
+        file.write("{")
+
+    assert ProfileCache(str(tmp_path), 1024 * 1024).paths == dict()
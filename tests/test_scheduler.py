@@ -0,0 +1,135 @@
+from __future__ import absolute_import, unicode_literals
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from octoprint_print_eta.scheduler import RefreshScheduler
+from octoprint_print_eta.tracing import VirtualClock
+
+# Creates a scheduler that records its refreshes and rotations, driven by a virtual clock rather than its thread.
+def create_scheduler(start = 1000.25):
+
+    calls = []
+    clock = VirtualClock(start)
+
+    scheduler = RefreshScheduler(lambda: calls.append(("refresh", clock.time())), lambda: calls.append(("rotate", clock.time())), clock = clock.time)
+
+    return scheduler, calls, clock
+
+# Gets the function due at the clock's current time, as the scheduler's thread would.
+def take_due(scheduler):
+
+    with scheduler.condition:
+        return scheduler.take_due()
+
+def test_nothing_is_due_without_a_request():
+
+    scheduler, _, clock = create_scheduler()
+
+    assert take_due(scheduler) is None
+
+    clock.advance(3600)
+
+    assert take_due(scheduler) is None
+
+def test_requests_are_due_at_the_next_second_boundary():
+
+    scheduler, _, clock = create_scheduler()
+
+    scheduler.request()
+    scheduler.request()
+
+    assert take_due(scheduler) is None
+
+    clock.advance(0.5)
+
+    assert take_due(scheduler) is None
+
+    clock.advance(0.25)
+
+    assert take_due(scheduler) is scheduler.refresh
+
+    # Both requests shared the refresh.
+    assert take_due(scheduler) is None
+    assert scheduler.request_count == 2
+    assert scheduler.run_count == 1
+
+def test_predicted_changes_are_rounded_up_and_replaced():
+
+    scheduler, _, clock = create_scheduler()
+
+    scheduler.schedule(1010.5)
+    scheduler.schedule(1005.5)
+
+    clock.now = 1005.9
+
+    assert take_due(scheduler) is None
+
+    clock.now = 1006.0
+
+    assert take_due(scheduler) is scheduler.refresh
+
+    scheduler.schedule(None)
+
+    clock.advance(3600)
+
+    assert take_due(scheduler) is None
+
+def test_rotation_covers_refreshes_due_at_the_same_time():
+
+    scheduler, _, clock = create_scheduler()
+
+    scheduler.start_rotation(10)
+
+    clock.now = 1010.5
+
+    scheduler.request()
+
+    clock.now = 1011.0
+
+    assert take_due(scheduler) is scheduler.rotate
+    assert take_due(scheduler) is None
+
+    clock.now = 1021.0
+
+    assert take_due(scheduler) is scheduler.rotate
+    assert scheduler.rotation_count == 2
+    assert scheduler.run_count == 0
+
+def test_missed_rotation_slots_are_skipped():
+
+    scheduler, _, clock = create_scheduler()
+
+    scheduler.start_rotation(10)
+
+    clock.now = 1055.0
+
+    assert take_due(scheduler) is scheduler.rotate
+    assert take_due(scheduler) is None
+    assert scheduler.rotation_time == 1061.0
+
+def test_stopping_rotation_cancels_the_next_slot():
+
+    scheduler, _, clock = create_scheduler()
+
+    scheduler.start_rotation(10)
+    scheduler.stop_rotation()
+
+    clock.advance(60)
+
+    assert take_due(scheduler) is None
+
+def test_tick_calls_whatever_is_due():
+
+    scheduler, calls, clock = create_scheduler()
+
+    scheduler.request()
+
+    clock.now = 1001.0
+
+    scheduler.tick()
+    scheduler.tick()
+
+    assert calls == [("refresh", 1001.0)]
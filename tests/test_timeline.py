@@ -0,0 +1,71 @@
+from __future__ import absolute_import, unicode_literals
+
+import datetime
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from octoprint_print_eta.timeline import QueueProjector, parse_time_of_day
+
+# Gets a time on a fixed day, or the day after.
+def at(hour, minute = 0, day = 5):
+    return datetime.datetime(2026, 1, day, hour, minute)
+
+# Creates a projector with quiet hours overnight, from 22:00 to 07:00.
+def create_overnight_projector(changeover_gap = 0):
+    return QueueProjector(changeover_gap, parse_time_of_day("22:00"), parse_time_of_day("07:00"))
+
+def test_projects_prints_one_after_another():
+
+    projector = QueueProjector(600)
+
+    assert projector.project([3600, 1800], at(12)) == [(at(12), at(13), False), (at(13, 10), at(13, 40), False)]
+
+def test_unknown_estimates_leave_the_rest_of_the_queue_unknown():
+
+    projector = QueueProjector()
+
+    assert projector.project([3600, None, 1800], at(12)) == [(at(12), at(13), False), (None, None, False), (None, None, False)]
+
+def test_print_starting_before_midnight_waits_for_the_morning():
+
+    projector = create_overnight_projector()
+
+    assert projector.project([3600], at(23, 30)) == [(at(7, day = 6), at(8, day = 6), True)]
+
+def test_print_starting_after_midnight_waits_for_the_morning():
+
+    projector = create_overnight_projector()
+
+    assert projector.project([3600], at(2, day = 6)) == [(at(7, day = 6), at(8, day = 6), True)]
+
+def test_print_running_into_quiet_hours_is_not_deferred():
+
+    projector = create_overnight_projector(600)
+
+    # The first print runs through the night, but the second would start during quiet hours.
+    assert projector.project([7200, 3600], at(21)) == [(at(21), at(23), False), (at(7, day = 6), at(8, day = 6), True)]
+
+def test_quiet_hours_end_and_start_at_their_boundaries():
+
+    projector = create_overnight_projector()
+
+    assert projector.project([3600], at(7)) == [(at(7), at(8), False)]
+    assert projector.project([3600], at(21, 59)) == [(at(21, 59), at(22, 59), False)]
+    assert projector.project([3600], at(22)) == [(at(7, day = 6), at(8, day = 6), True)]
+
+def test_quiet_hours_within_a_day():
+
+    projector = QueueProjector(0, parse_time_of_day("12:00"), parse_time_of_day("14:00"))
+
+    assert projector.project([3600], at(13)) == [(at(14), at(15), True)]
+    assert projector.project([3600], at(23)) == [(at(23), at(0, day = 6), False)]
+
+def test_quiet_hours_need_a_start_and_a_different_end():
+
+    for quiet_end in ("", "22:00", "25:00"):
+
+        projector = QueueProjector(0, parse_time_of_day("22:00"), parse_time_of_day(quiet_end))
+
+        assert projector.project([3600], at(23)) == [(at(23), at(0, day = 6), False)]